@@ -4,124 +4,2317 @@ import subprocess
 import threading
 import time
 import ast
+import builtins
 import inspect
 import tempfile
 import shutil
+import mmap
+import bisect
+import heapq
+import itertools
+import string
+import argparse
+import hashlib
 from pathlib import Path
+
+# Reference point for startup time measurements
+STARTUP_TIME = time.perf_counter()
+
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-import pyqtgraph as pg
-from pyqtgraph import PlotWidget
+from PyQt5.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
 import webbrowser
+import importlib
+import importlib.machinery
 import importlib.metadata
 import importlib.util
 import json
+from array import array
+from collections import Counter, OrderedDict, deque
 from datetime import datetime
 import re
 import io
+import codecs
 import contextlib
-import networkx as nx
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Circle, Polygon, FancyBboxPatch, Arrow
-import matplotlib
-matplotlib.use('Agg')
-from matplotlib import patches
-import requests
-import psutil
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-import urllib.request
-import urllib.parse
+import zlib
+import difflib
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name, submodules=(), before_load=None):
+        self._name = name
+        self._submodules = submodules
+        self._before_load = before_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Imports the module (and requested submodules) once"""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    if self._before_load:
+                        self._before_load()
+                    module = importlib.import_module(self._name)
+                    for submodule in self._submodules:
+                        importlib.import_module(f"{self._name}.{submodule}")
+                    self._module = module
+        return self._module
+
+    def isLoaded(self):
+        """Checks if the module has already been imported"""
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.isLoaded() else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+def module_available(name):
+    """Checks if a module is installed without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def _use_agg_backend():
+    """Selects the non-interactive matplotlib backend before pyplot is loaded"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+# Heavy dependencies - imported only when a feature actually uses them
+pg = LazyModule('pyqtgraph')
+nx = LazyModule('networkx')
+plt = LazyModule('matplotlib.pyplot', before_load=_use_agg_backend)
+patches = LazyModule('matplotlib.patches', before_load=_use_agg_backend)
+requests = LazyModule('requests')
+PSUTIL_AVAILABLE = module_available('psutil')
+psutil = LazyModule('psutil')
+# QtWebEngine requires Qt.AA_ShareOpenGLContexts to be set before QApplication
+# is created when it is imported later (see main())
+QtWebEngineWidgets = LazyModule('PyQt5.QtWebEngineWidgets')
 
 # Nowe importy dla funkcjonalności poprawy kodu
-try:
-    import autopep8
-    AUTOPEP8_AVAILABLE = True
-except ImportError:
-    AUTOPEP8_AVAILABLE = False
-
-try:
-    import black
-    BLACK_AVAILABLE = True
-except ImportError:
-    BLACK_AVAILABLE = False
-
-try:
-    import pyflakes
-    import pyflakes.api
-    import pyflakes.reporter
-    PYFLAKES_AVAILABLE = True
-except ImportError:
-    PYFLAKES_AVAILABLE = False
+AUTOPEP8_AVAILABLE = module_available('autopep8')
+autopep8 = LazyModule('autopep8')
+
+BLACK_AVAILABLE = module_available('black')
+black = LazyModule('black')
+
+PYFLAKES_AVAILABLE = module_available('pyflakes')
+pyflakes = LazyModule('pyflakes', submodules=('api', 'checker', 'reporter'))
+
+class StartupProfiler:
+    """Records timings of startup phases for the --profile-startup report"""
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.enabled = False
+        self.phases = []  # (name, start, end, depth)
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measures the enclosed block as a named startup phase"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.addPhase(name, start, time.perf_counter(), depth)
+
+    def addPhase(self, name, start, end, depth=0):
+        """Adds a phase measured outside of phase()"""
+        if self.enabled:
+            self.phases.append((name, start, end, depth))
+
+    def formatReport(self):
+        """Returns per-phase timing table"""
+        lines = [f"{'Phase':<40}{'Start (ms)':>12}{'Duration (ms)':>15}"]
+        lines.append("-" * len(lines[0]))
+        for name, start, end, depth in sorted(self.phases, key=lambda p: (p[1], p[3])):
+            label = "  " * depth + name
+            lines.append(f"{label:<40}{(start - self.origin) * 1000:>12.1f}{(end - start) * 1000:>15.1f}")
+        if self.phases:
+            total = max(end for _, _, end, _ in self.phases) - self.origin
+            lines.append("-" * len(lines[0]))
+            lines.append(f"{'Total':<40}{'':>12}{total * 1000:>15.1f}")
+        return "\n".join(lines)
+
+    def writeChromeTrace(self, path):
+        """Saves phases in Chrome trace event format (chrome://tracing, Perfetto)"""
+        events = []
+        for name, start, end, depth in self.phases:
+            events.append({
+                "name": name,
+                "cat": "startup",
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, indent=1)
+
+startup_profiler = StartupProfiler(STARTUP_TIME)
+
+class FirstPaintWatcher(QObject):
+    """Emits painted once, after the watched widget handles its first paint event"""
+    painted = pyqtSignal()
+
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.widget = widget
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.widget and event.type() == QEvent.Paint:
+            self.widget.removeEventFilter(self)
+            # Paint event is still being delivered - report after it is done
+            QTimer.singleShot(0, self.painted.emit)
+        return False
+
+class PythonLexer:
+    """Single pass Python tokenizer producing format runs for the highlighter"""
+    # Token classes
+    KEYWORD = 0
+    CLASS_NAME = 1
+    FUNCTION_NAME = 2
+    STRING = 3
+    COMMENT = 4
+    NUMBER = 5
+    TOKEN_COUNT = 6
+    TOKEN_NAMES = ('keyword', 'class', 'function', 'string', 'comment', 'number')
+
+    # Block states carried between lines with setCurrentBlockState
+    STATE_NORMAL = 0
+    STATE_TRIPLE_SINGLE = 1  # inside ''' string
+    STATE_TRIPLE_DOUBLE = 2  # inside """ string
+
+    KEYWORDS = frozenset([
+        'and', 'as', 'assert', 'break', 'class', 'continue', 'def',
+        'del', 'elif', 'else', 'except', 'False', 'finally', 'for',
+        'from', 'global', 'if', 'import', 'in', 'is', 'lambda',
+        'None', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return',
+        'True', 'try', 'while', 'with', 'yield'
+    ])
+
+    TOKEN_PATTERN = re.compile(r"""
+        (?P<comment>\#.*)
+      | (?P<string>[rRbBuUfF]{0,2}(?:'''|\"\"\"|'|"))
+      | (?P<number>(?<![\w.])(?:0[xXoObB][0-9a-fA-F_]+
+                   |(?:\d[\d_]*(?:\.[\d_]*)?|\.\d[\d_]*)(?:[eE][+-]?\d+)?[jJ]?)(?!\w))
+      | (?P<name>[^\W\d]\w*)
+    """, re.VERBOSE)
+
+    # Patterns matching the rest of a string up to and including its closing quote
+    STRING_END = {
+        "'": re.compile(r"(?:[^'\\\n]|\\.)*'"),
+        '"': re.compile(r'(?:[^"\\\n]|\\.)*"'),
+        "'''": re.compile(r"(?:[^'\\]|\\.|'(?!''))*'''", re.DOTALL),
+        '"""': re.compile(r'(?:[^"\\]|\\.|"(?!""))*"""', re.DOTALL),
+    }
+    TRIPLE_QUOTE_STATES = {"'''": STATE_TRIPLE_SINGLE, '"""': STATE_TRIPLE_DOUBLE}
+    STATE_TRIPLE_QUOTES = {STATE_TRIPLE_SINGLE: "'''", STATE_TRIPLE_DOUBLE: '"""'}
+
+    @staticmethod
+    def tokenize(text, state):
+        """Tokenizes one line starting in given state.
+
+        Returns list of (start, length, token class) runs and the state
+        in which the next line starts.
+        """
+        lexer = PythonLexer
+        runs = []
+        length = len(text)
+        pos = 0
+
+        # Continue multi-line string from previous line
+        quote = lexer.STATE_TRIPLE_QUOTES.get(state)
+        if quote:
+            match = lexer.STRING_END[quote].match(text)
+            if not match:
+                if length:
+                    runs.append((0, length, lexer.STRING))
+                return runs, state
+            pos = match.end()
+            runs.append((0, pos, lexer.STRING))
+
+        expected_name = None  # token class of name following 'class' or 'def'
+        while pos < length:
+            match = lexer.TOKEN_PATTERN.search(text, pos)
+            if not match:
+                break
+            kind = match.lastgroup
+            start = match.start()
+            if kind == 'name':
+                word = match.group()
+                if expected_name is not None:
+                    runs.append((start, len(word), expected_name))
+                    expected_name = None
+                elif word in lexer.KEYWORDS:
+                    runs.append((start, len(word), lexer.KEYWORD))
+                    if word == 'class':
+                        expected_name = lexer.CLASS_NAME
+                    elif word == 'def':
+                        expected_name = lexer.FUNCTION_NAME
+                pos = match.end()
+                continue
+            expected_name = None
+            if kind == 'comment':
+                runs.append((start, length - start, lexer.COMMENT))
+                break
+            if kind == 'number':
+                runs.append((start, match.end() - start, lexer.NUMBER))
+                pos = match.end()
+                continue
+            # String - find its end on this line
+            quote = match.group().lstrip('rRbBuUfF')
+            end_match = lexer.STRING_END[quote].match(text, match.end())
+            if not end_match:
+                runs.append((start, length - start, lexer.STRING))
+                return runs, lexer.TRIPLE_QUOTE_STATES.get(quote, lexer.STATE_NORMAL)
+            pos = end_match.end()
+            runs.append((start, pos - start, lexer.STRING))
+
+        return runs, lexer.STATE_NORMAL
+
+class TokenCache:
+    """Bounded LRU cache of lexer results keyed by block text and incoming state"""
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (text, state) -> (flat runs, end state)
+        self.hits = 0
+        self.misses = 0
+
+    def tokenize(self, text, state):
+        """Returns (runs, end state) where runs is a flat (start, length, token, ...) tuple"""
+        key = (text, state)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        runs, end_state = PythonLexer.tokenize(text, state)
+        entry = (tuple(value for run in runs for value in run), end_state)
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def formatStats(self):
+        return (f"Entries: {len(self.entries)}/{self.max_entries}\n"
+                f"Hits: {self.hits}\nMisses: {self.misses}\n"
+                f"Hit rate: {self.hitRate() * 100:.1f}%")
+
+class BlockData(QTextBlockUserData):
+    """Per-block analysis results that move with the block when lines are inserted"""
+
+    def __init__(self):
+        super().__init__()
+        self.semantic_runs = ()  # flat (start, length, token, ...) tuple
+        self.semantic_text = None  # block text the semantic runs were computed for
+        self.brackets = BracketIndex.EMPTY  # see BracketIndex.summarize
+        self.bracket_revision = None  # block revision the brackets were found in
+
+    @staticmethod
+    def of(block):
+        """Returns block's data, attaching a new instance if needed"""
+        data = block.userData()
+        if not isinstance(data, BlockData):
+            data = BlockData()
+            block.setUserData(data)
+        return data
+
+class ASTCache:
+    """Small thread-safe cache of parsed modules keyed by source hash"""
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # digest -> tree or SyntaxError
+        self.parsing = {}  # digest -> event set when the parse in progress ends
+        self.lock = threading.Lock()
+
+    def parse(self, code):
+        """Same as ast.parse(code), reusing the tree of identical code"""
+        key = hashlib.sha1(code.encode('utf-8', 'surrogatepass')).digest()
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    break
+                event = self.parsing.get(key)
+                if event is None:
+                    # Parse here, other threads asking for the same code wait for it
+                    event = self.parsing[key] = threading.Event()
+                    break
+            event.wait()
+        if entry is None:
+            try:
+                entry = ast.parse(code)
+            except SyntaxError as e:
+                entry = e
+            finally:
+                with self.lock:
+                    if entry is not None:
+                        self.entries[key] = entry
+                        while len(self.entries) > self.max_entries:
+                            self.entries.popitem(last=False)
+                    del self.parsing[key]
+                event.set()
+        if isinstance(entry, SyntaxError):
+            raise entry
+        return entry
+
+ast_cache = ASTCache()
+
+class SemanticAnalyzer:
+    """Classifies names of a parsed module for semantic highlighting"""
+    # Token classes
+    PARAMETER = 0
+    LOCAL = 1
+    GLOBAL = 2
+    BUILTIN = 3
+    IMPORT = 4
+    SELF_ATTRIBUTE = 5
+    TOKEN_COUNT = 6
+    TOKEN_NAMES = ('parameter', 'local', 'global', 'builtin', 'import', 'self_attribute')
+
+    BUILTINS = frozenset(name for name in dir(builtins) if not name.startswith('_')) - PythonLexer.KEYWORDS
+
+    FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+    COMPREHENSION_NODES = (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+
+    class Scope:
+        def __init__(self, kind, parent=None, params=(), body=(), self_name=None):
+            self.kind = kind  # 'module', 'class', 'function' or 'comprehension'
+            self.parent = parent
+            self.params = set(params)
+            self.locals, self.imports, self.declared = SemanticAnalyzer.collectBindings(body)
+            self.self_name = self_name
+
+    def __init__(self, tree, lines, is_cancelled=None):
+        self.tree = tree
+        self.lines = lines
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.runs = {}  # line index -> list of (start, length, token)
+
+    @staticmethod
+    def collectBindings(body):
+        """Returns (assigned, imported, declared global/nonlocal) names of a scope body"""
+        assigned, imported, declared = set(), set(), set()
+        stack = list(body)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, SemanticAnalyzer.FUNCTION_NODES + (ast.ClassDef,)):
+                assigned.add(node.name)
+                continue  # body is a separate scope
+            if isinstance(node, (ast.Lambda,) + SemanticAnalyzer.COMPREHENSION_NODES):
+                continue
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name != '*':
+                        imported.add((alias.asname or alias.name).split('.')[0])
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                declared.update(node.names)
+            elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                assigned.add(node.id)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                assigned.add(node.name)
+            stack.extend(ast.iter_child_nodes(node))
+        return assigned, imported, declared
+
+    def analyze(self):
+        """Returns {line index: flat (start, length, token, ...) tuple}, None if cancelled"""
+        module_scope = self.Scope('module', body=self.tree.body)
+        stack = [(node, module_scope) for node in reversed(self.tree.body)]
+        visited = 0
+        while stack:
+            visited += 1
+            if visited % 2000 == 0 and self.is_cancelled():
+                return None
+            node, scope = stack.pop()
+            children = self.visit(node, scope)
+            if children:
+                stack.extend(reversed(children))
+        return {line: tuple(value for run in sorted(runs) for value in run)
+                for line, runs in self.runs.items()}
+
+    def visit(self, node, scope):
+        """Records classification of node, returns (child, scope) pairs to visit"""
+        if isinstance(node, ast.JoinedStr):
+            return None  # f-string internals have no reliable positions
+        if isinstance(node, ast.Name):
+            token = self.lookup(node.id, scope)
+            if token is not None:
+                self.addRun(node.lineno, node.col_offset, len(node.id), token)
+            return None
+        if isinstance(node, ast.arg):
+            self.addRun(node.lineno, node.col_offset, len(node.arg), self.PARAMETER)
+            return [(node.annotation, scope.parent or scope)] if node.annotation else None
+        if isinstance(node, ast.Attribute):
+            value = node.value
+            if isinstance(value, ast.Name) and value.id == self.selfName(scope):
+                end_line = getattr(node, 'end_lineno', None)
+                if end_line is not None:
+                    self.addRun(end_line, node.end_col_offset - len(node.attr.encode('utf-8')),
+                                len(node.attr), self.SELF_ATTRIBUTE)
+            return [(value, scope)]
+        if isinstance(node, self.FUNCTION_NODES + (ast.Lambda,)):
+            args = node.args
+            arg_nodes = args.posonlyargs + args.args + args.kwonlyargs
+            arg_nodes += [arg for arg in (args.vararg, args.kwarg) if arg]
+            self_name = None
+            if scope.kind == 'class' and arg_nodes and not isinstance(node, ast.Lambda):
+                self_name = arg_nodes[0].arg
+            body = node.body if isinstance(node.body, list) else [node.body]
+            function_scope = self.Scope('function', scope, [arg.arg for arg in arg_nodes], body, self_name)
+            outer = list(args.defaults) + [d for d in args.kw_defaults if d is not None]
+            outer += getattr(node, 'decorator_list', [])
+            if getattr(node, 'returns', None):
+                outer.append(node.returns)
+            return ([(child, scope) for child in outer] +
+                    [(arg, function_scope) for arg in arg_nodes] +
+                    [(child, function_scope) for child in body])
+        if isinstance(node, ast.ClassDef):
+            class_scope = self.Scope('class', scope, body=node.body)
+            outer = node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]
+            return [(child, scope) for child in outer] + [(child, class_scope) for child in node.body]
+        if isinstance(node, self.COMPREHENSION_NODES):
+            targets = set()
+            for generator in node.generators:
+                for target in ast.walk(generator.target):
+                    if isinstance(target, ast.Name):
+                        targets.add(target.id)
+            comprehension_scope = self.Scope('comprehension', scope)
+            comprehension_scope.locals = targets
+            return [(child, comprehension_scope) for child in ast.iter_child_nodes(node)]
+        if isinstance(node, ast.alias):
+            if getattr(node, 'lineno', None) is not None and not node.asname and node.name != '*':
+                self.addRun(node.lineno, node.col_offset, len(node.name), self.IMPORT)
+            return None
+        return [(child, scope) for child in ast.iter_child_nodes(node)]
+
+    def lookup(self, name, scope):
+        """Classifies name as seen from scope, None if unknown"""
+        current = scope
+        while current is not None:
+            if current.kind == 'class' and current is not scope:
+                current = current.parent  # class bodies are not enclosing scopes
+                continue
+            if name in current.params:
+                return self.PARAMETER
+            if name in current.imports:
+                return self.IMPORT
+            if name in current.declared and current.kind != 'module':
+                while current.parent is not None:
+                    current = current.parent
+                continue
+            if name in current.locals:
+                return self.GLOBAL if current.kind == 'module' else self.LOCAL
+            current = current.parent
+        if name in self.BUILTINS:
+            return self.BUILTIN
+        return None
+
+    @staticmethod
+    def selfName(scope):
+        """Returns name of the self parameter of the nearest enclosing method"""
+        while scope is not None:
+            if scope.kind == 'function' and scope.self_name:
+                return scope.self_name
+            scope = scope.parent
+        return None
+
+    def addRun(self, lineno, byte_column, length, token):
+        """Records run, converting ast's UTF-8 byte column to a character column"""
+        index = lineno - 1
+        if not 0 <= index < len(self.lines):
+            return
+        line = self.lines[index]
+        column = byte_column
+        if not line.isascii():
+            column = len(line.encode('utf-8')[:byte_column].decode('utf-8', 'ignore'))
+        self.runs.setdefault(index, []).append((column, length, token))
+
+class SemanticWorker(QThread):
+    """Runs semantic analysis of a document snapshot off the GUI thread"""
+    analysisReady = pyqtSignal(int, object)  # document revision, {line: runs}
+
+    def __init__(self, code, revision):
+        super().__init__()
+        self.code = code
+        self.revision = revision
+        self.cancelled = False
+
+    def run(self):
+        try:
+            tree = ast_cache.parse(self.code)
+        except (SyntaxError, ValueError, RecursionError):
+            return  # keep previous results until code parses again
+        if self.cancelled:
+            return
+        lines = self.code.split('\n')
+        try:
+            result = SemanticAnalyzer(tree, lines, lambda: self.cancelled).analyze()
+        except RecursionError:
+            return
+        if result is not None and not self.cancelled:
+            self.analysisReady.emit(self.revision, result)
+
+class SemanticHighlighter(QObject):
+    """Schedules background semantic analysis and applies results to changed blocks"""
+
+    def __init__(self, editor, highlighter, delay_ms=400, slice_ms=8):
+        super().__init__(editor)
+        self.editor = editor
+        self.highlighter = highlighter
+        self.slice_time = slice_ms / 1000.0
+        self.applied = {}  # line index -> runs currently applied
+        self.pending = []  # (line index, runs) still to apply, in reverse order
+        self.pending_revision = -1
+        self.workers = []
+
+        self.analysisTimer = QTimer(self)
+        self.analysisTimer.setSingleShot(True)
+        self.analysisTimer.setInterval(delay_ms)
+        self.analysisTimer.timeout.connect(self.startAnalysis)
+
+        self.applyTimer = QTimer(self)
+        self.applyTimer.setInterval(0)
+        self.applyTimer.timeout.connect(self.applySlice)
+
+        editor.document().contentsChange.connect(self.onContentsChange)
+        editor.loadingFinished.connect(self.analysisTimer.start)
+
+    def onContentsChange(self, position, removed, added):
+        self.cancelWorkers()
+        self.analysisTimer.start()
+
+    def cancelWorkers(self):
+        for worker in self.workers:
+            worker.cancelled = True
+
+    def stop(self):
+        """Cancels analysis and waits for running workers, before the editor is deleted"""
+        self.analysisTimer.stop()
+        self.applyTimer.stop()
+        self.cancelWorkers()
+        for worker in list(self.workers):
+            worker.wait()
+
+    def startAnalysis(self):
+        if self.editor.loading:
+            return  # analysed once loading finishes
+        document = self.editor.document()
+        worker = SemanticWorker(document.toPlainText(), self.editor.text_revision)
+        worker.analysisReady.connect(self.onAnalysisReady)
+        worker.finished.connect(lambda: self.workers.remove(worker))
+        self.workers.append(worker)
+        worker.start(QThread.LowPriority)
+
+    def onAnalysisReady(self, revision, lines):
+        """Queues blocks whose semantic runs changed for re-highlighting"""
+        if revision != self.editor.text_revision:
+            return  # document changed meanwhile, a newer analysis is scheduled
+        changed = [(line, runs) for line, runs in lines.items() if self.applied.get(line) != runs]
+        changed += [(line, ()) for line in self.applied if line not in lines]
+        changed.sort(reverse=True)
+        self.pending = changed
+        self.pending_revision = revision
+        self.applyTimer.start()
+
+    def applySlice(self):
+        """Applies queued results for one time slice"""
+        document = self.editor.document()
+        if self.editor.text_revision != self.pending_revision:
+            self.pending = []
+        deadline = time.perf_counter() + self.slice_time
+        while self.pending and time.perf_counter() < deadline:
+            line, runs = self.pending.pop()
+            block = document.findBlockByNumber(line)
+            if not block.isValid():
+                continue
+            data = BlockData.of(block)
+            data.semantic_runs = runs
+            data.semantic_text = block.text()
+            if runs:
+                self.applied[line] = runs
+            else:
+                self.applied.pop(line, None)
+            self.highlighter.rehighlightBlock(block)
+        if not self.pending:
+            self.applyTimer.stop()
+
+# Main window style sheet, filled in from the palette of a theme
+STYLESHEET_TEMPLATE = string.Template("""
+    QMainWindow {
+        background-color: $background;
+        color: $text;
+    }
+    QMenuBar {
+        background-color: $background;
+        color: $text;
+        border-bottom: 1px solid $border;
+    }
+    QMenuBar::item {
+        padding: 5px 10px;
+        background-color: transparent;
+        border-radius: 4px;
+    }
+    QMenuBar::item:selected {
+        background-color: $border;
+    }
+    QMenu {
+        background-color: $background;
+        color: $text;
+        border: 1px solid $border;
+        border-radius: 4px;
+    }
+    QMenu::item {
+        padding: 5px 20px 5px 20px;
+    }
+    QMenu::item:selected {
+        background-color: $accent;
+        color: $accent_text;
+    }
+    QToolBar {
+        background-color: $panel;
+        border: none;
+        spacing: 3px;
+        padding: 3px;
+    }
+    QToolButton {
+        background-color: transparent;
+        border: 1px solid transparent;
+        border-radius: 4px;
+        padding: 5px;
+        color: $text;
+    }
+    QToolButton:hover {
+        background-color: $border;
+    }
+    QToolButton:pressed {
+        background-color: $pressed;
+    }
+    QDockWidget {
+        background-color: $background;
+        border: 1px solid $border;
+        color: $text;
+        border-radius: 4px;
+    }
+    QDockWidget::title {
+        background-color: $panel;
+        padding: 5px;
+        text-align: center;
+        color: $text;
+        border-bottom: 1px solid $border;
+    }
+    QTabWidget::pane {
+        border: 1px solid $border;
+        background-color: $background;
+        border-radius: 4px;
+    }
+    QTabBar::tab {
+        background-color: $panel;
+        padding: 8px 12px;
+        margin-right: 2px;
+        border: 1px solid $border;
+        border-bottom: none;
+        border-top-left-radius: 4px;
+        border-top-right-radius: 4px;
+        color: $text;
+    }
+    QTabBar::tab:selected {
+        background-color: $background;
+        border-bottom: 1px solid $background;
+    }
+    QStatusBar {
+        background-color: $accent;
+        color: $accent_text;
+        border-top: 1px solid $border;
+    }
+    QPlainTextEdit, QTextEdit {
+        background-color: $background;
+        color: $text;
+        selection-background-color: $accent;
+        border: 1px solid $border;
+        border-radius: 4px;
+    }
+    QTreeWidget {
+        background-color: $background;
+        color: $text;
+        alternate-background-color: $panel;
+        border: 1px solid $border;
+        border-radius: 4px;
+    }
+    QHeaderView::section {
+        background-color: $panel;
+        color: $text;
+        border: none;
+        border-bottom: 1px solid $border;
+        padding: 4px;
+    }
+    QListWidget {
+        background-color: $background;
+        color: $text;
+        alternate-background-color: $panel;
+        border: 1px solid $border;
+        border-radius: 4px;
+    }
+    QGroupBox {
+        color: $text;
+        border: 1px solid $border;
+        margin-top: 10px;
+        padding-top: 10px;
+        border-radius: 4px;
+        background-color: $panel;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        left: 10px;
+        padding: 0 5px 0 5px;
+        background-color: $panel;
+    }
+    QLineEdit, QComboBox {
+        background-color: $background;
+        color: $text;
+        border: 1px solid $border;
+        padding: 5px;
+        border-radius: 4px;
+    }
+    QPushButton {
+        background-color: $accent;
+        color: $accent_text;
+        border: none;
+        padding: 8px 15px;
+        border-radius: 4px;
+    }
+    QPushButton:hover {
+        background-color: $accent_hover;
+    }
+    QPushButton:pressed {
+        background-color: $accent_pressed;
+    }
+    QPushButton:disabled {
+        background-color: $pressed;
+        color: $disabled_text;
+    }
+""")
+
+class Theme:
+    """Color scheme with precomputed text formats for every highlighter token class"""
+    # Format property holding the token name, lets highlighted blocks be
+    # remapped to another theme without tokenizing them again
+    TOKEN_PROPERTY = QTextFormat.UserProperty + 1
+
+    def __init__(self, name, token_styles, colors, palette):
+        self.name = name
+        self.colors = {key: QColor(value) for key, value in colors.items()}
+        self.palette = {key: QColor(value) for key, value in palette.items()}
+        self.stylesheet = STYLESHEET_TEMPLATE.substitute(palette)
+        self.formats = {}
+        for token, style in token_styles.items():
+            color, *flags = style.split()
+            fmt = QTextCharFormat()
+            fmt.setForeground(QColor(color))
+            if 'bold' in flags:
+                fmt.setFontWeight(QFont.Bold)
+            if 'italic' in flags:
+                fmt.setFontItalic(True)
+            fmt.setProperty(self.TOKEN_PROPERTY, token)
+            self.formats[token] = fmt
+
+    def formatTable(self, token_names):
+        """Returns formats indexed by token class"""
+        return [self.formats[name] for name in token_names]
+
+THEMES = OrderedDict((theme.name, theme) for theme in [
+    Theme("Light",
+          token_styles={
+              'keyword': "#0078D4 bold",  # Windows 11 blue
+              'class': "#107C10 bold",  # Windows 11 green
+              'function': "#D83B01",  # Windows 11 orange
+              'string': "#A80000",  # Dark red
+              'comment': "#008000",  # Green
+              'number': "#AF00DB",  # Purple
+              'parameter': "#9B2393 italic",
+              'local': "#1F377F",
+              'global': "#0E7C86",
+              'builtin': "#795E26",
+              'import': "#267F99",
+              'self_attribute': "#6F42C1",
+          },
+          colors={
+              'current_line': "#E8F4FD",
+              'gutter_background': "#F3F3F3",
+              'gutter_text': "#666666",
+              'error_line': "#FFC8C8",
+              'execution_line': "#E6F3FF",
+              'find_match': "#FFFF00",
+              'bracket_match': "#C8E6C9",
+              'bracket_mismatch': "#FFB3B3",
+              'breakpoint': "#E51400",
+              'error_marker': "#F0A30A",
+              'coverage': "#57A64A",
+          },
+          palette={
+              'background': "#FFFFFF",
+              'text': "#000000",
+              'border': "#E1E1E1",
+              'panel': "#F8F8F8",
+              'pressed': "#CCCCCC",
+              'accent': "#0078D4",
+              'accent_hover': "#106EBE",
+              'accent_pressed': "#005A9E",
+              'accent_text': "#FFFFFF",
+              'disabled_text': "#666666",
+          }),
+    Theme("Dark",
+          token_styles={
+              'keyword': "#569CD6 bold",
+              'class': "#4EC9B0 bold",
+              'function': "#DCDCAA",
+              'string': "#CE9178",
+              'comment': "#6A9955",
+              'number': "#B5CEA8",
+              'parameter': "#9CDCFE italic",
+              'local': "#9CDCFE",
+              'global': "#4FC1FF",
+              'builtin': "#DCDCAA",
+              'import': "#4EC9B0",
+              'self_attribute': "#C586C0",
+          },
+          colors={
+              'current_line': "#2A2D2E",
+              'gutter_background': "#1E1E1E",
+              'gutter_text': "#858585",
+              'error_line': "#5A1D1D",
+              'execution_line': "#264F78",
+              'find_match': "#7A5C00",
+              'bracket_match': "#3A5A40",
+              'bracket_mismatch': "#7A2E2E",
+              'breakpoint': "#E51400",
+              'error_marker': "#CCA700",
+              'coverage': "#487E02",
+          },
+          palette={
+              'background': "#1E1E1E",
+              'text': "#D4D4D4",
+              'border': "#3C3C3C",
+              'panel': "#252526",
+              'pressed': "#505050",
+              'accent': "#0078D4",
+              'accent_hover': "#1C86E0",
+              'accent_pressed': "#005A9E",
+              'accent_text': "#FFFFFF",
+              'disabled_text': "#8A8A8A",
+          }),
+])
+DEFAULT_THEME = "Light"
 
 class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
+    # Block number, emitted when formats of a block are about to be applied
+    blockHighlighted = pyqtSignal(int)
+
+    def __init__(self, document, theme=None):
         super().__init__(document)
         
-        self.highlightingRules = []
-        
-        # Keyword format
-        keywordFormat = QTextCharFormat()
-        keywordFormat.setForeground(QColor("#0078D4"))  # Windows 11 blue
-        keywordFormat.setFontWeight(QFont.Bold)
-        keywords = [
-            'and', 'as', 'assert', 'break', 'class', 'continue', 'def',
-            'del', 'elif', 'else', 'except', 'False', 'finally', 'for',
-            'from', 'global', 'if', 'import', 'in', 'is', 'lambda',
-            'None', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return',
-            'True', 'try', 'while', 'with', 'yield'
-        ]
-        for word in keywords:
-            pattern = QRegExp("\\b" + word + "\\b")
-            rule = (pattern, keywordFormat)
-            self.highlightingRules.append(rule)
-        
-        # Class format
-        classFormat = QTextCharFormat()
-        classFormat.setForeground(QColor("#107C10"))  # Windows 11 green
-        classFormat.setFontWeight(QFont.Bold)
-        pattern = QRegExp("\\bclass\\s+(\\w+)")
-        rule = (pattern, classFormat)
-        self.highlightingRules.append(rule)
-        
-        # Function format
-        functionFormat = QTextCharFormat()
-        functionFormat.setForeground(QColor("#D83B01"))  # Windows 11 orange
-        pattern = QRegExp("\\bdef\\s+(\\w+)")
-        rule = (pattern, functionFormat)
-        self.highlightingRules.append(rule)
-        
-        # String format
-        stringFormat = QTextCharFormat()
-        stringFormat.setForeground(QColor("#A80000"))  # Dark red
-        pattern = QRegExp("\".*\"|'.*'")
-        rule = (pattern, stringFormat)
-        self.highlightingRules.append(rule)
-        
-        # Comment format
-        commentFormat = QTextCharFormat()
-        commentFormat.setForeground(QColor("#008000"))  # Green
-        pattern = QRegExp("#[^\n]*")
-        rule = (pattern, commentFormat)
-        self.highlightingRules.append(rule)
-        
-        # Number format
-        numberFormat = QTextCharFormat()
-        numberFormat.setForeground(QColor("#AF00DB"))  # Purple
-        pattern = QRegExp("\\b[0-9]+\\b")
-        rule = (pattern, numberFormat)
-        self.highlightingRules.append(rule)
+        # Background mode (see BackgroundHighlighter): blocks from frontier on are
+        # skipped unless they are in forced_range
+        self.frontier = None
+        self.forced_range = None
+        self.last_highlighted = -1
+        self.token_cache = TokenCache()
+        
+        # Format tables indexed by PythonLexer and SemanticAnalyzer token class
+        self.theme = theme or THEMES[DEFAULT_THEME]
+        self.formats = self.theme.formatTable(PythonLexer.TOKEN_NAMES)
+        self.semantic_formats = self.theme.formatTable(SemanticAnalyzer.TOKEN_NAMES)
 
     def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = QRegExp(pattern)
-            index = expression.indexIn(text)
-            while index >= 0:
-                length = expression.matchedLength()
-                self.setFormat(index, length, format)
-                index = expression.indexIn(text, index + length)
+        number = self.currentBlock().blockNumber()
+        if self.frontier is not None:
+            if not self.isBlockAllowed(number):
+                return
+            self.last_highlighted = number
+        self.blockHighlighted.emit(number)
+        
+        # QSyntaxHighlighter only moves on to the next block when the state
+        # set here differs from the one stored before, so an edit re-highlights
+        # just the blocks whose lexer state actually changes
+        state = max(self.previousBlockState(), PythonLexer.STATE_NORMAL)
+        runs, state = self.token_cache.tokenize(text, state)
+        formats = self.formats
+        for i in range(0, len(runs), 3):
+            self.setFormat(runs[i], runs[i + 1], formats[runs[i + 2]])
+        self.setCurrentBlockState(state)
+        
+        # Bracket summaries are refreshed with the lexer runs of the block
+        data = self.currentBlockUserData()
+        if not isinstance(data, BlockData):
+            data = BlockData()
+            self.setCurrentBlockUserData(data)
+        data.brackets = BracketIndex.summarize(text, runs)
+        data.bracket_revision = self.currentBlock().revision()
+        
+        # Semantic results are only valid while the block text is unchanged
+        if data.semantic_runs and data.semantic_text == text:
+            runs = data.semantic_runs
+            formats = self.semantic_formats
+            for i in range(0, len(runs), 3):
+                self.setFormat(runs[i], runs[i + 1], formats[runs[i + 2]])
+
+    def setTheme(self, theme):
+        """Switches format tables and remaps already highlighted blocks without re-lexing"""
+        if theme is self.theme:
+            return
+        self.theme = theme
+        self.formats = theme.formatTable(PythonLexer.TOKEN_NAMES)
+        self.semantic_formats = theme.formatTable(SemanticAnalyzer.TOKEN_NAMES)
         
-        self.setCurrentBlockState(0)
+        document = self.document()
+        if document is None:
+            return
+        formats = theme.formats
+        # Signals are blocked so the relayout is not taken for an edit, which
+        # would make QSyntaxHighlighter tokenize the blocks again
+        blocked = document.blockSignals(True)
+        try:
+            block = document.begin()
+            while block.isValid():
+                layout = block.layout()
+                ranges = layout.formats()
+                if ranges:
+                    for format_range in ranges:
+                        token = format_range.format.property(Theme.TOKEN_PROPERTY)
+                        if token in formats:
+                            format_range.format = formats[token]
+                    layout.setFormats(ranges)
+                block = block.next()
+            document.markContentsDirty(0, document.characterCount())
+        finally:
+            document.blockSignals(blocked)
+
+    def isBlockAllowed(self, number):
+        """Checks if block may be highlighted in background mode"""
+        if number < self.frontier:
+            return True
+        return self.forced_range is not None and self.forced_range[0] <= number <= self.forced_range[1]
+
+class BackgroundHighlighter(QObject):
+    """Highlights visible blocks of a large document first and the rest in idle time slices"""
+    finished = pyqtSignal()
+
+    def __init__(self, editor, highlighter, slice_ms=8):
+        super().__init__(editor)
+        self.editor = editor
+        self.highlighter = highlighter
+        self.slice_time = slice_ms / 1000.0
+        self.chunk_size = 200
+
+        # Sequential pass over the rest of the document
+        self.sliceTimer = QTimer(self)
+        self.sliceTimer.setInterval(0)
+        self.sliceTimer.timeout.connect(self.processSlice)
+
+        # Coalesces visible range requests from scrolling and edits
+        self.visibleTimer = QTimer(self)
+        self.visibleTimer.setSingleShot(True)
+        self.visibleTimer.setInterval(0)
+        self.visibleTimer.timeout.connect(self.highlightVisible)
+
+        editor.verticalScrollBar().valueChanged.connect(self.scheduleVisible)
+        editor.document().contentsChange.connect(self.scheduleVisible)
+
+    def isActive(self):
+        return self.highlighter.frontier is not None
+
+    def prepare(self):
+        """Switches highlighter to background mode before a large text is set"""
+        self.cancel()
+        self.highlighter.frontier = 0
+
+    def start(self):
+        """Highlights the viewport now and schedules the rest of the document"""
+        if not self.isActive():
+            return
+        self.highlightVisible()
+        self.sliceTimer.start()
+
+    def cancel(self):
+        """Stops background highlighting, blocks are highlighted normally again"""
+        self.sliceTimer.stop()
+        self.visibleTimer.stop()
+        self.highlighter.frontier = None
+        self.highlighter.forced_range = None
+
+    def scheduleVisible(self, *args):
+        if self.isActive():
+            self.visibleTimer.start()
+
+    def highlightVisible(self):
+        """Highlights not yet processed blocks in the viewport"""
+        if not self.isActive():
+            return
+        editor = self.editor
+        highlighter = self.highlighter
+        block = editor.firstVisibleBlock()
+        first = block.blockNumber()
+        offset = editor.contentOffset()
+        viewport_bottom = editor.viewport().rect().bottom()
+        while block.isValid():
+            if editor.blockBoundingGeometry(block).translated(offset).top() > viewport_bottom:
+                break
+            number = block.blockNumber()
+            if number >= highlighter.frontier:
+                # Widen the range one block at a time so highlighting does not
+                # cascade past the block being processed
+                highlighter.forced_range = (first, number)
+                highlighter.rehighlightBlock(block)
+            block = block.next()
+        highlighter.forced_range = None
+
+    def processSlice(self):
+        """Highlights blocks from the frontier onwards for one time slice"""
+        highlighter = self.highlighter
+        if not self.isActive():
+            self.sliceTimer.stop()
+            return
+        started = time.perf_counter()
+        document = self.editor.document()
+        start = highlighter.frontier
+        target = min(start + self.chunk_size, document.blockCount())
+        highlighter.frontier = target
+        block = document.findBlockByNumber(start)
+        while block.isValid() and block.blockNumber() < target:
+            # Highlighting cascades to following blocks while their state changes,
+            # so one call usually covers the whole chunk in a single edit block
+            highlighter.last_highlighted = block.blockNumber()
+            highlighter.rehighlightBlock(block)
+            block = document.findBlockByNumber(highlighter.last_highlighted + 1)
+        
+        # Adapt chunk size so that one slice takes about slice_time
+        elapsed = max(time.perf_counter() - started, 1e-4)
+        self.chunk_size = max(50, min(20000, int(self.chunk_size * self.slice_time / elapsed)))
+        
+        if target >= document.blockCount():
+            self.cancel()
+            self.finished.emit()
+
+class IdentifierIndex(QObject):
+    """Identifiers of a document, builtins and keywords in a sorted prefix index,
+    kept up to date from the blocks touched by each edit"""
+    IDENTIFIER = re.compile(r'[^\W\d]\w+')
+    # Lines around the cursor whose identifiers rank higher
+    PROXIMITY_LINES = 50
+    # Prefixes matching more identifiers are ranked from the frequency snapshot
+    SCAN_LIMIT = 1000
+    # More new or vanished identifiers than this re-sort the index in one go
+    BULK_UPDATE = 64
+
+    def __init__(self, editor, refresh_ms=500):
+        super().__init__(editor)
+        self.editor = editor
+        self.lines = [()]  # identifiers of each block
+        self.counts = {}  # identifier -> occurrences in the document
+        self.static_words = SemanticAnalyzer.BUILTINS | PythonLexer.KEYWORDS
+        self.keys = sorted((word.lower(), word) for word in self.static_words)
+        self.ranked = []  # (lowercase, identifier) by descending count, refreshed when edits pause
+        self.static_keys = list(self.keys)
+
+        self.rankTimer = QTimer(self)
+        self.rankTimer.setSingleShot(True)
+        self.rankTimer.setInterval(refresh_ms)
+        self.rankTimer.timeout.connect(self.updateRanking)
+
+        editor.document().contentsChange.connect(self.onContentsChange)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def onContentsChange(self, position, removed, added):
+        """Re-scans only the blocks covered by the change"""
+        document = self.editor.document()
+        end = min(position + added, document.characterCount() - 1)
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(end).blockNumber()
+        old_last = last - (document.blockCount() - len(self.lines))
+
+        block = document.findBlockByNumber(first)
+        new_lines = []
+        for _ in range(first, last + 1):
+            new_lines.append(tuple(self.IDENTIFIER.findall(block.text())))
+            block = block.next()
+
+        # Only net changes touch the index, retyping a line leaves it alone
+        delta = Counter(itertools.chain.from_iterable(new_lines))
+        delta.subtract(itertools.chain.from_iterable(self.lines[first:old_last + 1]))
+        self.lines[first:old_last + 1] = new_lines
+        self.applyDelta(delta)
+
+    def applyDelta(self, delta):
+        counts = self.counts
+        appeared = []
+        vanished = []
+        for word, change in delta.items():
+            if not change:
+                continue
+            count = counts.get(word, 0) + change
+            if count:
+                if count == change:
+                    appeared.append(word)
+                counts[word] = count
+            else:
+                del counts[word]
+                vanished.append(word)
+        appeared = [(word.lower(), word) for word in appeared if word not in self.static_words]
+        vanished = {(word.lower(), word) for word in vanished if word not in self.static_words}
+        if len(appeared) + len(vanished) > self.BULK_UPDATE:
+            keys = [key for key in self.keys if key not in vanished] if vanished else self.keys
+            self.keys = sorted(keys + appeared)
+        else:
+            for key in vanished:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+            for key in appeared:
+                bisect.insort(self.keys, key)
+        if appeared or vanished or delta:
+            self.rankTimer.start()
+
+    def updateRanking(self):
+        """Snapshots identifiers ordered by descending document count"""
+        counts = self.counts
+        self.ranked = [(word.lower(), word) for word in sorted(counts, key=counts.get, reverse=True)]
+
+    def complete(self, prefix, line, limit=50):
+        """Returns identifiers starting with prefix (ignoring case), most used
+        near line first, then most used in the document"""
+        lowered = prefix.lower()
+        keys = self.keys
+        start = bisect.bisect_left(keys, (lowered,))
+        end = bisect.bisect_left(keys, (lowered + '\U0010ffff',), start)
+        if start == end:
+            return []
+
+        nearby = {}
+        for words in self.lines[max(0, line - self.PROXIMITY_LINES):line + self.PROXIMITY_LINES + 1]:
+            for word in words:
+                nearby[word] = nearby.get(word, 0) + 1
+
+        if end - start <= self.SCAN_LIMIT:
+            candidates = [word for _, word in keys[start:end]]
+        else:
+            # Too many matches to rank one by one: take the most frequent ones
+            # from the snapshot, which matches are dense in, plus nearby ones
+            candidates = set()
+            for key, word in self.ranked:
+                if key.startswith(lowered):
+                    candidates.add(word)
+                    if len(candidates) >= limit:
+                        break
+            candidates.update(word for word in nearby if word.lower().startswith(lowered))
+            static_keys = self.static_keys
+            index = bisect.bisect_left(static_keys, (lowered,))
+            while index < len(static_keys) and static_keys[index][0].startswith(lowered):
+                candidates.add(static_keys[index][1])
+                index += 1
+
+        counts = self.counts
+        # The word being typed is in the document as well
+        return heapq.nlargest(limit, (word for word in candidates if word != prefix),
+                              key=lambda word: (nearby.get(word, 0), counts.get(word, 0), -len(word)))
+
+class PackageIndexer(QThread):
+    """Collects installed module names and their public top-level symbols
+    without importing anything in the IDE process"""
+    indexReady = pyqtSignal(object)  # module name -> tuple of symbols
+
+    CACHE_VERSION = 1
+    # Extension modules are introspected in a child interpreter, this many per run
+    INTROSPECT_BATCH = 64
+    INTROSPECT_TIMEOUT = 30
+    INTROSPECT_SCRIPT = (
+        "import json, sys\n"
+        "request = json.load(sys.stdin)\n"
+        "sys.path[:] = request['path']\n"
+        "symbols = {}\n"
+        "for name in request['modules']:\n"
+        "    try:\n"
+        "        module = __import__(name)\n"
+        "        symbols[name] = [n for n in dir(module) if not n.startswith('_')]\n"
+        "    except BaseException:\n"
+        "        pass\n"
+        "sys.stdout.write(json.dumps(symbols))\n"
+    )
+
+    def __init__(self, cache_path, paths):
+        super().__init__()
+        self.cache_path = cache_path
+        self.paths = paths
+        self.cancelled = False
+        self.process = None
+        self.source_suffixes = tuple(importlib.machinery.SOURCE_SUFFIXES)
+        self.extension_suffixes = tuple(importlib.machinery.EXTENSION_SUFFIXES)
+
+    def cancel(self):
+        self.cancelled = True
+        process = self.process
+        if process is not None:
+            process.kill()
+
+    def run(self):
+        cache = self.loadCache()
+        directories = cache.get('directories', {})
+        scanned = {}
+        stale = []
+        for path in self.paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            entry = directories.get(path)
+            if entry is not None and entry.get('mtime') == mtime:
+                scanned[path] = entry
+            else:
+                stale.append((path, mtime))
+
+        builtin_modules = cache.get('builtin')
+        if builtin_modules is not None:
+            self.indexReady.emit(self.merge(scanned, builtin_modules))
+        else:
+            builtin_modules = self.introspect(sorted(set(sys.builtin_module_names) - {'__main__'}))
+        if not stale and cache:
+            return
+
+        for path, mtime in stale:
+            if self.cancelled:
+                return
+            scanned[path] = {'mtime': mtime, 'modules': self.scanDirectory(path)}
+        self.indexReady.emit(self.merge(scanned, builtin_modules))
+        self.saveCache({'version': self.CACHE_VERSION, 'executable': sys.executable,
+                        'python': sys.version, 'directories': scanned, 'builtin': builtin_modules})
+
+    def merge(self, scanned, builtin_modules):
+        """Module names mapped to symbols, earlier path entries shadowing later ones"""
+        modules = {name: tuple(symbols) for name, symbols in builtin_modules.items()}
+        for path in self.paths:
+            entry = scanned.get(path)
+            if entry is not None:
+                for name, symbols in entry['modules'].items():
+                    modules.setdefault(name, tuple(symbols))
+        return modules
+
+    def loadCache(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        # Another interpreter has different modules even in shared directories
+        if (not isinstance(cache, dict) or cache.get('version') != self.CACHE_VERSION
+                or cache.get('executable') != sys.executable or cache.get('python') != sys.version):
+            return {}
+        return cache
+
+    def saveCache(self, cache):
+        directory = os.path.dirname(self.cache_path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.package_index-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(cache, file)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def scanDirectory(self, path):
+        """Indexes the top-level modules of one sys.path directory"""
+        modules = {}
+        extensions = []
+        try:
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        except OSError:
+            return modules
+        for entry in entries:
+            if self.cancelled:
+                break
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if not name.isidentifier() or name == '__pycache__':
+                    continue
+                submodules = self.submoduleNames(entry.path)
+                init = os.path.join(entry.path, '__init__.py')
+                if os.path.isfile(init):
+                    symbols = self.sourceSymbols(init)
+                elif submodules:
+                    symbols = []  # namespace package
+                else:
+                    continue
+                modules.setdefault(name, sorted(set(symbols) | set(submodules)))
+                for submodule in submodules:
+                    modules.setdefault(f"{name}.{submodule}", [])
+            elif name.endswith(self.source_suffixes):
+                module = name.rpartition('.')[0]
+                if module.isidentifier() and module not in modules:
+                    modules[module] = self.sourceSymbols(entry.path)
+            elif name.endswith(self.extension_suffixes):
+                module = name.partition('.')[0]
+                if module.isidentifier() and module not in modules:
+                    modules[module] = []
+                    extensions.append(module)
+        for module, symbols in self.introspect(extensions).items():
+            modules[module] = symbols
+        return modules
+
+    def submoduleNames(self, path):
+        names = set()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if entry.is_dir():
+                        if (name.isidentifier() and name != '__pycache__'
+                                and os.path.isfile(os.path.join(entry.path, '__init__.py'))):
+                            names.add(name)
+                    elif name.endswith(self.source_suffixes + self.extension_suffixes):
+                        module = name.partition('.')[0]
+                        if module.isidentifier() and module != '__init__':
+                            names.add(module)
+        except OSError:
+            pass
+        return sorted(names)
+
+    @staticmethod
+    def sourceSymbols(path):
+        """Public top-level names defined by a source file, __all__ if it is a literal"""
+        try:
+            with open(path, 'rb') as file:
+                tree = ast.parse(file.read())
+        except (OSError, SyntaxError, ValueError, RecursionError, MemoryError):
+            return []
+        names = set()
+        nodes = list(tree.body)
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        if target.id == '__all__' and isinstance(node.value, (ast.List, ast.Tuple)):
+                            exported = [element.value for element in node.value.elts
+                                        if isinstance(element, ast.Constant) and isinstance(element.value, str)]
+                            if len(exported) == len(node.value.elts):
+                                return sorted(set(exported))
+                        names.add(target.id)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name != '*':
+                        names.add((alias.asname or alias.name).split('.')[0])
+            elif isinstance(node, (ast.If, ast.Try)):
+                # Definitions guarded by version checks or optional imports
+                nodes.extend(node.body)
+                nodes.extend(node.orelse)
+                for handler in getattr(node, 'handlers', ()):
+                    nodes.extend(handler.body)
+        return sorted(name for name in names if not name.startswith('_'))
+
+    def introspect(self, modules):
+        """Public names of compiled modules, listed by a separate interpreter"""
+        symbols = {}
+        path = [entry for entry in self.paths if entry]
+        flags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        for start in range(0, len(modules), self.INTROSPECT_BATCH):
+            if self.cancelled:
+                break
+            request = json.dumps({'path': path, 'modules': modules[start:start + self.INTROSPECT_BATCH]})
+            try:
+                self.process = subprocess.Popen(
+                    [sys.executable, '-c', self.INTROSPECT_SCRIPT], stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=tempfile.gettempdir(),
+                    creationflags=flags)
+                output, _ = self.process.communicate(request.encode('utf-8'), timeout=self.INTROSPECT_TIMEOUT)
+                symbols.update(json.loads(output.decode('utf-8')))
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.communicate()
+            except (OSError, ValueError):
+                pass
+            finally:
+                self.process = None
+        return symbols
+
+class PackageIndex(QObject):
+    """Installed modules and their public symbols for import and attribute
+    completion, shared by all editors and persisted between sessions"""
+    indexUpdated = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.modules = {}  # module name -> tuple of public symbols
+        self.names = []  # sorted module names
+        self.indexer = None
+
+    def cachePath(self):
+        location = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+        return os.path.join(location or tempfile.gettempdir(), 'pyddle', 'package_index.json')
+
+    def start(self):
+        """Starts indexing in the background once per session"""
+        if self.indexer is not None:
+            return
+        # The script directory holds the user's code rather than installed packages
+        paths = [os.path.abspath(path) for path in sys.path[1:] if path and os.path.isdir(path)]
+        self.indexer = PackageIndexer(self.cachePath(), list(OrderedDict.fromkeys(paths)))
+        self.indexer.indexReady.connect(self.setModules)
+        self.indexer.start(QThread.LowestPriority)
+        QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+    def stop(self):
+        if self.indexer is not None and self.indexer.isRunning():
+            self.indexer.cancel()
+            self.indexer.wait()
+
+    def setModules(self, modules):
+        self.modules = modules
+        self.names = sorted(modules)
+        self.indexUpdated.emit()
+
+    def completeModule(self, dotted):
+        """Names completing the last component of a dotted module name"""
+        package, _, prefix = dotted.rpartition('.')
+        start = f"{package}.{prefix}" if package else prefix
+        names = self.names
+        index = bisect.bisect_left(names, start)
+        words = []
+        while index < len(names) and names[index].startswith(start):
+            rest = names[index][len(package) + 1 if package else 0:]
+            if '.' not in rest:
+                words.append(rest)
+            index += 1
+        return words
+
+    def completeSymbol(self, module, prefix):
+        """Public symbols of module starting with prefix, None for unknown modules"""
+        symbols = self.modules.get(module)
+        if symbols is None:
+            return None
+        return [symbol for symbol in symbols if symbol.startswith(prefix)]
+
+package_index = PackageIndex()
+
+class FoldWorker(QThread):
+    """Collects statement line spans of a document snapshot off the GUI thread"""
+    spansReady = pyqtSignal(int, object)  # document revision, {first line: last line}
+
+    def __init__(self, code, revision):
+        super().__init__()
+        self.code = code
+        self.revision = revision
+
+    def run(self):
+        # The whole snapshot on purpose: semantic highlighting, the outline and the
+        # syntax check parse the same revision, so this is usually an ast_cache hit
+        # and parsing only the edited statements would add a parse, not save one
+        try:
+            tree = ast_cache.parse(self.code)
+        except (SyntaxError, ValueError, RecursionError):
+            return  # indentation alone decides until code parses again
+        self.spansReady.emit(self.revision, self.statementSpans(tree))
+
+    @staticmethod
+    def statementSpans(tree):
+        """Lines (numbering from 0) covered by multi-line statements; for compound
+        statements only the first body, so else/except clauses fold separately"""
+        spans = {}
+        nodes = list(tree.body)
+        while nodes:
+            node = nodes.pop()
+            body = getattr(node, 'body', None)
+            if isinstance(body, list) and body:
+                end = body[-1].end_lineno
+                for field in ('body', 'orelse', 'finalbody'):
+                    nodes.extend(getattr(node, field, ()))
+                for handler in getattr(node, 'handlers', ()):
+                    nodes.extend(handler.body)
+                for case in getattr(node, 'cases', ()):
+                    nodes.extend(case.body)
+            else:
+                end = node.end_lineno
+            if end > node.lineno:
+                spans[node.lineno - 1] = end - 1
+        return spans
+
+class FoldIndex(QObject):
+    """Fold regions of a document from line indentation, refined by statement
+    spans of the last parse; both follow edits locally"""
+    foldsChanged = pyqtSignal()
+
+    def __init__(self, editor, delay_ms=500):
+        super().__init__(editor)
+        self.editor = editor
+        self.indents = [-1]  # indentation of each block, -1 for blank ones
+        self.spans = {}  # first line -> last line of multi-line statements
+        self.folded = {}  # first line -> last line of collapsed regions
+        self.worker = None
+
+        self.parseTimer = QTimer(self)
+        self.parseTimer.setSingleShot(True)
+        self.parseTimer.setInterval(delay_ms)
+        self.parseTimer.timeout.connect(self.startParse)
+
+        editor.document().contentsChange.connect(self.onContentsChange)
+        editor.loadingFinished.connect(self.parseTimer.start)
+        editor.cursorPositionChanged.connect(self.revealCursor)
+
+    @staticmethod
+    def indentation(text):
+        stripped = text.lstrip()
+        if not stripped:
+            return -1
+        return len(text[:len(text) - len(stripped)].expandtabs(4))
+
+    def onContentsChange(self, position, removed, added):
+        """Re-measures only the blocks covered by the change and shifts regions below it"""
+        document = self.editor.document()
+        end = min(position + added, document.characterCount() - 1)
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(end).blockNumber()
+        delta = document.blockCount() - len(self.indents)
+        old_last = last - delta
+
+        block = document.findBlockByNumber(first)
+        new_indents = []
+        for _ in range(first, last + 1):
+            new_indents.append(self.indentation(block.text()))
+            block = block.next()
+        self.indents[first:old_last + 1] = new_indents
+
+        if delta:
+            self.spans = self.shiftRegions(self.spans, first, old_last, delta)
+        if self.folded:
+            # Typing in a collapsed header keeps it collapsed, any other edit
+            # touching a collapsed region expands it
+            touched = {}
+            for start, stop in self.folded.items():
+                if start <= old_last and stop >= first and not (delta == 0 and first == last == start):
+                    touched[start] = stop
+            for start in touched:
+                del self.folded[start]
+            if delta:
+                self.folded = self.shiftRegions(self.folded, first, old_last, delta)
+            for start, stop in touched.items():
+                self.setLinesVisible(min(start, first), max(stop + delta, last))
+            if touched:
+                self.foldsChanged.emit()
+
+        if not self.editor.loading:
+            self.parseTimer.start()
+
+    @staticmethod
+    def shiftRegions(regions, first, old_last, delta):
+        """Moves regions by the lines inserted or removed between first and old_last,
+        dropping regions that start inside the change"""
+        shifted = {}
+        for start, stop in regions.items():
+            if start < first:
+                shifted[start] = stop + delta if stop >= first else stop
+            elif start > old_last:
+                shifted[start + delta] = stop + delta
+        return shifted
+
+    def startParse(self):
+        if self.editor.loading or self.worker is not None:
+            return
+        editor = self.editor
+        self.worker = FoldWorker(editor.document().toPlainText(), editor.text_revision)
+        self.worker.spansReady.connect(self.onSpansReady)
+        self.worker.finished.connect(self.onWorkerFinished)
+        self.worker.start(QThread.LowPriority)
+
+    def stop(self):
+        """Stops parsing, waiting for a running worker, before the editor is deleted"""
+        self.parseTimer.stop()
+        if self.worker is not None:
+            self.worker.wait()
+
+    def onWorkerFinished(self):
+        self.worker.wait()
+        revision = self.worker.revision
+        self.worker = None
+        if revision != self.editor.text_revision:
+            self.parseTimer.start()
+
+    def onSpansReady(self, revision, spans):
+        if revision == self.editor.text_revision:
+            self.spans = spans
+            self.foldsChanged.emit()
+
+    def foldEnd(self, line):
+        """Last line of the region folding under line, None if it folds nothing"""
+        indents = self.indents
+        count = len(indents)
+        if line >= count or indents[line] < 0:
+            return None
+        indent = indents[line]
+        end = line
+        following = line + 1
+        while following < count and indents[following] < 0:
+            following += 1
+        if following < count and indents[following] > indent:
+            while following < count and (indents[following] < 0 or indents[following] > indent):
+                if indents[following] >= 0:
+                    end = following
+                following += 1
+        end = min(max(end, self.spans.get(line, end)), count - 1)
+        return end if end > line else None
+
+    def isFoldable(self, line):
+        return self.foldEnd(line) is not None
+
+    def isFolded(self, line):
+        return line in self.folded
+
+    def fold(self, line):
+        """Collapses the region under line"""
+        end = self.foldEnd(line)
+        if end is None or line in self.folded:
+            return
+        self.folded[line] = end
+        self.setLinesHidden(line + 1, end)
+        # The cursor must not stay in a hidden line
+        cursor = self.editor.textCursor()
+        if line < cursor.blockNumber() <= end:
+            cursor.setPosition(self.editor.document().findBlockByNumber(line).position())
+            self.editor.setTextCursor(cursor)
+        self.foldsChanged.emit()
+
+    def unfold(self, line):
+        end = self.folded.pop(line, None)
+        if end is None:
+            return
+        self.setLinesVisible(line + 1, end)
+        self.foldsChanged.emit()
+
+    def toggleFold(self, line):
+        if line in self.folded:
+            self.unfold(line)
+        else:
+            self.fold(line)
+
+    def enclosingFold(self, line):
+        """Header of the innermost region containing line, including line itself"""
+        indents = self.indents
+        while line >= 0:
+            end = self.foldEnd(line)
+            if end is not None:
+                return line
+            # Move to the closest line above that is indented less
+            indent = indents[line]
+            line -= 1
+            while line >= 0 and (indents[line] < 0 or 0 <= indent <= indents[line]):
+                line -= 1
+        return None
+
+    def foldAll(self):
+        """Collapses every outermost region"""
+        line = 0
+        count = len(self.indents)
+        while line < count:
+            end = self.foldEnd(line)
+            if end is None:
+                line += 1
+                continue
+            if line not in self.folded:
+                self.folded[line] = end
+                self.setLinesHidden(line + 1, end)
+            line = end + 1
+        cursor = self.editor.textCursor()
+        if not cursor.block().isVisible():
+            self.editor.moveCursor(QTextCursor.Start)
+        self.foldsChanged.emit()
+
+    def unfoldAll(self):
+        if not self.folded:
+            return
+        self.folded = {}
+        self.setLinesVisible(0, len(self.indents) - 1)
+        self.foldsChanged.emit()
+
+    def foldingLine(self, line):
+        """Header of the outermost collapsed region hiding line, None if it is shown"""
+        headers = [start for start, stop in self.folded.items() if start < line <= stop]
+        return min(headers) if headers else None
+
+    def revealCursor(self):
+        """Expands regions hiding the cursor, as after find or go to line"""
+        line = self.editor.textCursor().blockNumber()
+        header = self.foldingLine(line)
+        while header is not None:
+            self.unfold(header)
+            header = self.foldingLine(line)
+
+    def setLinesHidden(self, first, last):
+        block = self.editor.document().findBlockByNumber(first)
+        for _ in range(first, last + 1):
+            block.setVisible(False)
+            # Hidden blocks take no lines, so the scroll range shrinks without a relayout
+            block.setLineCount(0)
+            block = block.next()
+        self.relayout()
+
+    def setLinesVisible(self, first, last):
+        """Shows lines first to last except those inside regions still collapsed"""
+        document = self.editor.document()
+        block = document.findBlockByNumber(first)
+        number = first
+        folded = self.folded
+        while number <= last and block.isValid():
+            block.setVisible(True)
+            block.setLineCount(max(1, block.layout().lineCount()))
+            stop = folded.get(number)
+            if stop is not None:
+                number = stop + 1
+                block = document.findBlockByNumber(number)
+            else:
+                number += 1
+                block = block.next()
+        self.relayout()
+
+    def relayout(self):
+        """Lets the editor lay out visible blocks again, the text is unchanged"""
+        layout = self.editor.document().documentLayout()
+        layout.requestUpdate()
+        layout.documentSizeChanged.emit(layout.documentSize())
+        self.editor.viewport().update()
+        self.editor.lineNumberArea.update()
+
+class BracketIndex(QObject):
+    """Matches brackets from per-block summaries in BlockData, filled in by the
+    highlighter, so lines between a pair are skipped without being rescanned"""
+    PAIRS = {'(': ')', '[': ']', '{': '}', ')': '(', ']': '[', '}': '{'}
+    OPENING = frozenset('([{')
+    BRACKET = re.compile(r'[()\[\]{}]')
+    EMPTY = ((), (), ())
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+
+    @staticmethod
+    def summarize(text, runs):
+        """Returns the (column, bracket) pairs of a line outside strings and comments,
+        then the closing ones left unmatched on it, then the opening ones left unmatched.
+
+        runs is a flat (start, length, token, ...) tuple of lexer runs.
+        """
+        if not BracketIndex.BRACKET.search(text):
+            return BracketIndex.EMPTY
+        # String and comment runs, which are the only ones that can hold brackets
+        skipped = [(runs[i], runs[i] + runs[i + 1]) for i in range(0, len(runs), 3)
+                   if runs[i + 2] in (PythonLexer.STRING, PythonLexer.COMMENT)]
+        brackets = []
+        skip = 0
+        for match in BracketIndex.BRACKET.finditer(text):
+            column = match.start()
+            while skip < len(skipped) and skipped[skip][1] <= column:
+                skip += 1
+            if skip < len(skipped) and skipped[skip][0] <= column:
+                continue
+            brackets.append((column, match.group()))
+
+        # Any closing bracket closes the last opening one, so unmatched closing
+        # brackets always come before unmatched opening ones
+        opening = []
+        closing = []
+        for bracket in brackets:
+            if bracket[1] in BracketIndex.OPENING:
+                opening.append(bracket)
+            elif opening:
+                opening.pop()
+            else:
+                closing.append(bracket)
+        return tuple(brackets), tuple(closing), tuple(opening)
+
+    def summary(self, block):
+        """Returns summary of a block, computing it for blocks the highlighter has not reached"""
+        data = block.userData()
+        if isinstance(data, BlockData) and data.bracket_revision == block.revision():
+            return data.brackets
+        state = max(block.previous().userState(), PythonLexer.STATE_NORMAL)
+        runs, _ = self.editor.highlighter.token_cache.tokenize(block.text(), state)
+        data = BlockData.of(block)
+        data.brackets = self.summarize(block.text(), runs)
+        data.bracket_revision = block.revision()
+        return data.brackets
+
+    def bracketAt(self, cursor):
+        """Returns (block, column, bracket) of the bracket after the cursor, else the one before it"""
+        block = cursor.block()
+        column = cursor.positionInBlock()
+        brackets = self.summary(block)[0]
+        if not brackets:
+            return None
+        found = None
+        for bracket_column, bracket in brackets:
+            if bracket_column == column:
+                return block, bracket_column, bracket
+            if bracket_column == column - 1:
+                found = (block, bracket_column, bracket)
+        return found
+
+    def findMatch(self, block, column, bracket):
+        """Returns (block, column, bracket) of the bracket paired with the one at
+        column, or None when it is unmatched"""
+        depth = 0
+        if bracket in self.OPENING:
+            for other_column, other in self.summary(block)[0]:
+                if other_column <= column:
+                    continue
+                if other in self.OPENING:
+                    depth += 1
+                elif depth:
+                    depth -= 1
+                else:
+                    return block, other_column, other
+            block = block.next()
+            while block.isValid():
+                _, closing, opening = self.summary(block)
+                if len(closing) > depth:
+                    return (block,) + closing[depth]
+                depth += len(opening) - len(closing)
+                block = block.next()
+        else:
+            for other_column, other in reversed(self.summary(block)[0]):
+                if other_column >= column:
+                    continue
+                if other not in self.OPENING:
+                    depth += 1
+                elif depth:
+                    depth -= 1
+                else:
+                    return block, other_column, other
+            block = block.previous()
+            while block.isValid():
+                _, closing, opening = self.summary(block)
+                if len(opening) > depth:
+                    return (block,) + opening[-1 - depth]
+                depth += len(closing) - len(opening)
+                block = block.previous()
+        return None
+
+    def matchAtCursor(self, cursor):
+        """Returns (bracket position, matching position or None, whether the pair matches)"""
+        found = self.bracketAt(cursor)
+        if found is None:
+            return None
+        block, column, bracket = found
+        match = self.findMatch(block, column, bracket)
+        position = block.position() + column
+        if match is None:
+            return position, None, False
+        match_block, match_column, match_bracket = match
+        return position, match_block.position() + match_column, self.PAIRS[bracket] == match_bracket
+
+class UndoEntry:
+    """One undoable change as hunks of (old start, old count, old text, new start,
+    new count, new text), line numbers counting from 0 and texts joined by newlines"""
+    __slots__ = ('hunks', 'size', 'time', 'compressed')
+
+    def __init__(self, hunks, time):
+        self.hunks = hunks
+        self.time = time
+        self.compressed = False
+        self.size = UndoEntry.measure(hunks)
+
+    @staticmethod
+    def measure(hunks):
+        """Approximate bytes held by hunks"""
+        return sum(len(hunk[2]) + len(hunk[5]) for hunk in hunks) + 64 * len(hunks)
+
+    def isSingleLine(self):
+        return (not self.compressed and len(self.hunks) == 1
+                and self.hunks[0][1] == self.hunks[0][4] == 1)
+
+    def compress(self):
+        self.hunks = zlib.compress(json.dumps(self.hunks, ensure_ascii=False)
+                                   .encode('utf-8', 'surrogatepass'))
+        self.size = len(self.hunks) + 64
+        self.compressed = True
+
+    def expandedHunks(self):
+        if not self.compressed:
+            return self.hunks
+        return json.loads(zlib.decompress(self.hunks).decode('utf-8', 'surrogatepass'))
+
+class UndoHistory(QObject):
+    """Undo and redo of a document as line diffs instead of QTextDocument's own stack,
+    which keeps whole replaced texts and is wiped by setPlainText
+
+    A shadow copy of the lines tells what each change replaced, only the lines
+    that differ are stored. Older large entries are compressed and the oldest
+    are dropped once the history needs more than memory_limit bytes."""
+    MEMORY_LIMIT = 32 * 1024 * 1024
+    # Edits of the same line closer together are undone as one
+    MERGE_MS = 1000
+    # Entries besides the newest ones are compressed when at least this large
+    UNCOMPRESSED_ENTRIES = 20
+    COMPRESS_SIZE = 4096
+    # and right away when at least this large
+    LARGE_ENTRY_SIZE = 1 << 20
+
+    def __init__(self, editor, memory_limit=None):
+        super().__init__(editor)
+        self.editor = editor
+        self.memory_limit = memory_limit or self.MEMORY_LIMIT
+        self.lines = ['']  # text of each block before the change being recorded
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0  # bytes held by both stacks
+        self.clean_depth = 0  # undo stack depth of the saved text, None once it cannot be reached
+        self.applying = False
+        self.mergeable = False
+        self.text_changed = False  # since the last contentsChanged
+        document = editor.document()
+        document.setUndoRedoEnabled(False)
+        document.contentsChange.connect(self.onContentsChange)
+        document.contentsChanged.connect(self.onContentsChanged)
+        document.modificationChanged.connect(self.onModificationChanged)
+        editor.loadingFinished.connect(self.reset)
+
+    def reset(self):
+        """Forgets the history, the current text becomes the saved one"""
+        document = self.editor.document()
+        lines = []
+        block = document.firstBlock()
+        while block.isValid():
+            lines.append(block.text())
+            block = block.next()
+        self.lines = lines
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+        self.clean_depth = 0
+        self.mergeable = False
+
+    def setClean(self, clean):
+        """Marks whether the current text is the saved one"""
+        self.clean_depth = len(self.undo_stack) if clean else None
+
+    def isUndoAvailable(self):
+        return bool(self.undo_stack)
+
+    def isRedoAvailable(self):
+        return bool(self.redo_stack)
+
+    def onModificationChanged(self, modified):
+        if self.applying:
+            return
+        if not modified:
+            self.setClean(True)
+            self.mergeable = False
+        elif not self.text_changed and not self.editor.loading and self.clean_depth == len(self.undo_stack):
+            # Without QTextDocument's undo stack, highlighting a block marks it modified too
+            self.editor.document().setModified(False)
+
+    def onContentsChange(self, position, removed, added):
+        """Updates the shadow lines and records what the change replaced"""
+        if self.editor.loading:
+            return
+        document = self.editor.document()
+        end = min(position + added, document.characterCount() - 1)
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(end).blockNumber()
+        old_last = last - (document.blockCount() - len(self.lines))
+
+        block = document.findBlockByNumber(first)
+        new_lines = []
+        for _ in range(first, last + 1):
+            new_lines.append(block.text())
+            block = block.next()
+        old_lines = self.lines[first:old_last + 1]
+        self.lines[first:old_last + 1] = new_lines
+        # Format changes are reported as changes as well
+        if old_lines == new_lines:
+            return
+        self.text_changed = True
+        if not self.applying:
+            self.record(self.diff(first, old_lines, new_lines))
+
+    def onContentsChanged(self):
+        self.text_changed = False
+
+    @staticmethod
+    def diff(first, old_lines, new_lines):
+        """Returns hunks turning old_lines into new_lines, both starting at line first"""
+        start = 0
+        common = min(len(old_lines), len(new_lines))
+        while start < common and old_lines[start] == new_lines[start]:
+            start += 1
+        old_end, new_end = len(old_lines), len(new_lines)
+        while old_end > start and new_end > start and old_lines[old_end - 1] == new_lines[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+        old_lines = old_lines[start:old_end]
+        new_lines = new_lines[start:new_end]
+        first += start
+
+        if len(old_lines) == len(new_lines):
+            # Same line count, as after most replacements: runs of changed lines
+            changed = [index for index, (old, new) in enumerate(zip(old_lines, new_lines)) if old != new]
+            opcodes = []
+            for index in changed:
+                if opcodes and opcodes[-1][2] == index:
+                    opcodes[-1][2] = opcodes[-1][4] = index + 1
+                else:
+                    opcodes.append([None, index, index + 1, index, index + 1])
+        else:
+            opcodes = []
+            old_index = new_index = 0
+            for i, j, size in UndoHistory.matchingBlocks(old_lines, new_lines):
+                if i > old_index or j > new_index:
+                    opcodes.append((None, old_index, i, new_index, j))
+                old_index, new_index = i + size, j + size
+            if old_index < len(old_lines) or new_index < len(new_lines):
+                opcodes.append((None, old_index, len(old_lines), new_index, len(new_lines)))
+
+        return [(first + i1, i2 - i1, '\n'.join(old_lines[i1:i2]),
+                 first + j1, j2 - j1, '\n'.join(new_lines[j1:j2]))
+                for _, i1, i2, j1, j2 in opcodes]
+
+    @staticmethod
+    def matchingBlocks(old_lines, new_lines):
+        """Sorted (old index, new index, count) runs of equal lines, anchored on lines
+        that occur once in both ranges like patience diff; linear with a hash map, where
+        SequenceMatcher turns quadratic on repeated lines or coarse with autojunk"""
+        matches = []
+        ranges = [(0, len(old_lines), 0, len(new_lines))]
+        while ranges:
+            old_start, old_end, new_start, new_end = ranges.pop()
+            # Equal lines at both ends
+            while old_start < old_end and new_start < new_end and old_lines[old_start] == new_lines[new_start]:
+                matches.append((old_start, new_start, 1))
+                old_start += 1
+                new_start += 1
+            while old_end > old_start and new_end > new_start and old_lines[old_end - 1] == new_lines[new_end - 1]:
+                old_end -= 1
+                new_end -= 1
+                matches.append((old_end, new_end, 1))
+            if old_start == old_end or new_start == new_end:
+                continue
+
+            # Lines unique on both sides, kept in the longest run increasing on both
+            old_unique = {}
+            for index in range(old_start, old_end):
+                line = old_lines[index]
+                old_unique[line] = None if line in old_unique else index
+            new_unique = {}
+            for index in range(new_start, new_end):
+                line = new_lines[index]
+                if old_unique.get(line) is not None:
+                    new_unique[line] = None if line in new_unique else index
+            pairs = sorted((old_unique[line], index) for line, index in new_unique.items() if index is not None)
+            tails = []  # new index ending the best run of each length
+            tail_pairs = []
+            previous = {}
+            for pair in pairs:
+                length = bisect.bisect_left(tails, pair[1])
+                previous[pair] = tail_pairs[length - 1] if length else None
+                if length == len(tails):
+                    tails.append(pair[1])
+                    tail_pairs.append(pair)
+                else:
+                    tails[length] = pair[1]
+                    tail_pairs[length] = pair
+            anchors = []
+            pair = tail_pairs[-1] if tail_pairs else None
+            while pair is not None:
+                anchors.append(pair)
+                pair = previous[pair]
+            if not anchors:
+                if (old_end - old_start) * (new_end - new_start) <= 1 << 16:
+                    # Small gap without anchors, cheap to match exactly
+                    matcher = difflib.SequenceMatcher(None, old_lines[old_start:old_end],
+                                                      new_lines[new_start:new_end], autojunk=False)
+                    matches.extend((old_start + i, new_start + j, size)
+                                   for i, j, size in matcher.get_matching_blocks() if size)
+                continue  # otherwise replaced as a whole
+
+            # Lines between anchors are matched again on their own
+            anchors.reverse()
+            for old_index, new_index in anchors:
+                matches.append((old_index, new_index, 1))
+                ranges.append((old_start, old_index, new_start, new_index))
+                old_start, new_start = old_index + 1, new_index + 1
+            ranges.append((old_start, old_end, new_start, new_end))
+
+        matches.sort()
+        blocks = []
+        for i, j, size in matches:
+            if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+                blocks[-1][2] += size
+            else:
+                blocks.append([i, j, size])
+        return blocks
+
+    def record(self, hunks):
+        now = time.monotonic()
+        self.dropRedo()
+        if self.clean_depth is not None and self.clean_depth > len(self.undo_stack):
+            self.clean_depth = None
+        top = self.undo_stack[-1] if self.undo_stack else None
+        if (self.mergeable and top is not None and top.isSingleLine()
+                and len(hunks) == 1 and hunks[0][1] == hunks[0][4] == 1
+                and hunks[0][0] == top.hunks[0][3]
+                and now - top.time < self.MERGE_MS / 1000.0):
+            line, _, old_text = top.hunks[0][:3]
+            top.hunks = [(line, 1, old_text, line, 1, hunks[0][5])]
+            self.size -= top.size
+            top.size = UndoEntry.measure(top.hunks)
+            self.size += top.size
+            top.time = now
+        else:
+            self.push(UndoEntry(hunks, now))
+        self.mergeable = True
+
+    def push(self, entry):
+        if entry.size >= self.LARGE_ENTRY_SIZE:
+            entry.compress()
+        self.undo_stack.append(entry)
+        self.size += entry.size
+        if len(self.undo_stack) > self.UNCOMPRESSED_ENTRIES:
+            old = self.undo_stack[-1 - self.UNCOMPRESSED_ENTRIES]
+            if not old.compressed and old.size >= self.COMPRESS_SIZE:
+                self.size -= old.size
+                old.compress()
+                self.size += old.size
+        # Oldest first, the newest entry always stays undoable
+        while self.size > self.memory_limit and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft().size
+            if self.clean_depth is not None:
+                self.clean_depth = self.clean_depth - 1 if self.clean_depth else None
+
+    def dropRedo(self):
+        for entry in self.redo_stack:
+            self.size -= entry.size
+        self.redo_stack.clear()
+
+    def undo(self):
+        if not self.undo_stack:
+            return
+        entry = self.undo_stack.pop()
+        self.apply([(start, count, old_count, old_text, new_text)
+                    for _, old_count, old_text, start, count, new_text in entry.expandedHunks()])
+        self.redo_stack.append(entry)
+
+    def redo(self):
+        if not self.redo_stack:
+            return
+        entry = self.redo_stack.pop()
+        # On the undo stack first, apply() compares its depth with the saved one
+        self.undo_stack.append(entry)
+        self.apply([(start, count, new_count, new_text, old_text)
+                    for start, count, old_text, _, new_count, new_text in entry.expandedHunks()])
+
+    def apply(self, replacements):
+        """Replaces (start, count, new count, text, replaced text) line ranges as one edit"""
+        editor = self.editor
+        document = editor.document()
+        cursor = QTextCursor(document)
+        self.applying = True
+        try:
+            cursor.beginEditBlock()
+            # Last first, so line numbers of the others stay valid
+            for start, count, text_count, text, _ in reversed(replacements):
+                self.replaceLines(cursor, start, count, text_count, text)
+            cursor.endEditBlock()
+        finally:
+            self.applying = False
+        self.mergeable = False
+        document.setModified(self.clean_depth != len(self.undo_stack))
+
+        # Cursor after the restored text of the first hunk, before the text it shares with what was replaced
+        start, _, text_count, text, replaced = replacements[0]
+        prefix = len(os.path.commonprefix([text, replaced]))
+        suffix = len(os.path.commonprefix([text[prefix:][::-1], replaced[prefix:][::-1]]))
+        offset = max(prefix, len(text) - suffix) if text_count else 0
+        block = document.findBlockByNumber(min(start, document.blockCount() - 1))
+        cursor.setPosition(min(block.position() + offset, document.characterCount() - 1))
+        editor.setTextCursor(cursor)
+
+    def replaceLines(self, cursor, start, count, text_count, text):
+        """Replaces count lines at start with text_count lines of text"""
+        document = self.editor.document()
+        if not count:
+            # Insertion of whole lines before start, or after the last one
+            if start < document.blockCount():
+                cursor.setPosition(document.findBlockByNumber(start).position())
+                cursor.insertText(text + '\n')
+            else:
+                cursor.movePosition(QTextCursor.End)
+                cursor.insertText('\n' + text)
+            return
+        first = document.findBlockByNumber(start)
+        last = document.findBlockByNumber(start + count - 1)
+        if text_count:
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+        elif last.next().isValid():
+            # Removal of whole lines with the line break after them
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.next().position(), QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+        else:
+            # or with the one before, when they are the last lines
+            cursor.setPosition(first.position() - 1)
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+
+    def replaceAll(self, text):
+        """Replaces the whole text as one undoable change touching only the lines that differ"""
+        hunks = self.diff(0, self.lines, text.split('\n'))
+        if not hunks:
+            return
+        cursor = QTextCursor(self.editor.document())
+        # Recorded from these hunks, the edit block would otherwise be diffed again
+        self.applying = True
+        try:
+            cursor.beginEditBlock()
+            for start, count, _, _, text_count, new_text in reversed(hunks):
+                self.replaceLines(cursor, start, count, text_count, new_text)
+            cursor.endEditBlock()
+        finally:
+            self.applying = False
+        self.mergeable = False
+        self.record(hunks)
 
 class LineNumberArea(QWidget):
     def __init__(self, editor):
@@ -134,19 +2327,252 @@ class LineNumberArea(QWidget):
     def paintEvent(self, event):
         self.codeEditor.lineNumberAreaPaintEvent(event)
 
+    def mousePressEvent(self, event):
+        self.codeEditor.lineNumberAreaMousePressEvent(event)
+
+class Minimap(QWidget):
+    """Downscaled overview of the document next to the editor, rendered from
+    highlighter formats into cached tiles that are redrawn only when their blocks change"""
+    WIDTH = 100
+    LINE_HEIGHT = 2  # pixels per line, a character is one pixel wide
+    TILE_LINES = 256
+    MAX_TILES = 16
+    NON_SPACE = re.compile(r'\S+')
+
+    def __init__(self, editor, delay_ms=50):
+        super().__init__(editor)
+        self.editor = editor
+        self.tiles = OrderedDict()  # tile index -> QImage, least recently painted first
+        self.block_count = 1
+        self.top_line = 0  # first line shown, long documents scroll along with the editor
+        self.setCursor(Qt.PointingHandCursor)
+
+        # Edits only drop tiles, repainting waits until typing pauses
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(delay_ms)
+        self.updateTimer.timeout.connect(self.update)
+
+        editor.document().contentsChange.connect(self.onContentsChange)
+        editor.highlighter.blockHighlighted.connect(self.onBlockHighlighted)
+        editor.verticalScrollBar().valueChanged.connect(self.update)
+        editor.markersChanged.connect(self.onMarkersChanged)
+
+    def onContentsChange(self, position, removed, added):
+        """Drops tiles of the changed blocks, and all tiles below when lines were added or removed"""
+        document = self.editor.document()
+        first = document.findBlock(position).blockNumber() // self.TILE_LINES
+        count = document.blockCount()
+        if count != self.block_count:
+            self.block_count = count
+            last = None
+        else:
+            end = min(position + added, document.characterCount() - 1)
+            last = document.findBlock(end).blockNumber() // self.TILE_LINES
+        for index in list(self.tiles):
+            if index >= first and (last is None or index <= last):
+                del self.tiles[index]
+        self.updateTimer.start()
+
+    def onBlockHighlighted(self, number):
+        """Formats of a block changed, possibly far from the edit (e.g. an opened string)"""
+        if self.tiles.pop(number // self.TILE_LINES, None) is not None:
+            self.updateTimer.start()
+
+    def onMarkersChanged(self, kind):
+        if kind in (CodeEditor.MARKER_ERROR, CodeEditor.MARKER_SEARCH):
+            self.update()
+
+    def invalidate(self):
+        """Drops every tile, called when the theme or size changes"""
+        self.tiles.clear()
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if event.size().width() != event.oldSize().width():
+            self.tiles.clear()
+
+    def visibleLines(self):
+        """First and last line shown in the editor"""
+        editor = self.editor
+        first = editor.firstVisibleBlock().blockNumber()
+        bottom = editor.cursorForPosition(QPoint(0, editor.viewport().height() - 1))
+        return first, max(first, bottom.blockNumber())
+
+    def updateTopLine(self, first, last):
+        """Scrolls the minimap in proportion to the editor when the document does not fit"""
+        lines = self.editor.blockCount()
+        rows = max(1, self.height() // self.LINE_HEIGHT)
+        if lines <= rows:
+            self.top_line = 0
+        else:
+            scrollable = max(1, lines - (last - first + 1))
+            self.top_line = min(lines - rows, first * (lines - rows) // scrollable)
+
+    def tile(self, index):
+        image = self.tiles.get(index)
+        if image is None:
+            image = self.renderTile(index)
+            self.tiles[index] = image
+            while len(self.tiles) > self.MAX_TILES:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(index)
+        return image
+
+    def renderTile(self, index):
+        """Draws the non-blank runs of a tile's lines in their highlighted colors"""
+        editor = self.editor
+        width = self.width()
+        line_height = self.LINE_HEIGHT
+        image = QImage(width, self.TILE_LINES * line_height, QImage.Format_RGB32)
+        image.fill(editor.theme.palette['background'])
+        text_color = QColor(editor.theme.palette['text'])
+        text_color.setAlpha(160)
+        non_space = self.NON_SPACE
+
+        painter = QPainter(image)
+        block = editor.document().findBlockByNumber(index * self.TILE_LINES)
+        y = 0
+        for _ in range(self.TILE_LINES):
+            if not block.isValid():
+                break
+            text = block.text()[:width]
+            if text.strip():
+                for match in non_space.finditer(text):
+                    painter.fillRect(match.start(), y, match.end() - match.start(), line_height - 1, text_color)
+                for format_range in block.layout().formats():
+                    brush = format_range.format.foreground()
+                    if brush.style() == Qt.NoBrush or format_range.start >= len(text):
+                        continue
+                    color = QColor(brush.color())
+                    color.setAlpha(200)
+                    end = format_range.start + format_range.length
+                    for match in non_space.finditer(text, format_range.start, end):
+                        painter.fillRect(match.start(), y, match.end() - match.start(), line_height - 1, color)
+            block = block.next()
+            y += line_height
+        painter.end()
+        return image
+
+    def paintEvent(self, event):
+        editor = self.editor
+        colors = editor.theme.colors
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), editor.theme.palette['background'])
+
+        first, last = self.visibleLines()
+        self.updateTopLine(first, last)
+        line_height = self.LINE_HEIGHT
+        top = self.top_line
+        bottom = min(editor.blockCount(), top + self.height() // line_height + 1)
+        for index in range(top // self.TILE_LINES, (bottom - 1) // self.TILE_LINES + 1):
+            painter.drawImage(0, (index * self.TILE_LINES - top) * line_height, self.tile(index))
+
+        # Search matches as bars across the minimap, errors at its right edge
+        width = self.width()
+        for kind, color, left in ((CodeEditor.MARKER_SEARCH, colors['find_match'], 0),
+                                  (CodeEditor.MARKER_ERROR, colors['error_marker'], width - 6)):
+            for line in editor.line_markers[kind]:
+                if top <= line < bottom:
+                    painter.fillRect(left, (line - top) * line_height - 1, width - left,
+                                     line_height + 2, color)
+
+        # Lines shown in the editor
+        shade = QColor(editor.theme.palette['text'])
+        shade.setAlpha(32)
+        painter.fillRect(0, (first - top) * line_height, width,
+                         (last - first + 1) * line_height, shade)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.scrollTo(event.y())
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            self.scrollTo(event.y())
+
+    def scrollTo(self, y):
+        """Centers the editor on the line under y"""
+        editor = self.editor
+        line = min(editor.blockCount() - 1, self.top_line + max(0, y) // self.LINE_HEIGHT)
+        block = editor.document().findBlockByNumber(line)
+        rows = editor.viewport().height() // max(1, editor.fontMetrics().height())
+        editor.verticalScrollBar().setValue(block.firstLineNumber() - rows // 2)
+
 class CodeEditor(QPlainTextEdit):
+    # Documents with more lines are highlighted in the background
+    BACKGROUND_HIGHLIGHT_LINES = 5000
+    
+    # Typed characters needed before completions pop up
+    COMPLETION_PREFIX_LENGTH = 2
+    # Completion contexts served by the package index
+    IMPORT_CONTEXT = re.compile(r'^\s*import\s+(?:[\w.]+(?:\s+as\s+\w+)?\s*,\s*)*([\w.]*)$')
+    FROM_CONTEXT = re.compile(r'^\s*from\s+([\w.]*)$')
+    FROM_IMPORT_CONTEXT = re.compile(
+        r'^\s*from\s+([\w.]+)\s+import\s+\(?\s*(?:\w+(?:\s+as\s+\w+)?\s*,\s*)*(\w*)$')
+    ATTRIBUTE_CONTEXT = re.compile(r'(?<![\w.])([^\W\d][\w.]*)\.(\w*)$')
+    IMPORT_ALIAS = re.compile(r'^\s*import\s+(.+)')
+    
+    # Keys moving every cursor when there are several
+    CURSOR_MOVES = {
+        Qt.Key_Left: QTextCursor.Left,
+        Qt.Key_Right: QTextCursor.Right,
+        Qt.Key_Up: QTextCursor.Up,
+        Qt.Key_Down: QTextCursor.Down,
+        Qt.Key_Home: QTextCursor.StartOfLine,
+        Qt.Key_End: QTextCursor.EndOfLine,
+    }
+    
+    # Gutter marker kinds
+    MARKER_BREAKPOINT = 'breakpoint'
+    MARKER_ERROR = 'error'
+    MARKER_COVERAGE = 'coverage'
+    MARKER_SEARCH = 'search'  # shown on the minimap only
+    COVERAGE_MARKER_WIDTH = 3
+    
+    # Emitted when a file finished streaming in, analysis waits for it
+    loadingFinished = pyqtSignal()
+    breakpointToggled = pyqtSignal(int, bool)  # line (numbering from 0), enabled
+    markersChanged = pyqtSignal(str)  # marker kind
+    
     def __init__(self):
         super().__init__()
+        self.loading = False
+        self.extra_cursors = []  # cursors besides textCursor(), edited together with it
+        self.column_anchor = None  # (line, column) where a column selection started
+        self.line_markers = {self.MARKER_BREAKPOINT: set(), self.MARKER_ERROR: set(),
+                             self.MARKER_COVERAGE: set(), self.MARKER_SEARCH: set()}
+        self.minimap = None
         self.lineNumberArea = LineNumberArea(self)
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
         self.updateRequest.connect(self.updateLineNumberArea)
         self.cursorPositionChanged.connect(self.highlightCurrentLine)
-        self.updateLineNumberAreaWidth(0)
+        self.updateGutterMetrics()
+        
+        # Incremented on every text change, unlike QTextDocument.revision()
+        # which also changes when the highlighter applies formats
+        self.text_revision = 0
+        self.marker_block_count = 1  # block count markers were last shifted for
+        self.document().contentsChange.connect(self.onContentsChange)
+        self.undoHistory = UndoHistory(self)
+        # Latest outline and lint results as kind -> (text revision, result), saved with the session
+        self.analysis_results = {}
         
         self.setFont(QFont("Cascadia Code", 10))
-        self.highlighter = PythonHighlighter(self.document())
+        self.theme = THEMES[DEFAULT_THEME]
+        self.highlighter = PythonHighlighter(self.document(), self.theme)
+        self.backgroundHighlighter = BackgroundHighlighter(self, self.highlighter)
+        self.semanticHighlighter = SemanticHighlighter(self, self.highlighter)
+        self.minimap = Minimap(self)
+        self.updateViewportMargins()
         
         # Ustawienia dla autouzupełniania
+        self.identifierIndex = IdentifierIndex(self)
+        self.foldIndex = FoldIndex(self)
+        self.foldIndex.foldsChanged.connect(self.lineNumberArea.update)
+        self.bracketIndex = BracketIndex(self)
         self.completer = QCompleter([])
         self.completer.setWidget(self)
         self.completer.setCompletionMode(QCompleter.PopupCompletion)
@@ -156,61 +2582,398 @@ class CodeEditor(QPlainTextEdit):
         # Słownik dla podpowiedzi AI
         self.ai_suggestions = {}
 
+    def onContentsChange(self, position, removed, added):
+        self.text_revision += 1
+        block_count = self.blockCount()
+        delta = block_count - self.marker_block_count
+        self.marker_block_count = block_count
+        if delta:
+            self.shiftLineMarkers(position, added, delta)
+
+    def shiftLineMarkers(self, position, added, delta):
+        """Moves markers below a change by the lines it inserted or removed, markers
+        on removed lines are dropped"""
+        document = self.document()
+        block = document.findBlock(position)
+        first = block.blockNumber()
+        if position == block.position():
+            # Lines inserted or removed at the start of a line go above its
+            # remaining text, which moves with its markers
+            first -= 1
+            last = first + max(delta, 0)
+        else:
+            end = min(position + added, document.characterCount() - 1)
+            last = document.findBlock(end).blockNumber()
+        old_last = last - delta
+        for kind, lines in self.line_markers.items():
+            if not lines or max(lines) <= first:
+                continue
+            self.line_markers[kind] = {line + delta if line > old_last else line
+                                       for line in lines if line <= first or line > old_last or line <= last}
+            self.markersChanged.emit(kind)
+        self.lineNumberArea.update()
+
+    def shutdown(self):
+        """Stops background analysis threads so the editor can be deleted"""
+        self.semanticHighlighter.stop()
+        self.foldIndex.stop()
+
+    def setLoading(self, loading):
+        """Marks text as incomplete while a file is being loaded"""
+        self.loading = loading
+        self.clearExtraCursors()
+        if not loading:
+            self.loadingFinished.emit()
+
+    def setPlainText(self, text):
+        """Sets text, highlighting large documents viewport-first in the background"""
+        large = text.count('\n') >= self.BACKGROUND_HIGHLIGHT_LINES
+        if large:
+            self.backgroundHighlighter.prepare()
+        else:
+            self.backgroundHighlighter.cancel()
+        self.clearExtraCursors()
+        super().setPlainText(text)
+        self.undoHistory.reset()
+        if large:
+            self.backgroundHighlighter.start()
+
+    def clear(self):
+        self.clearExtraCursors()
+        super().clear()
+        self.undoHistory.reset()
+
+    def replaceAllText(self, text):
+        """Replaces the whole text as a single undoable edit of the lines that differ,
+        unlike setPlainText which starts a new undo history"""
+        self.clearExtraCursors()
+        self.undoHistory.replaceAll(text)
+
+    def applyTheme(self, theme):
+        """Switches highlighting, gutter and current line colors to theme"""
+        self.theme = theme
+        self.highlighter.setTheme(theme)
+        self.highlightCurrentLine()
+        self.lineNumberArea.update()
+        self.minimap.invalidate()
+
+    def updateGutterMetrics(self):
+        """Caches font metrics used by the gutter, called when the font changes"""
+        metrics = self.fontMetrics()
+        self.gutter_digit_width = metrics.horizontalAdvance('9')
+        self.gutter_line_height = metrics.height()
+        self.gutter_numbers = {}
+        self.gutter_digits = 0
+        self.updateLineNumberAreaWidth(0)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.updateGutterMetrics()
+
     def lineNumberAreaWidth(self):
-        digits = len(str(max(1, self.blockCount())))
-        space = 3 + self.fontMetrics().horizontalAdvance('9') * digits
-        return space
+        return self.gutter_width
 
     def updateLineNumberAreaWidth(self, _):
-        self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
+        """Resizes gutter only when the number of digits changes"""
+        digits = len(str(max(1, self.blockCount())))
+        if digits == self.gutter_digits:
+            return
+        self.gutter_digits = digits
+        # Marker column, line numbers, fold marker column, coverage strip
+        self.gutter_width = (2 * self.gutter_line_height + self.gutter_digit_width * digits
+                             + self.COVERAGE_MARKER_WIDTH + 6)
+        self.updateViewportMargins()
+
+    def updateViewportMargins(self):
+        """Reserves room for the gutter on the left and the minimap on the right"""
+        minimap = self.minimap is not None and not self.minimap.isHidden()
+        self.setViewportMargins(self.gutter_width, 0, Minimap.WIDTH if minimap else 0, 0)
+        self.placeMargins()
+
+    def placeMargins(self):
+        cr = self.contentsRect()
+        self.lineNumberArea.setGeometry(QRect(cr.left(), cr.top(), self.gutter_width, cr.height()))
+        if self.minimap is not None:
+            viewport = self.viewport().geometry()
+            self.minimap.setGeometry(QRect(viewport.right() + 1, viewport.top(),
+                                           Minimap.WIDTH, viewport.height()))
+
+    def setMinimapVisible(self, visible):
+        self.minimap.setVisible(visible)
+        self.updateViewportMargins()
 
     def updateLineNumberArea(self, rect, dy):
         if dy:
             self.lineNumberArea.scroll(0, dy)
         else:
             self.lineNumberArea.update(0, rect.y(), self.lineNumberArea.width(), rect.height())
-        if rect.contains(self.viewport().rect()):
-            self.updateLineNumberAreaWidth(0)
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        cr = self.contentsRect()
-        self.lineNumberArea.setGeometry(QRect(cr.left(), cr.top(), self.lineNumberAreaWidth(), cr.height()))
+        self.placeMargins()
+
+    def lineNumberText(self, number):
+        """Returns cached static text layout of a line number"""
+        text = self.gutter_numbers.get(number)
+        if text is None:
+            if len(self.gutter_numbers) > 4096:
+                self.gutter_numbers.clear()
+            text = QStaticText(str(number))
+            text.setTextFormat(Qt.PlainText)
+            text.prepare(QTransform(), self.font())
+            self.gutter_numbers[number] = text
+        return text
+
+    def setLineMarker(self, line, kind, enabled=True):
+        """Shows or hides a breakpoint, error or coverage marker at line (numbering from 0)"""
+        lines = self.line_markers[kind]
+        if enabled == (line in lines):
+            return
+        if enabled:
+            lines.add(line)
+        else:
+            lines.discard(line)
+        self.updateGutterLine(line)
+        self.markersChanged.emit(kind)
+
+    def setLineMarkers(self, kind, lines):
+        """Replaces all markers of kind at once"""
+        self.line_markers[kind] = set(lines)
+        self.lineNumberArea.update()
+        self.markersChanged.emit(kind)
+
+    def clearLineMarkers(self, kind):
+        """Removes all markers of kind"""
+        lines = self.line_markers[kind]
+        if lines:
+            lines.clear()
+            self.lineNumberArea.update()
+            self.markersChanged.emit(kind)
+
+    def updateGutterLine(self, line):
+        """Repaints the gutter next to one line only"""
+        block = self.document().findBlockByNumber(line)
+        if not block.isValid() or not block.isVisible():
+            return
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        height = self.blockBoundingRect(block).height()
+        self.lineNumberArea.update(0, int(top), self.lineNumberArea.width(), int(height) + 1)
+
+    def toggleBreakpoint(self, line):
+        enabled = line not in self.line_markers[self.MARKER_BREAKPOINT]
+        self.setLineMarker(line, self.MARKER_BREAKPOINT, enabled)
+        self.breakpointToggled.emit(line, enabled)
+
+    def foldColumnLeft(self):
+        return self.gutter_width - self.COVERAGE_MARKER_WIDTH - self.gutter_line_height
+
+    def lineNumberAreaMousePressEvent(self, event):
+        """Toggles breakpoint or fold when the marker or fold column is clicked"""
+        if event.button() != Qt.LeftButton:
+            return
+        line = self.cursorForPosition(QPoint(0, event.y())).blockNumber()
+        if event.x() < self.gutter_line_height:
+            self.toggleBreakpoint(line)
+        elif self.foldColumnLeft() <= event.x() < self.gutter_width - self.COVERAGE_MARKER_WIDTH:
+            self.foldIndex.toggleFold(line)
 
     def lineNumberAreaPaintEvent(self, event):
         painter = QPainter(self.lineNumberArea)
-        painter.fillRect(event.rect(), QColor("#F3F3F3"))
+        painter.setFont(self.font())
+        rect = event.rect()
+        colors = self.theme.colors
+        painter.fillRect(rect, colors['gutter_background'])
+        painter.setPen(colors['gutter_text'])
+
+        marker_size = self.gutter_line_height
+        width = self.lineNumberArea.width()
+        fold_left = self.foldColumnLeft()
+        number_right = fold_left - 3
+        foldIndex = self.foldIndex
+        breakpoints = self.line_markers[self.MARKER_BREAKPOINT]
+        errors = self.line_markers[self.MARKER_ERROR]
+        covered = self.line_markers[self.MARKER_COVERAGE]
 
         block = self.firstVisibleBlock()
         blockNumber = block.blockNumber()
         top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
         bottom = top + self.blockBoundingRect(block).height()
+        rect_top = rect.top()
+        rect_bottom = rect.bottom()
 
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                number = str(blockNumber + 1)
-                painter.setPen(QColor("#666666"))
-                painter.drawText(0, int(top), self.lineNumberArea.width(), self.fontMetrics().height(),
-                                Qt.AlignRight, number)
+        # Only blocks intersecting the damaged rectangle are painted
+        while block.isValid() and top <= rect_bottom:
+            if bottom >= rect_top and block.isVisible():
+                number = self.lineNumberText(blockNumber + 1)
+                x = number_right - int(number.size().width())
+                painter.drawStaticText(x, int(top), number)
+                if blockNumber in breakpoints or blockNumber in errors:
+                    self.paintLineMarker(painter, int(top), marker_size,
+                                         blockNumber in breakpoints, blockNumber in errors)
+                if blockNumber in covered:
+                    painter.fillRect(width - self.COVERAGE_MARKER_WIDTH, int(top),
+                                     self.COVERAGE_MARKER_WIDTH, int(bottom - top), colors['coverage'])
+                if foldIndex.isFoldable(blockNumber):
+                    self.paintFoldMarker(painter, fold_left, int(top), marker_size,
+                                         foldIndex.isFolded(blockNumber))
 
+            # Lines of a collapsed region are skipped in one step
+            folded_end = foldIndex.folded.get(blockNumber)
+            if folded_end is not None:
+                blockNumber = folded_end
+                block = self.document().findBlockByNumber(blockNumber)
             block = block.next()
             top = bottom
             bottom = top + self.blockBoundingRect(block).height()
             blockNumber += 1
 
+    def paintFoldMarker(self, painter, left, top, size, folded):
+        """Draws a triangle pointing right at collapsed regions and down at expanded ones"""
+        margin = size * 3 // 10
+        inner = size - 2 * margin
+        if folded:
+            points = [QPoint(left + margin, top + margin), QPoint(left + margin + inner, top + size // 2),
+                      QPoint(left + margin, top + margin + inner)]
+        else:
+            points = [QPoint(left + margin, top + margin), QPoint(left + margin + inner, top + margin),
+                      QPoint(left + size // 2, top + margin + inner)]
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.theme.colors['gutter_text'])
+        painter.drawPolygon(QPolygon(points))
+        painter.restore()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.extra_cursors:
+            self.paintExtraCursors(event.rect())
+        if not self.foldIndex.folded:
+            return
+        # Collapsed headers end with an ellipsis box standing for the hidden lines
+        painter = QPainter(self.viewport())
+        painter.setPen(self.theme.colors['gutter_text'])
+        offset = self.contentOffset()
+        metrics = self.fontMetrics()
+        rect_bottom = event.rect().bottom()
+        block = self.firstVisibleBlock()
+        while block.isValid():
+            geometry = self.blockBoundingGeometry(block).translated(offset)
+            if geometry.top() > rect_bottom:
+                break
+            folded_end = self.foldIndex.folded.get(block.blockNumber())
+            if folded_end is not None and block.isVisible():
+                line = block.layout().lineAt(block.layout().lineCount() - 1)
+                left = int(geometry.left() + line.x() + line.naturalTextWidth()) + metrics.horizontalAdvance(' ')
+                box = QRect(left, int(geometry.top() + line.y()) + 1,
+                            metrics.horizontalAdvance('...') + 4, int(line.height()) - 2)
+                painter.drawRect(box)
+                painter.drawText(box, Qt.AlignCenter, '...')
+                block = self.document().findBlockByNumber(folded_end)
+            block = block.next()
+
+    def paintLineMarker(self, painter, top, size, breakpoint, error):
+        """Draws breakpoint and error markers in the marker column"""
+        colors = self.theme.colors
+        margin = max(2, size // 5)
+        marker = QRect(margin, top + margin, size - 2 * margin, size - 2 * margin)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        if breakpoint:
+            painter.setBrush(colors['breakpoint'])
+            painter.drawEllipse(marker)
+        if error:
+            painter.setBrush(colors['error_marker'])
+            if breakpoint:
+                # Smaller error dot on top of the breakpoint
+                marker = marker.adjusted(marker.width() // 2, marker.height() // 2, 0, 0)
+            painter.drawRect(marker)
+        painter.restore()
+
     def highlightCurrentLine(self):
         extraSelections = []
         if not self.isReadOnly():
             selection = QTextEdit.ExtraSelection()
-            lineColor = QColor("#E8F4FD")
+            lineColor = self.theme.colors['current_line']
             selection.format.setBackground(lineColor)
             selection.format.setProperty(QTextFormat.FullWidthSelection, True)
             selection.cursor = self.textCursor()
             selection.cursor.clearSelection()
             extraSelections.append(selection)
+            extraSelections.extend(self.bracketSelections())
+        # Selections of the other cursors look like the main selection
+        palette = self.palette()
+        for cursor in self.extra_cursors:
+            if cursor.hasSelection():
+                selection = QTextEdit.ExtraSelection()
+                selection.format.setBackground(palette.highlight())
+                selection.format.setForeground(palette.highlightedText())
+                selection.cursor = cursor
+                extraSelections.append(selection)
         self.setExtraSelections(extraSelections)
+        # The editor keeps its own copies; cursors left alive here until garbage
+        # collection would be moved by every later edit
+        for selection in extraSelections:
+            selection.cursor = QTextCursor()
+
+    def bracketSelections(self):
+        """Highlights the bracket at the cursor and its pair, or the bracket alone when unmatched"""
+        match = self.bracketIndex.matchAtCursor(self.textCursor())
+        if match is None:
+            return []
+        position, other, matched = match
+        color = self.theme.colors['bracket_match' if matched else 'bracket_mismatch']
+        selections = []
+        for bracket_position in (position, other):
+            if bracket_position is None:
+                continue
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setBackground(color)
+            selection.cursor = QTextCursor(self.document())
+            selection.cursor.setPosition(bracket_position)
+            selection.cursor.setPosition(bracket_position + 1, QTextCursor.KeepAnchor)
+            selections.append(selection)
+        return selections
+
+    def goToMatchingBracket(self):
+        """Moves the cursor to the bracket paired with the one at the cursor"""
+        cursor = self.textCursor()
+        match = self.bracketIndex.matchAtCursor(cursor)
+        if match is None or match[1] is None:
+            return
+        position, other, _ = match
+        # Keep the cursor on the same side of the bracket it started on
+        cursor.setPosition(other + 1 if cursor.position() > position else other)
+        self.setTextCursor(cursor)
 
     def keyPressEvent(self, event):
+        # Keys that choose or dismiss a completion belong to the popup
+        if self.completer.popup().isVisible() and event.key() in (
+                Qt.Key_Enter, Qt.Key_Return, Qt.Key_Escape, Qt.Key_Tab, Qt.Key_Backtab):
+            event.ignore()
+            return
+        # The text control would run QTextDocument's undo, which is disabled
+        if event.matches(QKeySequence.Undo):
+            self.undo()
+            return
+        if event.matches(QKeySequence.Redo):
+            self.redo()
+            return
+        if event.key() == Qt.Key_Space and event.modifiers() & Qt.ControlModifier:
+            self.showCompletions(force=True)
+            return
+        if event.key() in (Qt.Key_Up, Qt.Key_Down) and (
+                event.modifiers() & (Qt.ControlModifier | Qt.AltModifier)) == Qt.ControlModifier | Qt.AltModifier:
+            self.addCursorVertically(QTextCursor.Up if event.key() == Qt.Key_Up else QTextCursor.Down)
+            return
+        if self.extra_cursors:
+            if self.multiCursorKeyPressEvent(event):
+                self.completer.popup().hide()
+                return
+            self.clearExtraCursors()
+        
         # Autouzupełnianie nawiasów
         if event.key() in [Qt.Key_ParenLeft, Qt.Key_BraceLeft, Qt.Key_BracketLeft]:
             super().keyPressEvent(event)
@@ -249,11 +3012,377 @@ class CodeEditor(QPlainTextEdit):
                     super().keyPressEvent(event)
         else:
             super().keyPressEvent(event)
+        
+        text = event.text()
+        if text and (text.isidentifier() or text.isdigit() or text == '.') or (
+                event.key() == Qt.Key_Backspace and self.completer.popup().isVisible()):
+            self.showCompletions()
+        else:
+            self.completer.popup().hide()
+
+    def allCursors(self):
+        """Main cursor followed by the extra ones"""
+        return [self.textCursor()] + self.extra_cursors
+
+    def setCursors(self, cursors):
+        """Makes the first cursor the main one, dropping duplicates of the others"""
+        primary = cursors[0]
+        seen = {(primary.position(), primary.anchor())}
+        extra = []
+        for cursor in cursors[1:]:
+            key = (cursor.position(), cursor.anchor())
+            if key not in seen:
+                seen.add(key)
+                extra.append(cursor)
+        self.extra_cursors = extra
+        moved = primary.position() != self.textCursor().position()
+        self.setTextCursor(primary)
+        if not moved:
+            self.highlightCurrentLine()  # otherwise done on cursorPositionChanged
+        self.viewport().update()
+
+    def clearExtraCursors(self):
+        if self.extra_cursors or self.column_anchor is not None:
+            self.extra_cursors = []
+            self.column_anchor = None
+            self.highlightCurrentLine()
+            self.viewport().update()
+
+    def editCursors(self, edit):
+        """Applies edit(cursor, index) at every cursor as a single undoable change,
+        so the document reports one contentsChange and analysis runs once"""
+        document = self.document()
+        selections = [(cursor.anchor(), cursor.position()) for cursor in self.allCursors()]
+        # Every live cursor is moved by every edit, so they are dropped while
+        # one cursor edits from the end of the document backwards
+        self.extra_cursors = []
+        self.setExtraSelections([])
+        order = sorted(range(len(selections)), key=lambda index: min(selections[index]), reverse=True)
+        results = [None] * len(selections)
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        try:
+            for index in order:
+                anchor, position = selections[index]
+                cursor.setPosition(anchor)
+                cursor.setPosition(position, QTextCursor.KeepAnchor)
+                length = document.characterCount()
+                edit(cursor, index)
+                results[index] = (cursor.position(), document.characterCount() - length)
+            # Edits before a cursor, applied after it, shift it
+            shift = 0
+            positions = [0] * len(selections)
+            for index in reversed(order):
+                position, delta = results[index]
+                positions[index] = position + shift
+                shift += delta
+            # Placed inside the edit block, the cursors skip measuring their
+            # horizontal position, which would lay out every line
+            cursors = []
+            for position in positions:
+                new_cursor = QTextCursor(document)
+                new_cursor.setPosition(position)
+                cursors.append(new_cursor)
+        finally:
+            cursor.endEditBlock()
+        self.setCursors(cursors)
+
+    def moveCursors(self, operation, mode):
+        cursors = self.allCursors()
+        for cursor in cursors:
+            cursor.movePosition(operation, mode)
+        self.setCursors(cursors)
+
+    def multiCursorKeyPressEvent(self, event):
+        """Edits or moves all cursors, returns False for keys that drop the extra cursors"""
+        key = event.key()
+        modifiers = event.modifiers()
+        if key in (Qt.Key_Shift, Qt.Key_Control, Qt.Key_Alt, Qt.Key_Meta, Qt.Key_AltGr):
+            return True
+        if key == Qt.Key_Escape:
+            self.clearExtraCursors()
+            return True
+        if event.matches(QKeySequence.Copy):
+            self.copy()
+            return True
+        if event.matches(QKeySequence.Cut):
+            self.cut()
+            return True
+        if event.matches(QKeySequence.Paste):
+            self.paste()
+            return True
+        if self.isReadOnly():
+            return False
+        move = self.CURSOR_MOVES.get(key)
+        if move is not None and not modifiers & (Qt.ControlModifier | Qt.AltModifier):
+            mode = QTextCursor.KeepAnchor if modifiers & Qt.ShiftModifier else QTextCursor.MoveAnchor
+            self.moveCursors(move, mode)
+            return True
+        if key == Qt.Key_Backspace:
+            self.editCursors(lambda cursor, index: cursor.deletePreviousChar())
+        elif key == Qt.Key_Delete:
+            self.editCursors(lambda cursor, index: cursor.deleteChar())
+        elif key in (Qt.Key_Return, Qt.Key_Enter):
+            def newline(cursor, index):
+                indent = re.match(r'\s*', cursor.block().text()).group()
+                cursor.insertText('\n' + indent)
+            self.editCursors(newline)
+        elif key == Qt.Key_Tab or (event.text().isprintable() and event.text()
+                                   and not modifiers & (Qt.ControlModifier | Qt.AltModifier)):
+            text = event.text()
+            self.editCursors(lambda cursor, index: cursor.insertText(text))
+        else:
+            return False
+        return True
+
+    def addCursorVertically(self, direction):
+        """Adds a cursor on the line above the topmost or below the bottommost cursor"""
+        cursors = self.allCursors()
+        edge = (min if direction == QTextCursor.Up else max)(cursors, key=QTextCursor.position)
+        cursor = QTextCursor(edge)
+        cursor.clearSelection()
+        if cursor.movePosition(direction):
+            self.setCursors([cursor] + cursors)
+
+    def addCursorAt(self, position):
+        """Adds a cursor, or removes the extra cursor already at position"""
+        cursors = self.allCursors()
+        remaining = [cursor for cursor in cursors if cursor.position() != position]
+        if len(remaining) < len(cursors):
+            if remaining:
+                self.setCursors(remaining)
+            return
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(position)
+        self.setCursors([cursor] + cursors)
+
+    def selectColumns(self, anchor, line, column):
+        """Selects the rectangle between anchor and (line, column) with one cursor per line"""
+        document = self.document()
+        first_line, first_column = anchor
+        step = 1 if line >= first_line else -1
+        cursors = []
+        for number in range(first_line, line + step, step):
+            block = document.findBlockByNumber(number)
+            if not block.isVisible():
+                continue
+            length = block.length() - 1
+            cursor = QTextCursor(block)
+            cursor.setPosition(block.position() + min(first_column, length))
+            cursor.setPosition(block.position() + min(column, length), QTextCursor.KeepAnchor)
+            cursors.append(cursor)
+        if cursors:
+            # The main cursor is on the line the mouse is at
+            self.setCursors(cursors[::-1])
+
+    def mousePressEvent(self, event):
+        modifiers = event.modifiers() & (Qt.AltModifier | Qt.ShiftModifier | Qt.ControlModifier)
+        if event.button() == Qt.LeftButton and modifiers & Qt.AltModifier:
+            cursor = self.cursorForPosition(event.pos())
+            if modifiers == Qt.AltModifier | Qt.ShiftModifier:
+                # Alt+Shift+drag selects a column
+                self.column_anchor = (cursor.blockNumber(), cursor.positionInBlock())
+                self.selectColumns(self.column_anchor, *self.column_anchor)
+            elif modifiers == Qt.AltModifier:
+                self.addCursorAt(cursor.position())
+            return
+        self.clearExtraCursors()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.column_anchor is not None and event.buttons() & Qt.LeftButton:
+            cursor = self.cursorForPosition(event.pos())
+            self.selectColumns(self.column_anchor, cursor.blockNumber(), cursor.positionInBlock())
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.column_anchor is not None:
+            self.column_anchor = None
+            return
+        super().mouseReleaseEvent(event)
+
+    def selectedTextOrWord(self):
+        """Selected text, or the word at the cursor after selecting it"""
+        cursor = self.textCursor()
+        if not cursor.hasSelection():
+            cursor.select(QTextCursor.WordUnderCursor)
+            self.setTextCursor(cursor)
+        return cursor.selectedText()
+
+    def addNextOccurrence(self):
+        """Adds a cursor selecting the next occurrence of the selection"""
+        text = self.selectedTextOrWord()
+        if not text:
+            return
+        cursors = self.allCursors()
+        last = max(cursors, key=QTextCursor.position)
+        found = self.document().find(text, last.position(), QTextDocument.FindCaseSensitively)
+        if found.isNull():
+            found = self.document().find(text, 0, QTextDocument.FindCaseSensitively)
+        if not found.isNull() and all(found.position() != cursor.position() for cursor in cursors):
+            self.setCursors([found] + cursors)
+            self.ensureCursorVisible()
+
+    def selectAllOccurrences(self):
+        """Puts a cursor on every occurrence of the selection"""
+        text = self.selectedTextOrWord()
+        if not text:
+            return
+        document = self.document()
+        primary = self.textCursor()
+        cursors = [primary]
+        found = document.find(text, 0, QTextDocument.FindCaseSensitively)
+        while not found.isNull():
+            if found.position() != primary.position():
+                cursors.append(found)
+            found = document.find(text, found.position(), QTextDocument.FindCaseSensitively)
+        self.setCursors(cursors)
+
+    def copy(self):
+        """Copies the selections of all cursors, one per line"""
+        if not self.extra_cursors:
+            super().copy()
+            return
+        cursors = sorted(self.allCursors(), key=QTextCursor.position)
+        text = '\n'.join(cursor.selectedText().replace('\u2029', '\n') for cursor in cursors)
+        QApplication.clipboard().setText(text)
+
+    def cut(self):
+        if not self.extra_cursors:
+            super().cut()
+            return
+        self.copy()
+        self.editCursors(lambda cursor, index: cursor.removeSelectedText())
+
+    def paste(self):
+        """Pastes one clipboard line per cursor when the counts match, else everything at each"""
+        if not self.extra_cursors:
+            super().paste()
+            return
+        text = QApplication.clipboard().text()
+        cursors = self.allCursors()
+        lines = text.split('\n')
+        if len(lines) == len(cursors):
+            order = sorted(range(len(cursors)), key=lambda index: cursors[index].position())
+            pieces = dict(zip(order, lines))
+        else:
+            pieces = dict.fromkeys(range(len(cursors)), text)
+        del cursors
+        self.editCursors(lambda cursor, index: cursor.insertText(pieces[index]))
+
+    def undo(self):
+        self.clearExtraCursors()
+        self.undoHistory.undo()
+
+    def redo(self):
+        self.clearExtraCursors()
+        self.undoHistory.redo()
+
+    def contextMenuEvent(self, event):
+        """Standard menu with Undo and Redo taken from the line diff history,
+        the document's own undo stack is disabled"""
+        menu = self.createStandardContextMenu(event.pos())
+        history = {'edit-undo': (self.undo, self.undoHistory.isUndoAvailable()),
+                   'edit-redo': (self.redo, self.undoHistory.isRedoAvailable())}
+        for action in menu.actions():
+            handler, available = history.get(action.objectName(), (None, False))
+            if handler is not None:
+                action.triggered.disconnect()
+                action.triggered.connect(handler)
+                action.setEnabled(available)
+        menu.exec_(event.globalPos())
+        menu.deleteLater()
+
+    def paintExtraCursors(self, rect):
+        painter = QPainter(self.viewport())
+        color = self.palette().text().color()
+        width = self.cursorWidth()
+        # Only cursors in the visible text range are measured
+        first = self.firstVisibleBlock().position()
+        viewport = self.viewport().rect()
+        last_block = self.cursorForPosition(viewport.bottomRight()).block()
+        last = last_block.position() + last_block.length()
+        for cursor in self.extra_cursors:
+            position = cursor.position()
+            if position < first or position > last or not cursor.block().isVisible():
+                continue
+            caret = self.cursorRect(cursor)
+            if caret.intersects(rect):
+                painter.fillRect(caret.x(), caret.y(), width, caret.height(), color)
+
+    def wordPrefix(self):
+        """Identifier characters just before the cursor"""
+        cursor = self.textCursor()
+        text = cursor.block().text()[:cursor.positionInBlock()]
+        match = re.search(r'\w+$', text)
+        return match.group() if match else ""
+
+    def packageCompletions(self, force):
+        """Module names after import and module symbols after from ... import
+        or a module followed by a dot, None outside these contexts"""
+        cursor = self.textCursor()
+        text = cursor.block().text()[:cursor.positionInBlock()]
+        match = self.IMPORT_CONTEXT.match(text) or self.FROM_CONTEXT.match(text)
+        if match:
+            dotted = match.group(1)
+            if not (dotted or force):
+                return []
+            return package_index.completeModule(dotted)
+        match = self.FROM_IMPORT_CONTEXT.match(text)
+        if match:
+            if not (match.group(2) or force):
+                return []
+            return package_index.completeSymbol(match.group(1), match.group(2)) or []
+        match = self.ATTRIBUTE_CONTEXT.search(text)
+        if match:
+            module, prefix = match.groups()
+            symbols = package_index.completeSymbol(self.importedModule(module), prefix)
+            if symbols is not None:
+                return symbols
+        return None
+
+    def importedModule(self, name):
+        """Resolves an import alias like np in import numpy as np, other names
+        are taken as module names"""
+        if name in package_index.modules:
+            return name
+        for line, words in enumerate(self.identifierIndex.lines):
+            if 'import' not in words or name not in words:
+                continue
+            match = self.IMPORT_ALIAS.match(self.document().findBlockByNumber(line).text())
+            if not match:
+                continue
+            for imported in match.group(1).split(','):
+                parts = imported.split()
+                if len(parts) == 3 and parts[1] == 'as' and parts[2] == name:
+                    return parts[0]
+        return name
+
+    def showCompletions(self, force=False):
+        """Shows ranked identifiers completing the word at the cursor"""
+        prefix = self.wordPrefix()
+        popup = self.completer.popup()
+        words = self.packageCompletions(force)
+        if words is None:
+            if len(prefix) < (1 if force else self.COMPLETION_PREFIX_LENGTH) or prefix[0].isdigit():
+                popup.hide()
+                return
+            words = self.identifierIndex.complete(prefix, self.textCursor().blockNumber())
+        if not words:
+            popup.hide()
+            return
+        self.updateCompleter(words)
+        self.completer.setCompletionPrefix(prefix)
+        popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
+        rect = self.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width())
+        self.completer.complete(rect)
 
     def insertCompletion(self, completion):
         tc = self.textCursor()
-        tc.select(QTextCursor.WordUnderCursor)
-        tc.removeSelectedText()
+        # Only the typed prefix is replaced, after a dot there is none
+        tc.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, len(self.wordPrefix()))
         tc.insertText(completion)
         self.setTextCursor(tc)
 
@@ -262,18 +3391,38 @@ class CodeEditor(QPlainTextEdit):
         self.completer.model().setStringList(words)
 
 class SyntaxChecker(QThread):
-    error_found = pyqtSignal(int, str, str)  # line, message, type
+    """Checks syntax and code quality of a document snapshot off the GUI thread"""
+    resultReady = pyqtSignal(int, object)  # document revision, lint result
     
-    def __init__(self, code):
+    def __init__(self, code, revision):
         super().__init__()
         self.code = code
+        self.revision = revision
+        # Set when the snapshot is outdated, the result is then not reported
+        self.cancelled = False
         
     def run(self):
+        result = self.lint(self.code, lambda: self.cancelled)
+        if result is not None and not self.cancelled:
+            self.resultReady.emit(self.revision, result)
+
+    @staticmethod
+    def lint(code, cancelled=lambda: False):
+        """Returns the syntax error of code as (line, message, suggestion) and its code
+        quality issues, None when pyflakes is missing; None if cancelled in between"""
         try:
             # Sprawdzanie składni za pomocą ast
-            ast.parse(self.code)
+            ast_cache.parse(code)
         except SyntaxError as e:
-            self.error_found.emit(e.lineno, e.msg, "Syntax Error")
+            suggestion = EnhancedSyntaxChecker.get_syntax_suggestions(e)
+            return {'error': (e.lineno, e.msg, suggestion), 'issues': None}
+        except (ValueError, RecursionError) as e:
+            return {'error': None, 'issues': [f"Error during code analysis: {e}"]}
+        if cancelled():
+            return None
+        # Check code quality if pyflakes is available
+        issues = EnhancedSyntaxChecker.check_code_quality(code) if PYFLAKES_AVAILABLE else None
+        return {'error': None, 'issues': issues}
 
 class VariableInspector(QTreeWidget):
     def __init__(self):
@@ -465,7 +3614,15 @@ class PyInstallerDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
+        self.compile_thread = None
         self.initUI()
+
+    def isBusy(self):
+        """True while a compilation still reads this dialog's widgets or shows its progress"""
+        if self.compile_thread is not None and self.compile_thread.is_alive():
+            return True
+        progress_dialog = getattr(self, 'progress_dialog', None)
+        return progress_dialog is not None and progress_dialog.isVisible()
         
     def initUI(self):
         self.setWindowTitle("PyDDLE - Convert to EXE")
@@ -524,7 +3681,8 @@ class PyInstallerDialog(QDialog):
         file_layout = QHBoxLayout()
         file_layout.addWidget(QLabel("Script path:"))
         self.script_path = QLineEdit()
-        self.script_path.setText(self.parent.current_file or "")
+        self.suggested_script = self.parent.current_file or ""
+        self.script_path.setText(self.suggested_script)
         file_layout.addWidget(self.script_path)
         self.browse_script_btn = QPushButton("Browse")
         file_layout.addWidget(self.browse_script_btn)
@@ -770,6 +3928,13 @@ class PyInstallerDialog(QDialog):
         # Connections for settings tab
         self.browse_hooks_btn.clicked.connect(self.browse_hooks)
         
+    def prepareForShow(self):
+        """Follows editor's current file unless another script was chosen"""
+        current_file = self.parent.current_file or ""
+        if current_file != self.suggested_script and self.script_path.text() == self.suggested_script:
+            self.script_path.setText(current_file)
+        self.suggested_script = current_file
+        
     def browse_script(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select Python Script", "", "Python Files (*.py)")
         if file_path:
@@ -857,9 +4022,9 @@ class PyInstallerDialog(QDialog):
         self.progress_dialog.show()
         
         # Run compilation in thread
-        thread = threading.Thread(target=self.runCompilation, args=(script_path, output_dir))
-        thread.daemon = True
-        thread.start()
+        self.compile_thread = threading.Thread(target=self.runCompilation, args=(script_path, output_dir))
+        self.compile_thread.daemon = True
+        self.compile_thread.start()
         
     def runCompilation(self, script_path, output_dir):
         try:
@@ -1352,9 +4517,38 @@ class StatusBarWithButtons(QStatusBar):
         quickAccessWidget = QWidget()
         quickAccessWidget.setLayout(self.quickAccessLayout)
         
-        # Add widget to statusbar
+        # File loading progress
+        self.loadProgress = QProgressBar()
+        self.loadProgress.setMaximumWidth(150)
+        self.loadProgress.setRange(0, 100)
+        self.cancelLoadBtn = QPushButton("Cancel")
+        self.cancelLoadBtn.setMaximumWidth(80)
+        self.cancelLoadBtn.clicked.connect(self.parent.cancelLoading)
+        self.addPermanentWidget(self.loadProgress)
+        self.addPermanentWidget(self.cancelLoadBtn)
+        self.hideProgress()
+        
+        # Cursor position
+        self.positionLabel = QLabel()
+        
+        # Add widgets to statusbar
+        self.addPermanentWidget(self.positionLabel)
         self.addPermanentWidget(quickAccessWidget)
 
+    def showProgress(self, percent):
+        """Shows file loading progress"""
+        self.loadProgress.setValue(percent)
+        self.loadProgress.show()
+        self.cancelLoadBtn.show()
+
+    def hideProgress(self):
+        self.loadProgress.hide()
+        self.cancelLoadBtn.hide()
+
+    def setCursorPosition(self, line, column):
+        """Shows cursor position"""
+        self.positionLabel.setText(f'Line: {line}, Column: {column}')
+
 class AdvancedFindReplaceDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1447,9 +4641,17 @@ class AdvancedFindReplaceDialog(QDialog):
         self.replaceAllBtn.clicked.connect(self.replaceAll)
         self.closeBtn.clicked.connect(self.accept)
         self.findEdit.textChanged.connect(self.clearResults)
+        # Matches stay marked on the minimap while the dialog is open
+        self.finished.connect(self.clearResults)
         
         self.search_results = []
         
+    def prepareForShow(self):
+        """Keeps search text and options but drops results from previous opening"""
+        self.clearResults()
+        self.findEdit.setFocus()
+        self.findEdit.selectAll()
+        
     def findAll(self):
         self.resultsList.clear()
         self.search_results = []
@@ -1498,7 +4700,7 @@ class AdvancedFindReplaceDialog(QDialog):
             # Highlight found text
             extra_selection = QTextEdit.ExtraSelection()
             extra_selection.cursor = cursor
-            extra_selection.format.setBackground(QColor(255, 255, 0))
+            extra_selection.format.setBackground(self.parent.theme.colors['find_match'])
             
             self.search_results.append({
                 'cursor': QTextCursor(cursor),
@@ -1516,6 +4718,8 @@ class AdvancedFindReplaceDialog(QDialog):
             count += 1
             
         self.resultsCount.setText(f"Found: {count}")
+        self.parent.editor.setLineMarkers(
+            CodeEditor.MARKER_SEARCH, (result['line'] - 1 for result in self.search_results))
         
     def goToResult(self, item):
         index = self.resultsList.row(item)
@@ -1554,9 +4758,9 @@ class AdvancedFindReplaceDialog(QDialog):
             cursor = self.parent.editor.textCursor()
             cursor.beginEditBlock()
             
+            # One edit block, so all replacements are undone together
             for result in reversed(self.search_results):  # From end to not change positions
                 result_cursor = result['cursor']
-                result_cursor.joinPreviousEditBlock()
                 
                 if self.preserveCase.isChecked():
                     original_text = result_cursor.selectedText()
@@ -1567,8 +4771,7 @@ class AdvancedFindReplaceDialog(QDialog):
                     
             cursor.endEditBlock()
             
-            self.resultsList.clear()
-            self.resultsCount.setText("Found: 0")
+            self.clearResults()
             
     def preserveCaseReplacement(self, original, replacement):
         """Preserves original text case in replacement"""
@@ -1585,6 +4788,7 @@ class AdvancedFindReplaceDialog(QDialog):
         self.resultsList.clear()
         self.resultsCount.setText("Found: 0")
         self.search_results = []
+        self.parent.editor.clearLineMarkers(CodeEditor.MARKER_SEARCH)
 
 class CommentDialog(QDialog):
     def __init__(self, parent=None):
@@ -1690,9 +4894,9 @@ class EnhancedSyntaxChecker:
         """Checks code quality using pyflakes if available"""
         issues = []
         
-        # Check syntax
+        # Check syntax, usually parsed by the syntax check already
         try:
-            ast.parse(code)
+            tree = ast_cache.parse(code)
         except SyntaxError as e:
             issues.append(f"Syntax error in line {e.lineno}: {e.msg}")
             return issues
@@ -1711,8 +4915,13 @@ class EnhancedSyntaxChecker:
                 
                 buffer = Buffer()
                 
-                # Run pyflakes
-                pyflakes.api.check(code, "current_file.py", reporter=pyflakes.reporter.Reporter(buffer, buffer))
+                # Run pyflakes on the shared tree, parsing again would hold the GIL
+                # as long as the first parse and stall the GUI thread
+                checker = pyflakes.checker.Checker(tree, filename="current_file.py")
+                checker.messages.sort(key=lambda message: message.lineno)
+                reporter = pyflakes.reporter.Reporter(buffer, buffer)
+                for message in checker.messages:
+                    reporter.flake(message)
                 
                 # Add found issues
                 issues.extend(buffer.lines)
@@ -1721,101 +4930,169 @@ class EnhancedSyntaxChecker:
         
         return issues
 
+class StructureWorker(QThread):
+    """Builds the code outline of a document snapshot off the GUI thread"""
+    outlineReady = pyqtSignal(int, object)  # document revision, outline
+
+    def __init__(self, code, revision):
+        super().__init__()
+        self.code = code
+        self.revision = revision
+
+    def run(self):
+        try:
+            tree = ast_cache.parse(self.code)
+        except (SyntaxError, ValueError, RecursionError):
+            return  # keep previous outline until code parses again
+        self.outlineReady.emit(self.revision, CodeStructureTree.buildOutline(tree))
+
 class CodeStructureTree(QTreeWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, delay_ms=300):
         super().__init__(parent)
         self.parent = parent
+        self.editor = None
+        self.outline_revision = None
+        self.worker = None
         self.setHeaderLabel("Code Structure")
         self.itemDoubleClicked.connect(self.onItemDoubleClicked)
         
-    def updateStructure(self, code):
-        """Updates code structure tree"""
-        self.clear()
-        
+        # Coalesces bursts of edits into a single parse
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(delay_ms)
+        self.updateTimer.timeout.connect(self.startUpdate)
+        
+    def setEditor(self, editor):
+        """Follows text changes of editor"""
+        if self.editor is not None:
+            self.editor.document().contentsChange.disconnect(self.onContentsChange)
+            self.editor.loadingFinished.disconnect(self.scheduleUpdate)
+        if self.worker is not None:
+            # The outline being parsed belongs to a previous editor
+            with contextlib.suppress(TypeError):
+                self.worker.outlineReady.disconnect(self.onOutlineReady)
+        self.editor = editor
+        self.outline_revision = None
+        editor.document().contentsChange.connect(self.onContentsChange)
+        editor.loadingFinished.connect(self.scheduleUpdate)
+        self.scheduleUpdate()
+
+    def onContentsChange(self, position, removed, added):
+        if removed or added:
+            self.scheduleUpdate()
+
+    def scheduleUpdate(self):
+        """Schedules outline update once edits pause"""
+        self.updateTimer.start()
+
+    def startUpdate(self):
+        """Parses current text in background unless the outline is up to date"""
+        revision = self.editor.text_revision
+        if revision == self.outline_revision or self.editor.loading:
+            return
+        if self.worker is not None:
+            # At most one parse at a time, the newest text is parsed next
+            self.updateTimer.start()
+            return
+        self.worker = StructureWorker(self.editor.toPlainText(), revision)
+        self.worker.outlineReady.connect(self.onOutlineReady)
+        self.worker.finished.connect(self.onWorkerFinished)
+        self.worker.start(QThread.LowPriority)
+
+    def onWorkerFinished(self):
+        self.worker.wait()
+        revision = self.worker.revision
+        self.worker = None
+        if revision != self.editor.text_revision:
+            self.scheduleUpdate()
+
+    def onOutlineReady(self, revision, outline):
+        self.outline_revision = revision
+        self.editor.analysis_results['outline'] = (revision, outline)
+        self.updateStructure(outline)
+
+    def updateStructure(self, outline):
+        """Updates tree items that differ from outline, keeping expansion and selection"""
+        self.setUpdatesEnabled(False)
         try:
-            tree = ast.parse(code)
-            
-            # Add main elements
-            for node in tree.body:
-                if isinstance(node, ast.FunctionDef):
-                    self.addFunction(node)
-                elif isinstance(node, ast.ClassDef):
-                    self.addClass(node)
-                elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                    self.addImport(node)
-                    
-        except SyntaxError:
-            # Ignore syntax errors during structure analysis
-            pass
-            
-    def addFunction(self, func_node):
-        """Adds function to tree"""
-        # Use first line of function as position
-        line_number = func_node.lineno
-        func_item = QTreeWidgetItem([f"def {func_node.name}()"])
-        func_item.setData(0, Qt.UserRole, line_number)  # Store line number
-        self.addTopLevelItem(func_item)
-        
-        # Add arguments
+            self.syncChildren(self.invisibleRootItem(), outline)
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def syncChildren(self, parent, nodes):
+        """Reuses child items with the same label and moves, adds or removes the rest"""
+        existing = {}
+        for index in range(parent.childCount()):
+            child = parent.child(index)
+            existing.setdefault(child.text(0), []).append(child)
+        
+        items = []
+        for label, line_number, children in nodes:
+            candidates = existing.get(label)
+            item = candidates.pop(0) if candidates else QTreeWidgetItem([label])
+            if item.data(0, Qt.UserRole) != line_number:
+                item.setData(0, Qt.UserRole, line_number)  # Store line number
+            items.append(item)
+        
+        for candidates in existing.values():
+            for item in candidates:
+                parent.removeChild(item)
+        
+        for index, item in enumerate(items):
+            current = parent.indexOfChild(item)
+            if current == index:
+                continue
+            if current < 0:
+                parent.insertChild(index, item)
+                continue
+            expanded, selected = item.isExpanded(), item.isSelected()
+            parent.takeChild(current)
+            parent.insertChild(index, item)
+            item.setExpanded(expanded)
+            item.setSelected(selected)
+        
+        for item, (label, line_number, children) in zip(items, nodes):
+            self.syncChildren(item, children)
+
+    @staticmethod
+    def buildOutline(tree):
+        """Returns outline of module as nested (label, line number, children) tuples"""
+        outline = []
+        # Add main elements
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef):
+                outline.append(CodeStructureTree.functionOutline(node))
+            elif isinstance(node, ast.ClassDef):
+                outline.append(CodeStructureTree.classOutline(node))
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    outline.append((f"import {alias.name}", node.lineno, ()))
+            elif isinstance(node, ast.ImportFrom):
+                module = node.module or ""
+                names = ", ".join(alias.name for alias in node.names)
+                outline.append((f"from {module} import {names}", node.lineno, ()))
+        return outline
+
+    @staticmethod
+    def functionOutline(func_node):
+        """Outline of function with its arguments, nested functions and classes"""
+        children = []
         args = [arg.arg for arg in func_node.args.args]
         if args:
-            args_item = QTreeWidgetItem([f"args: {', '.join(args)}"])
-            func_item.addChild(args_item)
-            
-        # Add function body
+            children.append((f"args: {', '.join(args)}", None, ()))
         for node in func_node.body:
             if isinstance(node, ast.FunctionDef):
-                self.addNestedFunction(node, func_item)
+                children.append((f"def {node.name}()", node.lineno, ()))
             elif isinstance(node, ast.ClassDef):
-                self.addNestedClass(node, func_item)
-                
-    def addClass(self, class_node):
-        """Adds class to tree"""
-        line_number = class_node.lineno
-        class_item = QTreeWidgetItem([f"class {class_node.name}"])
-        class_item.setData(0, Qt.UserRole, line_number)  # Store line number
-        self.addTopLevelItem(class_item)
-        
-        # Add class methods
-        for node in class_node.body:
-            if isinstance(node, ast.FunctionDef):
-                self.addMethod(node, class_item)
-                
-    def addMethod(self, method_node, parent):
-        """Adds method to class"""
-        line_number = method_node.lineno
-        method_item = QTreeWidgetItem([f"def {method_node.name}()"])
-        method_item.setData(0, Qt.UserRole, line_number)  # Store line number
-        parent.addChild(method_item)
-        
-    def addNestedFunction(self, func_node, parent):
-        """Adds nested function"""
-        line_number = func_node.lineno
-        nested_item = QTreeWidgetItem([f"def {func_node.name}()"])
-        nested_item.setData(0, Qt.UserRole, line_number)  # Store line number
-        parent.addChild(nested_item)
-        
-    def addNestedClass(self, class_node, parent):
-        """Adds nested class"""
-        line_number = class_node.lineno
-        nested_item = QTreeWidgetItem([f"class {class_node.name}"])
-        nested_item.setData(0, Qt.UserRole, line_number)  # Store line number
-        parent.addChild(nested_item)
-        
-    def addImport(self, import_node):
-        """Adds import to tree"""
-        line_number = import_node.lineno
-        if isinstance(import_node, ast.Import):
-            for alias in import_node.names:
-                import_item = QTreeWidgetItem([f"import {alias.name}"])
-                import_item.setData(0, Qt.UserRole, line_number)  # Store line number
-                self.addTopLevelItem(import_item)
-        else:  # ImportFrom
-            module = import_node.module or ""
-            names = ", ".join(alias.name for alias in import_node.names)
-            import_item = QTreeWidgetItem([f"from {module} import {names}"])
-            import_item.setData(0, Qt.UserRole, line_number)  # Store line number
-            self.addTopLevelItem(import_item)
+                children.append((f"class {node.name}", node.lineno, ()))
+        return (f"def {func_node.name}()", func_node.lineno, children)
+
+    @staticmethod
+    def classOutline(class_node):
+        """Outline of class with its methods"""
+        children = [(f"def {node.name}()", node.lineno, ())
+                    for node in class_node.body if isinstance(node, ast.FunctionDef)]
+        return (f"class {class_node.name}", class_node.lineno, children)
             
     def onItemDoubleClicked(self, item, column):
         """Goes to exact code line on double click"""
@@ -1836,6 +5113,7 @@ class CodeStructureTree(QTreeWidget):
 class DebuggerWindow(QDockWidget):
     def __init__(self, parent=None):
         super().__init__("Debugger", parent)
+        self.setObjectName('debugger')
         self.parent = parent
         self.initUI()
         
@@ -1954,21 +5232,454 @@ class DebuggerWindow(QDockWidget):
         """Update current line display"""
         self.current_line_label.setText(f"Current line: {line_number}")
 
-class EnhancedCodeEditor(CodeEditor):
-    def __init__(self):
+class EnhancedCodeEditor(CodeEditor):
+    def __init__(self):
+        super().__init__()
+        self.code_structure_tree = None
+        
+    def setCodeStructureTree(self, tree):
+        """Sets code structure tree, which then follows edits on its own"""
+        self.code_structure_tree = tree
+        tree.setEditor(self)
+
+class MappedFile:
+    """Read-only memory-mapped file with a sparse line index"""
+    # Line numbers are recorded once per block, lines inside a block are found on demand
+    BLOCK_SIZE = 1 << 16
+    # Longer lines are cut when read
+    MAX_LINE_BYTES = 1 << 14
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.size = os.fstat(file.fileno()).st_size
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.block_lines = array('Q', [0])  # number of lines before each block
+        self.indexed = 0  # bytes indexed so far
+        self.newlines = 0
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b''
+
+    def isIndexed(self):
+        return self.indexed >= self.size
+
+    def lineCount(self):
+        """Number of lines indexed so far"""
+        return self.newlines + 1
+
+    def indexUntil(self, deadline):
+        """Counts lines block by block until deadline, returns True when the whole file is indexed"""
+        data = self.data
+        size = self.size
+        block = self.BLOCK_SIZE
+        while self.indexed < size and time.perf_counter() < deadline:
+            end = min(self.indexed + block, size)
+            self.newlines += data[self.indexed:end].count(b'\n')
+            self.indexed = end
+            if end < size:
+                self.block_lines.append(self.newlines)
+        return self.isIndexed()
+
+    def lineOffset(self, line):
+        """Byte offset at which line starts"""
+        if line <= 0:
+            return 0
+        # Last block starting before the line, then skip the newlines left
+        index = bisect.bisect_left(self.block_lines, line) - 1
+        position = index * self.BLOCK_SIZE
+        data = self.data
+        for _ in range(line - self.block_lines[index]):
+            position = data.find(b'\n', position) + 1
+            if position == 0:
+                return self.size
+        return position
+
+    def readLines(self, first, count):
+        """Returns up to count lines starting at line first, decoded and without newlines"""
+        data = self.data
+        size = self.size
+        position = self.lineOffset(first)
+        lines = []
+        while len(lines) < count and position <= size:
+            end = data.find(b'\n', position)
+            if end < 0:
+                end = size
+            raw = data[position:min(end, position + self.MAX_LINE_BYTES)]
+            lines.append(raw.decode('utf-8', 'replace').rstrip('\r'))
+            position = end + 1
+        return lines
+
+class LargeFileViewer(QAbstractScrollArea):
+    """Virtualized read-only view of a memory-mapped file, painting only visible lines"""
+    indexed = pyqtSignal()
+
+    def __init__(self, path, theme, font, parent=None, slice_ms=8):
+        super().__init__(parent)
+        self.mapped = MappedFile(path)
+        self.theme = theme
+        self.slice_time = slice_ms / 1000.0
+        self.max_width = 0  # widest line painted so far, in pixels
+        self.setFont(font)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.verticalScrollBar().setSingleStep(1)
+
+        # Lines are counted in idle time slices, the view grows as indexing proceeds
+        self.indexTimer = QTimer(self)
+        self.indexTimer.setInterval(0)
+        self.indexTimer.timeout.connect(self.indexSlice)
+        self.indexTimer.start()
+
+    def closeEvent(self, event):
+        self.closeMapping()
+        super().closeEvent(event)
+
+    def closeMapping(self):
+        self.indexTimer.stop()
+        self.mapped.close()
+
+    def indexSlice(self):
+        done = self.mapped.indexUntil(time.perf_counter() + self.slice_time)
+        self.updateScrollBars()
+        if done:
+            self.indexTimer.stop()
+            self.indexed.emit()
+
+    def lineHeight(self):
+        return self.fontMetrics().height()
+
+    def visibleLineCount(self):
+        return max(1, self.viewport().height() // self.lineHeight())
+
+    def gutterWidth(self):
+        digits = len(str(self.mapped.lineCount()))
+        return 8 + self.fontMetrics().horizontalAdvance('9') * digits
+
+    def updateScrollBars(self):
+        lines = self.mapped.lineCount()
+        page = self.visibleLineCount()
+        vertical = self.verticalScrollBar()
+        vertical.setPageStep(page)
+        vertical.setRange(0, max(0, lines - page))
+        horizontal = self.horizontalScrollBar()
+        horizontal.setPageStep(self.viewport().width())
+        horizontal.setRange(0, max(0, self.max_width + self.gutterWidth() - self.viewport().width()))
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateScrollBars()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def keyPressEvent(self, event):
+        vertical = self.verticalScrollBar()
+        steps = {
+            Qt.Key_Up: -1,
+            Qt.Key_Down: 1,
+            Qt.Key_PageUp: -vertical.pageStep(),
+            Qt.Key_PageDown: vertical.pageStep(),
+        }
+        if event.key() in steps:
+            vertical.setValue(vertical.value() + steps[event.key()])
+        elif event.key() == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            vertical.setValue(vertical.minimum())
+        elif event.key() == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            vertical.setValue(vertical.maximum())
+        else:
+            super().keyPressEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        metrics = self.fontMetrics()
+        line_height = metrics.height()
+        gutter = self.gutterWidth()
+        viewport = self.viewport().rect()
+        painter.fillRect(viewport, self.theme.palette['background'])
+        painter.fillRect(0, 0, gutter - 4, viewport.height(), self.theme.colors['gutter_background'])
+
+        first = self.verticalScrollBar().value()
+        lines = self.mapped.readLines(first, self.visibleLineCount() + 1)
+        text_color = self.theme.palette['text']
+        token_colors = [self.theme.formats[name].foreground().color() for name in PythonLexer.TOKEN_NAMES]
+        x_origin = gutter - self.horizontalScrollBar().value()
+        # Highlighting restarts at the first visible line, so a multi-line
+        # string opened above the viewport is not recognised
+        state = PythonLexer.STATE_NORMAL
+        painter.setClipRect(viewport)
+        max_width = self.max_width
+        for row, text in enumerate(lines):
+            text = text.expandtabs(4)
+            top = row * line_height
+            baseline = top + metrics.ascent()
+            painter.setPen(self.theme.colors['gutter_text'])
+            painter.drawText(0, top, gutter - 8, line_height, Qt.AlignRight, str(first + row + 1))
+
+            runs, state = PythonLexer.tokenize(text, state)
+            column = 0
+            x = x_origin
+            for start, length, token in runs + [(len(text), 0, None)]:
+                for pen, segment in ((text_color, text[column:start]),
+                                     (token_colors[token] if token is not None else None,
+                                      text[start:start + length])):
+                    if segment:
+                        painter.setPen(pen)
+                        painter.drawText(x, baseline, segment)
+                        x += metrics.horizontalAdvance(segment)
+                column = start + length
+            max_width = max(max_width, x - x_origin)
+        
+        if max_width > self.max_width:
+            self.max_width = max_width
+            QTimer.singleShot(0, self.updateScrollBars)
+
+    def statusText(self):
+        """Describes the view for the status bar"""
+        size_mb = self.mapped.size / (1024 * 1024)
+        lines = f"{self.mapped.lineCount():,} lines" if self.mapped.isIndexed() else "indexing lines"
+        return f"Large file mode (read-only): {self.mapped.path} - {size_mb:.1f} MB, {lines}"
+
+class FileReader(QThread):
+    """Reads and decodes a text file in chunks off the GUI thread"""
+    chunkRead = pyqtSignal(str, int)  # text, bytes read so far
+    restarted = pyqtSignal(str)  # fallback encoding, chunks read before are invalid
+    failed = pyqtSignal(str)
+
+    CHUNK_CHARS = 1 << 16
+    FALLBACK_ENCODING = 'latin-1'
+    BOMS = (
+        (codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF32_LE, 'utf-32'),
+        (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16'),
+    )
+    # PEP 263 encoding declaration
+    CODING_COOKIE = re.compile(rb'^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)', re.MULTILINE)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.size = 0
+        self.encoding = None
+        self.cancelled = False
+
+    @staticmethod
+    def detectEncoding(head):
+        """Guesses encoding from byte order mark or coding declaration, defaulting to UTF-8"""
+        for bom, encoding in FileReader.BOMS:
+            if head.startswith(bom):
+                return encoding
+        first_lines = b'\n'.join(head.split(b'\n', 2)[:2])
+        match = FileReader.CODING_COOKIE.search(first_lines)
+        if match:
+            try:
+                return codecs.lookup(match.group(1).decode('ascii')).name
+            except LookupError:
+                pass
+        return 'utf-8'
+
+    def run(self):
+        try:
+            with open(self.path, 'rb') as file:
+                self.size = os.fstat(file.fileno()).st_size
+                encoding = self.detectEncoding(file.read(4096))
+                try:
+                    self.readText(file, encoding)
+                except UnicodeDecodeError:
+                    if self.cancelled:
+                        return
+                    self.restarted.emit(self.FALLBACK_ENCODING)
+                    self.readText(file, self.FALLBACK_ENCODING)
+        except OSError as e:
+            self.failed.emit(str(e))
+
+    def readText(self, file, encoding):
+        """Emits decoded chunks with universal newlines from the start of file"""
+        self.encoding = encoding
+        file.seek(0)
+        text_file = io.TextIOWrapper(file, encoding=encoding, newline=None)
+        try:
+            while not self.cancelled:
+                text = text_file.read(self.CHUNK_CHARS)
+                if not text:
+                    break
+                self.chunkRead.emit(text, file.tell())
+        finally:
+            text_file.detach()
+
+class DocumentLoader(QObject):
+    """Streams a file into an editor in time slices while a FileReader decodes it"""
+    progress = pyqtSignal(int)  # percent
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, editor, path, slice_ms=8):
+        super().__init__(editor)
+        self.editor = editor
+        self.path = path
+        self.slice_time = slice_ms / 1000.0
+        self.pending = deque()
+        self.bytes_loaded = 0
+        self.reader_done = False
+        self.active = False
+
+        self.reader = FileReader(path)
+        self.reader.chunkRead.connect(self.onChunkRead)
+        self.reader.restarted.connect(self.onRestarted)
+        self.reader.failed.connect(self.onFailed)
+        self.reader.finished.connect(self.onReaderFinished)
+
+        self.appendTimer = QTimer(self)
+        self.appendTimer.setInterval(0)
+        self.appendTimer.timeout.connect(self.appendSlice)
+
+    def encoding(self):
+        return self.reader.encoding
+
+    def start(self):
+        """Clears the editor and starts streaming the file into it"""
+        editor = self.editor
+        self.active = True
+        editor.setLoading(True)
+        editor.setReadOnly(True)
+        editor.clear()
+        # Highlighting follows the viewport, the undo history starts when loading finishes
+        editor.backgroundHighlighter.prepare()
+        self.reader.start()
+
+    def cancel(self):
+        """Stops loading and clears the partially loaded text"""
+        if not self.active:
+            return
+        self.reader.cancelled = True
+        self.stop()
+        self.editor.clear()
+
+    def stop(self, completed=False):
+        self.active = False
+        self.appendTimer.stop()
+        self.pending.clear()
+        editor = self.editor
+        if not completed:
+            editor.backgroundHighlighter.cancel()
+        editor.setReadOnly(False)
+        editor.setLoading(False)
+
+    def onChunkRead(self, text, position):
+        if not self.active:
+            return
+        self.pending.append((text, position))
+        self.appendTimer.start()
+
+    def onRestarted(self, encoding):
+        """Starts over after the detected encoding turned out wrong"""
+        if not self.active:
+            return
+        self.pending.clear()
+        self.bytes_loaded = 0
+        self.editor.clear()
+
+    def onFailed(self, message):
+        if self.active:
+            self.stop()
+            self.editor.clear()
+            self.failed.emit(message)
+
+    def onReaderFinished(self):
+        self.reader.wait()
+        self.reader_done = True
+        if self.active:
+            self.appendTimer.start()
+        else:
+            self.deleteLater()
+
+    def appendSlice(self):
+        """Appends decoded chunks at the end of the document for one time slice"""
+        if not self.active:
+            self.appendTimer.stop()
+            return
+        cursor = QTextCursor(self.editor.document())
+        cursor.movePosition(QTextCursor.End)
+        deadline = time.perf_counter() + self.slice_time
+        while self.pending and time.perf_counter() < deadline:
+            text, self.bytes_loaded = self.pending.popleft()
+            cursor.insertText(text)
+        if self.reader.size:
+            self.progress.emit(min(100, self.bytes_loaded * 100 // self.reader.size))
+        if self.pending:
+            return
+        self.appendTimer.stop()
+        if self.reader_done:
+            self.stop(completed=True)
+            self.editor.backgroundHighlighter.start()
+            self.finished.emit()
+            self.deleteLater()
+
+class FileSaver(QThread):
+    """Writes a text snapshot atomically off the GUI thread: temporary file, fsync, rename"""
+    saved = pyqtSignal(str)  # path
+    failed = pyqtSignal(str, str)  # path, error message
+    new_file_mode = None  # 0o666 minus the umask, read once on the GUI thread
+
+    def __init__(self, path, text, encoding='utf-8'):
         super().__init__()
-        self.code_structure_tree = None
-        
-    def setCodeStructureTree(self, tree):
-        """Sets code structure tree"""
-        self.code_structure_tree = tree
-        
-    def keyPressEvent(self, event):
-        super().keyPressEvent(event)
-        
-        # Update structure tree after changes
-        if self.code_structure_tree:
-            QTimer.singleShot(100, lambda: self.code_structure_tree.updateStructure(self.toPlainText()))
+        self.path = os.path.abspath(path)
+        self.text = text
+        self.encoding = encoding
+        if FileSaver.new_file_mode is None:
+            # The umask can only be read by setting it, so do that once, off the worker thread
+            umask = os.umask(0)
+            os.umask(umask)
+            FileSaver.new_file_mode = 0o666 & ~umask
+
+    def run(self):
+        # Write through symlinks instead of replacing the link with a regular file
+        target = os.path.realpath(self.path)
+        directory, name = os.path.split(target)
+        temp_path = None
+        try:
+            # Temporary file in the same directory, so the rename cannot cross file systems
+            fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+            with os.fdopen(fd, 'w', encoding=self.encoding) as file:
+                file.write(self.text)
+                file.flush()
+                os.fsync(file.fileno())
+            # mkstemp creates the file with mode 0600, give it the mode a new or the old file has
+            if os.path.exists(target):
+                shutil.copymode(target, temp_path)
+            else:
+                os.chmod(temp_path, self.new_file_mode)
+            os.replace(temp_path, target)
+            temp_path = None
+            self.syncDirectory(directory)
+        except (OSError, UnicodeEncodeError, LookupError) as e:
+            self.failed.emit(self.path, str(e))
+            return
+        finally:
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+        self.saved.emit(self.path)
+
+    @staticmethod
+    def syncDirectory(directory):
+        """Makes the rename itself durable where the platform allows it"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        try:
+            fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
 
 class CompilerDialog(QDialog):
     def __init__(self, parent=None):
@@ -2019,9 +5730,8 @@ class CompilerDialog(QDialog):
         
     def continueToCompiler(self):
         """Goes to appropriate compiler dialog"""
-        dialog = PyInstallerDialog(self.parent)
         self.accept()
-        dialog.exec_()
+        self.parent.dialogs.exec_("pyinstaller")
 
 class AboutDialog(QDialog):
     def __init__(self, parent=None):
@@ -2093,10 +5803,401 @@ class AboutDialog(QDialog):
         
         self.setLayout(layout)
 
+class DialogRegistry:
+    """Builds dialogs on first use and keeps them warm so their state survives closing"""
+
+    def __init__(self, parent, max_cached=4, memory_threshold=90.0):
+        self.parent = parent
+        self.max_cached = max_cached
+        self.memory_threshold = memory_threshold  # system memory usage in percent
+        self.factories = {}
+        self.dialogs = OrderedDict()  # least recently used first
+
+    def register(self, name, factory):
+        """Registers factory called with parent window to build dialog"""
+        self.factories[name] = factory
+
+    def get(self, name):
+        """Returns cached dialog, building it if needed"""
+        dialog = self.dialogs.get(name)
+        if dialog is None:
+            self.releaseUnused(keep=self.max_cached - 1)
+            dialog = self.factories[name](self.parent)
+            self.dialogs[name] = dialog
+        else:
+            self.dialogs.move_to_end(name)
+        if self.memoryLow():
+            self.releaseUnused(keep=1)
+        return dialog
+
+    def exec_(self, name):
+        """Shows dialog modally and returns its result"""
+        dialog = self.get(name)
+        if hasattr(dialog, 'prepareForShow'):
+            dialog.prepareForShow()
+        return dialog.exec_()
+
+    def evict(self, name):
+        """Destroys cached dialog, it will be rebuilt on next use"""
+        dialog = self.dialogs.pop(name, None)
+        if dialog is not None:
+            dialog.deleteLater()
+
+    def releaseUnused(self, keep=0):
+        """Evicts least recently used hidden dialogs until at most keep remain"""
+        for name in list(self.dialogs):
+            if len(self.dialogs) <= max(0, keep):
+                break
+            if not self.isInUse(self.dialogs[name]):
+                self.evict(name)
+
+    @staticmethod
+    def isInUse(dialog):
+        """Shown, or hidden with work still running on it, as a compilation that
+        keeps using the dialog and its progress window"""
+        is_busy = getattr(dialog, 'isBusy', None)
+        return dialog.isVisible() or (is_busy is not None and is_busy())
+
+    def memoryLow(self):
+        """Checks if system memory usage is above threshold"""
+        if not PSUTIL_AVAILABLE:
+            return False
+        try:
+            return psutil.virtual_memory().percent >= self.memory_threshold
+        except Exception:
+            return False
+
+class SessionStore:
+    """Open documents and window layout of the last session, with analysis results
+    of the texts seen in it keyed by text hash, kept in the user cache directory"""
+    VERSION = 1
+    # Analysis results of this many most recently saved texts are kept
+    MAX_ANALYSES = 64
+
+    def __init__(self, directory=None):
+        if directory is None:
+            location = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+            directory = os.path.join(location or tempfile.gettempdir(), 'pyddle')
+        self.directory = directory
+        self.analyses = None  # text digest -> {kind: result}, read on first use
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def readJson(self, name):
+        try:
+            with open(os.path.join(self.directory, name), encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return None
+        return data
+
+    def writeJson(self, name, data):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=f'.{name}-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(dict(data, version=self.VERSION), file)
+            os.replace(temp_path, os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def load(self):
+        """Returns the saved session, None if there is none"""
+        return self.readJson('session.json')
+
+    def save(self, session):
+        self.writeJson('session.json', session)
+        if self.analyses is not None:
+            self.writeJson('analysis_cache.json', {'analyses': self.analyses})
+
+    def loadAnalyses(self):
+        if self.analyses is None:
+            data = self.readJson('analysis_cache.json')
+            # Insertion order is the order of use, oldest first
+            self.analyses = OrderedDict(data['analyses'] if data else ())
+
+    def analysis(self, digest):
+        """Analysis results saved for the text with digest, None if there are none"""
+        self.loadAnalyses()
+        results = self.analyses.get(digest)
+        if results is not None:
+            self.analyses.move_to_end(digest)
+        return results
+
+    def storeAnalysis(self, digest, results):
+        self.loadAnalyses()
+        self.analyses[digest] = results
+        self.analyses.move_to_end(digest)
+        while len(self.analyses) > self.MAX_ANALYSES:
+            self.analyses.popitem(last=False)
+
+class Document:
+    """A file open in a tab: its live editor, or compressed text and view state
+    while hibernated, or only its path and view state until a document restored
+    from the last session is first shown"""
+
+    def __init__(self, path=None, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.editor = None
+        self.viewer = None  # LargeFileViewer of files opened read-only
+        self.loader = None  # DocumentLoader while the file streams in
+        self.unloaded = False  # restored from the last session, the file is read when shown
+        self.last_active = time.monotonic()
+        # Hibernated state
+        self.compressed_text = None
+        self.view_state = None  # anchor, position, scroll values, breakpoints
+        self.modified = False
+        self.scroll = None  # scroll values restored once the editor is shown
+
+    def widget(self):
+        return self.viewer if self.viewer is not None else self.editor
+
+    def isHibernated(self):
+        return self.compressed_text is not None
+
+    def isModified(self):
+        if self.editor is not None:
+            return self.editor.document().isModified()
+        return self.modified
+
+    def name(self):
+        return os.path.basename(self.path) if self.path else "Untitled"
+
+    def title(self):
+        return self.name() + ' *' if self.isModified() else self.name()
+
+    def viewState(self):
+        """Cursor anchor and position, scroll values and breakpoints, None without an editor"""
+        editor = self.editor
+        if editor is None or self.loader is not None:
+            return self.view_state
+        cursor = editor.textCursor()
+        return (cursor.anchor(), cursor.position(), editor.verticalScrollBar().value(),
+                editor.horizontalScrollBar().value(),
+                tuple(editor.line_markers[CodeEditor.MARKER_BREAKPOINT]))
+
+    def hibernate(self):
+        """Keeps compressed text and view state, returns the editor to be released"""
+        editor = self.editor
+        text = editor.toPlainText().encode('utf-8', 'surrogatepass')
+        self.compressed_text = zlib.compress(text, 1)
+        self.view_state = self.viewState()
+        self.modified = editor.document().isModified()
+        self.editor = None
+        return editor
+
+    def restore(self, editor):
+        """Loads the hibernated text and view state into a new editor"""
+        editor.setPlainText(zlib.decompress(self.compressed_text).decode('utf-8', 'surrogatepass'))
+        editor.undoHistory.setClean(not self.modified)
+        editor.document().setModified(self.modified)
+        self.applyViewState(editor)
+        self.compressed_text = None
+        self.editor = editor
+
+    def applyViewState(self, editor):
+        """Puts the cursor and breakpoints back, scroll values wait for restoreScroll"""
+        anchor, position, vertical, horizontal, breakpoints = self.view_state
+        # The file may have changed since a session was saved
+        end = editor.document().characterCount() - 1
+        cursor = editor.textCursor()
+        cursor.setPosition(min(anchor, end))
+        cursor.setPosition(min(position, end), QTextCursor.KeepAnchor)
+        editor.setTextCursor(cursor)
+        for line in breakpoints:
+            if line < editor.blockCount():
+                editor.setLineMarker(line, CodeEditor.MARKER_BREAKPOINT)
+        self.scroll = (vertical, horizontal)
+        self.view_state = None
+
+    def restoreScroll(self):
+        """Scrolls back to the hibernated position, which showing the editor would
+        otherwise replace with one that just reveals the cursor"""
+        if self.scroll is not None:
+            vertical, horizontal = self.scroll
+            self.scroll = None
+            self.editor.verticalScrollBar().setValue(vertical)
+            self.editor.horizontalScrollBar().setValue(horizontal)
+
+class DocumentTabs(QWidget):
+    """Tab bar over a stack of document widgets. At most MAX_LIVE_EDITORS documents
+    keep an editor, the least recently used ones and those idle for a while are
+    hibernated: their editor with its highlighter, caches and undo stack is released"""
+    MAX_LIVE_EDITORS = 8
+    IDLE_HIBERNATE_S = 600
+    IDLE_CHECK_MS = 60 * 1000
+
+    currentChanged = pyqtSignal(object)  # Document
+    closeRequested = pyqtSignal(object)  # Document
+    # Document restored from the last session being shown, an editor or viewer is expected
+    loadRequested = pyqtSignal(object)
+
+    def __init__(self, create_editor, parent=None):
+        super().__init__(parent)
+        self.create_editor = create_editor
+        self.current = None
+
+        self.tabBar = QTabBar()
+        self.tabBar.setTabsClosable(True)
+        self.tabBar.setMovable(True)
+        self.tabBar.setDocumentMode(True)
+        self.tabBar.setExpanding(False)
+        self.tabBar.setElideMode(Qt.ElideMiddle)
+        self.tabBar.currentChanged.connect(self.onTabChanged)
+        self.tabBar.tabCloseRequested.connect(lambda index: self.closeRequested.emit(self.documentAt(index)))
+        self.stack = QStackedWidget()
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.tabBar)
+        layout.addWidget(self.stack)
+
+        self.idleTimer = QTimer(self)
+        self.idleTimer.setInterval(self.IDLE_CHECK_MS)
+        self.idleTimer.timeout.connect(self.hibernateIdle)
+        self.idleTimer.start()
+
+    def documentAt(self, index):
+        return self.tabBar.tabData(index)
+
+    def documents(self):
+        """Documents in tab order"""
+        return [self.documentAt(index) for index in range(self.tabBar.count())]
+
+    def liveEditors(self):
+        return [document.editor for document in self.documents() if document.editor is not None]
+
+    def findPath(self, path):
+        path = os.path.abspath(path)
+        for document in self.documents():
+            if document.path and os.path.abspath(document.path) == path:
+                return document
+        return None
+
+    def addDocument(self, document, show=True):
+        """Adds a tab for document, which gets an editor unless it has a viewer or is
+        unloaded, and shows it"""
+        if document.viewer is not None:
+            self.attachViewer(document, document.viewer)
+        elif document.editor is None and not document.unloaded:
+            self.attachEditor(document, self.create_editor())
+        index = self.tabBar.addTab(document.title())
+        self.tabBar.setTabData(index, document)
+        self.tabBar.setTabToolTip(index, document.path or "")
+        if self.tabBar.currentIndex() == index:
+            # The first tab became current before its document was set
+            self.onTabChanged(index)
+        elif show:
+            self.tabBar.setCurrentIndex(index)
+        return document
+
+    def attachEditor(self, document, editor):
+        document.editor = editor
+        editor.document().modificationChanged.connect(lambda _: self.updateTitle(document))
+        self.stack.addWidget(editor)
+
+    def attachViewer(self, document, viewer):
+        document.viewer = viewer
+        self.stack.addWidget(viewer)
+
+    def setCurrent(self, document):
+        self.tabBar.setCurrentIndex(self.documents().index(document))
+
+    def updateTitle(self, document):
+        documents = self.documents()
+        if document in documents:
+            index = documents.index(document)
+            self.tabBar.setTabText(index, document.title())
+            self.tabBar.setTabToolTip(index, document.path or "")
+
+    def onTabChanged(self, index):
+        if index < 0:
+            return
+        document = self.documentAt(index)
+        if document is None:
+            return  # tab being added, its data is set next
+        if document.isHibernated():
+            editor = self.create_editor()
+            document.restore(editor)
+            self.attachEditor(document, editor)
+        elif document.unloaded:
+            document.unloaded = False
+            self.loadRequested.emit(document)
+        self.stack.setCurrentWidget(document.widget())
+        if document.editor is not None:
+            document.restoreScroll()
+        document.last_active = time.monotonic()
+        self.current = document
+        self.currentChanged.emit(document)
+        self.hibernateLeastRecent()
+
+    def removeDocument(self, document):
+        """Closes the tab of document and releases its widget"""
+        index = self.documents().index(document)
+        widget = document.widget()
+        self.tabBar.removeTab(index)
+        if document is self.current and self.tabBar.count() == 0:
+            self.current = None
+        if widget is not None:
+            self.stack.removeWidget(widget)
+            if document.editor is not None:
+                document.editor.shutdown()
+            widget.deleteLater()
+        document.editor = None
+        if document.viewer is not None:
+            document.viewer.closeMapping()
+            document.viewer = None
+
+    def canHibernate(self, document):
+        return (document.editor is not None and document is not self.current
+                and document.loader is None)
+
+    def hibernate(self, document):
+        editor = document.hibernate()
+        self.stack.removeWidget(editor)
+        editor.shutdown()
+        editor.deleteLater()
+
+    def hibernateLeastRecent(self):
+        """Hibernates the least recently used editors beyond MAX_LIVE_EDITORS"""
+        live = [document for document in self.documents() if document.editor is not None]
+        excess = len(live) - self.MAX_LIVE_EDITORS
+        if excess <= 0:
+            return
+        candidates = sorted((document for document in live if self.canHibernate(document)),
+                            key=lambda document: document.last_active)
+        for document in candidates[:excess]:
+            self.hibernate(document)
+
+    def hibernateIdle(self):
+        """Hibernates editors not shown for IDLE_HIBERNATE_S seconds"""
+        limit = time.monotonic() - self.IDLE_HIBERNATE_S
+        for document in self.documents():
+            if self.canHibernate(document) and document.last_active < limit:
+                self.hibernate(document)
+
 class PythonEditor(QMainWindow):
+    # Files of at least this many bytes open in the read-only large file viewer
+    LARGE_FILE_SIZE = 20 * 1024 * 1024
+    PACKAGE_INDEX_DELAY_MS = 1000
+    
     def __init__(self):
         super().__init__()
-        self.current_file = None
+        self.large_file_size = self.LARGE_FILE_SIZE
+        self.undo_memory_limit = UndoHistory.MEMORY_LIMIT
+        self.editor = None  # editor of the current document
+        self.current_document = None
+        self.placeholderEditor = None  # stands in for the editor while a large file is shown
+        self.minimap_visible = True
+        self.session = None  # SessionStore when the session is saved on exit and restored
+        self.fileSaver = None
+        self.queued_saves = OrderedDict()  # path -> newest snapshot waiting for the save in progress
         self.debug_lines = []
         self.breakpoints = set()
         self.current_line = 0
@@ -2105,172 +6206,37 @@ class PythonEditor(QMainWindow):
         self.execution_manager = CodeExecutionManager(self)
         self.enhanced_syntax_checker = EnhancedSyntaxChecker()
         self.debugger_window = None
-        self.open_windows = []  # Lista otwartych okien
-        self.initUI()
-        
-        # Immediately refresh code structure after initialization
-        QTimer.singleShot(100, self.updateCodeStructure)
+        self.theme = THEMES[DEFAULT_THEME]
+        self.dialogs = DialogRegistry(self)
+        self.dialogs.register("ai_suggestion", AISuggestionDialog)
+        self.dialogs.register("advanced_find_replace", AdvancedFindReplaceDialog)
+        self.dialogs.register("compiler", CompilerDialog)
+        self.dialogs.register("pyinstaller", PyInstallerDialog)
+        self.dialogs.register("about", AboutDialog)
+        with startup_profiler.phase("PythonEditor.initUI"):
+            self.initUI()
+        # Installed packages are indexed for completion once the window is up
+        QTimer.singleShot(self.PACKAGE_INDEX_DELAY_MS, package_index.start)
         
     def initUI(self):
         self.setWindowTitle('PyDDLE - Python Development IDE')
         self.setGeometry(100, 100, 1400, 900)
         
         # Set application style - Windows 11 inspired
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #FFFFFF;
-                color: #000000;
-            }
-            QMenuBar {
-                background-color: #FFFFFF;
-                color: #000000;
-                border-bottom: 1px solid #E1E1E1;
-            }
-            QMenuBar::item {
-                padding: 5px 10px;
-                background-color: transparent;
-                border-radius: 4px;
-            }
-            QMenuBar::item:selected {
-                background-color: #E1E1E1;
-            }
-            QMenu {
-                background-color: #FFFFFF;
-                color: #000000;
-                border: 1px solid #E1E1E1;
-                border-radius: 4px;
-            }
-            QMenu::item {
-                padding: 5px 20px 5px 20px;
-            }
-            QMenu::item:selected {
-                background-color: #0078D4;
-                color: #FFFFFF;
-            }
-            QToolBar {
-                background-color: #F8F8F8;
-                border: none;
-                spacing: 3px;
-                padding: 3px;
-            }
-            QToolButton {
-                background-color: transparent;
-                border: 1px solid transparent;
-                border-radius: 4px;
-                padding: 5px;
-                color: #000000;
-            }
-            QToolButton:hover {
-                background-color: #E1E1E1;
-            }
-            QToolButton:pressed {
-                background-color: #CCCCCC;
-            }
-            QDockWidget {
-                background-color: #FFFFFF;
-                border: 1px solid #E1E1E1;
-                color: #000000;
-                border-radius: 4px;
-            }
-            QDockWidget::title {
-                background-color: #F8F8F8;
-                padding: 5px;
-                text-align: center;
-                color: #000000;
-                border-bottom: 1px solid #E1E1E1;
-            }
-            QTabWidget::pane {
-                border: 1px solid #E1E1E1;
-                background-color: #FFFFFF;
-                border-radius: 4px;
-            }
-            QTabBar::tab {
-                background-color: #F8F8F8;
-                padding: 8px 12px;
-                margin-right: 2px;
-                border: 1px solid #E1E1E1;
-                border-bottom: none;
-                border-top-left-radius: 4px;
-                border-top-right-radius: 4px;
-                color: #000000;
-            }
-            QTabBar::tab:selected {
-                background-color: #FFFFFF;
-                border-bottom: 1px solid #FFFFFF;
-            }
-            QStatusBar {
-                background-color: #0078D4;
-                color: white;
-                border-top: 1px solid #E1E1E1;
-            }
-            QPlainTextEdit, QTextEdit {
-                background-color: #FFFFFF;
-                color: #000000;
-                selection-background-color: #0078D4;
-                border: 1px solid #E1E1E1;
-                border-radius: 4px;
-            }
-            QTreeWidget {
-                background-color: #FFFFFF;
-                color: #000000;
-                alternate-background-color: #F8F8F8;
-                border: 1px solid #E1E1E1;
-                border-radius: 4px;
-            }
-            QListWidget {
-                background-color: #FFFFFF;
-                color: #000000;
-                alternate-background-color: #F8F8F8;
-                border: 1px solid #E1E1E1;
-                border-radius: 4px;
-            }
-            QGroupBox {
-                color: #000000;
-                border: 1px solid #E1E1E1;
-                margin-top: 10px;
-                padding-top: 10px;
-                border-radius: 4px;
-                background-color: #F8F8F8;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-                background-color: #F8F8F8;
-            }
-            QLineEdit, QComboBox {
-                background-color: #FFFFFF;
-                color: #000000;
-                border: 1px solid #E1E1E1;
-                padding: 5px;
-                border-radius: 4px;
-            }
-            QPushButton {
-                background-color: #0078D4;
-                color: white;
-                border: none;
-                padding: 8px 15px;
-                border-radius: 4px;
-            }
-            QPushButton:hover {
-                background-color: #106EBE;
-            }
-            QPushButton:pressed {
-                background-color: #005A9E;
-            }
-            QPushButton:disabled {
-                background-color: #CCCCCC;
-                color: #666666;
-            }
-        """)
-
-        # Main editor
-        self.editor = EnhancedCodeEditor()
-        self.setCentralWidget(self.editor)
+        with startup_profiler.phase("stylesheet"):
+            self.applyStyleSheet()
+
+        # Documents in tabs, the first one is wired to the window at the end
+        with startup_profiler.phase("EnhancedCodeEditor"):
+            self.documentTabs = DocumentTabs(self.createEditor)
+            self.current_document = self.documentTabs.addDocument(Document())
+        self.setCentralWidget(self.documentTabs)
         
         # Create menus
-        self.createMenus()
-        self.createToolbars()
+        with startup_profiler.phase("createMenus"):
+            self.createMenus()
+        with startup_profiler.phase("createToolbars"):
+            self.createToolbars()
         
         # Output console
         self.outputConsole = QTextEdit()
@@ -2281,29 +6247,102 @@ class PythonEditor(QMainWindow):
         
         # Code structure tree
         self.codeStructureTree = CodeStructureTree(self)
-        self.editor.setCodeStructureTree(self.codeStructureTree)
         
         # Side panel
-        self.createSidePanel()
+        with startup_profiler.phase("createSidePanel"):
+            self.createSidePanel()
         
         # Status bar with buttons
         self.statusBar = StatusBarWithButtons(self)
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage('Ready')
         
-        # Timer for UI updates
-        self.updateTimer = QTimer()
-        self.updateTimer.timeout.connect(self.updateUI)
-        self.updateTimer.start(100)
-        
         # Timer for syntax checking
         self.syntaxTimer = QTimer()
         self.syntaxTimer.timeout.connect(self.delayedSyntaxCheck)
         self.syntaxTimer.setSingleShot(True)
+        self.checked_revision = None
+        self.syntaxChecker = None  # SyntaxChecker running for the current editor
+        
+        self.documentTabs.currentChanged.connect(self.onDocumentChanged)
+        self.documentTabs.closeRequested.connect(self.closeDocument)
+        self.documentTabs.loadRequested.connect(self.loadDocument)
+        self.onDocumentChanged(self.current_document)
+
+    @property
+    def current_file(self):
+        """Path of the current document, None while it is untitled"""
+        return self.current_document.path
+
+    def createEditor(self):
+        """Builds an editor for a document with the window's theme, zoom and minimap setting"""
+        editor = EnhancedCodeEditor()
+        editor.applyTheme(self.theme)
+        if self.editor is not None:
+            editor.setFont(self.editor.font())
+        editor.setMinimapVisible(self.minimap_visible)
+        editor.undoHistory.memory_limit = self.undo_memory_limit
+        return editor
+
+    def setUndoMemoryLimit(self, limit):
+        """Caps the undo history of every editor at limit bytes"""
+        self.undo_memory_limit = limit
+        for editor in self.documentTabs.liveEditors():
+            editor.undoHistory.memory_limit = limit
+
+    def connectEditor(self, editor, connect=True):
+        """Connects or disconnects the window's handlers of editor signals"""
+        # UI updates are driven by editor signals, nothing runs while idle
+        handlers = [
+            (editor.cursorPositionChanged, self.updateCursorPosition),
+            (editor.document().contentsChange, self.onContentsChange),
+            (editor.loadingFinished, self.scheduleSyntaxCheck),
+            (editor.breakpointToggled, self.onBreakpointToggled),
+            (editor.markersChanged, self.onMarkersChanged),
+        ]
+        for signal, handler in handlers:
+            if connect:
+                signal.connect(handler)
+            else:
+                signal.disconnect(handler)
+
+    def onDocumentChanged(self, document):
+        """Points actions, side panels and status bar at the document shown"""
+        self.current_document = document
+        editor = document.editor
+        if editor is None:
+            # Large file viewers have no editor, edits go to an empty read-only one
+            if self.placeholderEditor is None:
+                self.placeholderEditor = self.createEditor()
+                self.placeholderEditor.setReadOnly(True)
+            editor = self.placeholderEditor
+        if editor is not self.editor:
+            if self.editor is not None:
+                self.connectEditor(self.editor, False)
+            self.connectEditor(editor)
+            self.editor = editor
+            editor.setCodeStructureTree(self.codeStructureTree)
+        self.breakpoints = {line + 1 for line in editor.line_markers[CodeEditor.MARKER_BREAKPOINT]}
+        self.syntax_errors.clear()
+        self.checked_revision = None
+        self.stopSyntaxCheck()
+        self.showAnalysis(editor)
+        self.scheduleSyntaxCheck()
+        self.updateCursorPosition()
+        if document.viewer is not None:
+            self.statusBar.showMessage(document.viewer.statusText())
+        elif document.path:
+            self.statusBar.showMessage(document.path)
+        document.widget().setFocus()
+
+    def applyStyleSheet(self):
+        """Applies main window style sheet of the current theme"""
+        self.setStyleSheet(self.theme.stylesheet)
         
     def createToolbars(self):
         # Main toolbar
         mainToolbar = self.addToolBar('Main')
+        mainToolbar.setObjectName('mainToolbar')
         mainToolbar.setMovable(False)
         mainToolbar.setIconSize(QSize(16, 16))
         
@@ -2354,6 +6393,8 @@ class PythonEditor(QMainWindow):
     def createSidePanel(self):
         # Main dock widget
         mainDock = QDockWidget("Execution Panel", self)
+        # Object names identify docks in the layout saved with the session
+        mainDock.setObjectName('executionPanel')
         mainDock.setAllowedAreas(Qt.RightDockWidgetArea | Qt.LeftDockWidgetArea)
         
         widget = QWidget()
@@ -2392,6 +6433,7 @@ class PythonEditor(QMainWindow):
         
         # Dock widget for code structure
         structure_dock = QDockWidget("Code Structure", self)
+        structure_dock.setObjectName('codeStructure')
         structure_dock.setWidget(self.codeStructureTree)
         structure_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
         self.addDockWidget(Qt.LeftDockWidgetArea, structure_dock)
@@ -2421,6 +6463,11 @@ class PythonEditor(QMainWindow):
         saveAsAction.triggered.connect(self.saveAsFile)
         fileMenu.addAction(saveAsAction)
         
+        closeTabAction = QAction('&Close', self)
+        closeTabAction.setShortcut('Ctrl+W')
+        closeTabAction.triggered.connect(lambda: self.closeDocument(self.current_document))
+        fileMenu.addAction(closeTabAction)
+        
         fileMenu.addSeparator()
         
         compileAction = QAction('Compile to &EXE...', self)
@@ -2438,35 +6485,50 @@ class PythonEditor(QMainWindow):
         editMenu = menubar.addMenu('&Edit')
         undoAction = QAction('&Undo', self)
         undoAction.setShortcut('Ctrl+Z')
-        undoAction.triggered.connect(self.editor.undo)
+        undoAction.triggered.connect(lambda: self.editor.undo())
         editMenu.addAction(undoAction)
         
         redoAction = QAction('&Redo', self)
         redoAction.setShortcut('Ctrl+Y')
-        redoAction.triggered.connect(self.editor.redo)
+        redoAction.triggered.connect(lambda: self.editor.redo())
         editMenu.addAction(redoAction)
         
         editMenu.addSeparator()
         cutAction = QAction('Cu&t', self)
         cutAction.setShortcut('Ctrl+X')
-        cutAction.triggered.connect(self.editor.cut)
+        cutAction.triggered.connect(lambda: self.editor.cut())
         editMenu.addAction(cutAction)
         
         copyAction = QAction('&Copy', self)
         copyAction.setShortcut('Ctrl+C')
-        copyAction.triggered.connect(self.editor.copy)
+        copyAction.triggered.connect(lambda: self.editor.copy())
         editMenu.addAction(copyAction)
         
         pasteAction = QAction('&Paste', self)
         pasteAction.setShortcut('Ctrl+V')
-        pasteAction.triggered.connect(self.editor.paste)
+        pasteAction.triggered.connect(lambda: self.editor.paste())
         editMenu.addAction(pasteAction)
         
         selectAllAction = QAction('Select &All', self)
         selectAllAction.setShortcut('Ctrl+A')
-        selectAllAction.triggered.connect(self.editor.selectAll)
+        selectAllAction.triggered.connect(lambda: self.editor.selectAll())
         editMenu.addAction(selectAllAction)
         
+        nextOccurrenceAction = QAction('Add &Next Occurrence', self)
+        nextOccurrenceAction.setShortcut('Ctrl+D')
+        nextOccurrenceAction.triggered.connect(lambda: self.editor.addNextOccurrence())
+        editMenu.addAction(nextOccurrenceAction)
+        
+        allOccurrencesAction = QAction('Select All &Occurrences', self)
+        allOccurrencesAction.setShortcut('Ctrl+Shift+L')
+        allOccurrencesAction.triggered.connect(lambda: self.editor.selectAllOccurrences())
+        editMenu.addAction(allOccurrencesAction)
+        
+        matchingBracketAction = QAction('Go to &Matching Bracket', self)
+        matchingBracketAction.setShortcut('Ctrl+Shift+\\')
+        matchingBracketAction.triggered.connect(lambda: self.editor.goToMatchingBracket())
+        editMenu.addAction(matchingBracketAction)
+        
         editMenu.addSeparator()
         
         # Formatting
@@ -2518,6 +6580,41 @@ class PythonEditor(QMainWindow):
         resetZoomAction.triggered.connect(self.resetZoom)
         viewMenu.addAction(resetZoomAction)
         
+        viewMenu.addSeparator()
+        themeMenu = viewMenu.addMenu('&Theme')
+        self.themeActions = QActionGroup(self)
+        for name in THEMES:
+            themeAction = QAction(name, self, checkable=True)
+            themeAction.setChecked(name == self.theme.name)
+            themeAction.triggered.connect(lambda checked, name=name: self.setTheme(name))
+            self.themeActions.addAction(themeAction)
+            themeMenu.addAction(themeAction)
+        
+        viewMenu.addSeparator()
+        toggleFoldAction = QAction('&Toggle Fold', self)
+        toggleFoldAction.setShortcut('Ctrl+Shift+[')
+        toggleFoldAction.triggered.connect(self.toggleFold)
+        viewMenu.addAction(toggleFoldAction)
+        
+        foldAllAction = QAction('&Fold All', self)
+        foldAllAction.setShortcut('Ctrl+K, Ctrl+0')
+        foldAllAction.triggered.connect(lambda: self.editor.foldIndex.foldAll())
+        viewMenu.addAction(foldAllAction)
+        
+        unfoldAllAction = QAction('&Unfold All', self)
+        unfoldAllAction.setShortcut('Ctrl+K, Ctrl+J')
+        unfoldAllAction.triggered.connect(lambda: self.editor.foldIndex.unfoldAll())
+        viewMenu.addAction(unfoldAllAction)
+        
+        self.minimapAction = QAction('&Minimap', self, checkable=True)
+        self.minimapAction.setChecked(True)
+        self.minimapAction.triggered.connect(self.setMinimapVisible)
+        viewMenu.addAction(self.minimapAction)
+        
+        highlighterStatsAction = QAction('&Highlighter Cache Statistics', self)
+        highlighterStatsAction.triggered.connect(self.showHighlighterStats)
+        viewMenu.addAction(highlighterStatsAction)
+        
         # Window Menu
         self.window_menu = menubar.addMenu('&Window')
         
@@ -2543,6 +6640,18 @@ class PythonEditor(QMainWindow):
         
         self.window_menu.addSeparator()
         
+        nextTabAction = QAction('Next &Document', self)
+        nextTabAction.setShortcut('Ctrl+Tab')
+        nextTabAction.triggered.connect(lambda: self.switchDocument(1))
+        self.window_menu.addAction(nextTabAction)
+        
+        previousTabAction = QAction('Previous D&ocument', self)
+        previousTabAction.setShortcut('Ctrl+Shift+Tab')
+        previousTabAction.triggered.connect(lambda: self.switchDocument(-1))
+        self.window_menu.addAction(previousTabAction)
+        
+        self.window_menu.addSeparator()
+        
         cascadeAction = QAction('&Cascade', self)
         cascadeAction.triggered.connect(self.cascadeWindows)
         self.window_menu.addAction(cascadeAction)
@@ -2712,36 +6821,299 @@ class PythonEditor(QMainWindow):
             if widget.isWindow() and widget != self and widget.isVisible():
                 widget.close()
 
+    def switchDocument(self, step):
+        """Shows the document step tabs after the current one, wrapping around"""
+        tabBar = self.documentTabs.tabBar
+        if tabBar.count() > 1:
+            tabBar.setCurrentIndex((tabBar.currentIndex() + step) % tabBar.count())
+
+    def closeDocument(self, document):
+        """Closes the tab of document, asking first if it has unsaved changes"""
+        if document.isModified():
+            reply = QMessageBox.question(self, "Close", f"Discard unsaved changes to {document.title()}?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+        loader = document.loader
+        if loader is not None:
+            document.loader = None
+            loader.cancel()
+            # The reader thread must not outlive the editor it feeds
+            loader.reader.wait()
+            self.statusBar.hideProgress()
+        # There is always a document to show
+        if len(self.documentTabs.documents()) == 1:
+            self.documentTabs.addDocument(Document())
+        self.documentTabs.removeDocument(document)
+
+    def reusableDocument(self):
+        """Returns the current document if it is an untouched untitled one"""
+        document = self.current_document
+        if (document.path is None and document.editor is not None and document.loader is None
+                and not document.isModified() and document.editor.document().isEmpty()):
+            return document
+        return None
+
     def newFile(self):
-        self.editor.clear()
-        self.current_file = None
+        self.documentTabs.addDocument(Document())
         self.statusBar.showMessage('New file created')
-        self.updateCodeStructure()
 
     def openFile(self):
         fileName, _ = QFileDialog.getOpenFileName(self, "Open Python File", "", "Python Files (*.py);;All Files (*)")
         if fileName:
-            with open(fileName, 'r', encoding='utf-8') as file:
-                self.editor.setPlainText(file.read())
-            self.current_file = fileName
-            self.statusBar.showMessage(f'Loaded: {fileName}')
-            self.updateCodeStructure()
+            self.openFileByPath(fileName)
+
+    def openFileByPath(self, fileName):
+        """Loads given file into a new tab in the background, or the large file viewer if it is too big"""
+        document = self.documentTabs.findPath(fileName)
+        if document is not None:
+            self.documentTabs.setCurrent(document)
+            return
+        try:
+            if os.path.getsize(fileName) >= self.large_file_size:
+                self.openLargeFile(fileName)
+                return
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Could not open file: {str(e)}")
+            return
+        document = self.reusableDocument() or self.documentTabs.addDocument(Document())
+        document.path = fileName
+        self.documentTabs.updateTitle(document)
+        self.startLoading(document)
+
+    def startLoading(self, document):
+        """Streams the file of document into its editor"""
+        loader = DocumentLoader(document.editor, document.path)
+        loader.progress.connect(self.statusBar.showProgress)
+        loader.finished.connect(lambda: self.onFileLoaded(document))
+        loader.failed.connect(lambda message: self.onFileLoadFailed(document, message))
+        document.loader = loader
+        self.statusBar.showMessage(f'Loading: {document.path}')
+        self.statusBar.showProgress(0)
+        loader.start()
+
+    def loadDocument(self, document):
+        """Opens a document restored from the last session once it is shown"""
+        try:
+            large = os.path.getsize(document.path) >= self.large_file_size
+        except OSError:
+            large = False  # the loader reports it
+        if large:
+            self.documentTabs.attachViewer(document, self.createLargeFileViewer(document))
+        else:
+            self.documentTabs.attachEditor(document, self.createEditor())
+            self.startLoading(document)
+
+    def onFileLoaded(self, document):
+        loader, document.loader = document.loader, None
+        document.encoding = loader.encoding()
+        document.editor.document().setModified(False)
+        if document.view_state is not None:
+            document.applyViewState(document.editor)
+            if document is self.current_document:
+                document.restoreScroll()
+        self.restoreAnalysis(document)
+        self.documentTabs.updateTitle(document)
+        # Documents opened in a row are hibernated once they finish loading
+        self.documentTabs.hibernateLeastRecent()
+        self.statusBar.hideProgress()
+        self.statusBar.showMessage(f'Loaded: {loader.path} ({loader.encoding()})')
+
+    def onFileLoadFailed(self, document, message):
+        document.loader = None
+        document.path = None
+        self.documentTabs.updateTitle(document)
+        self.statusBar.hideProgress()
+        QMessageBox.warning(self, "Error", f"Could not open file: {message}")
+
+    def cancelLoading(self):
+        """Stops loading the current document, leaving it empty and untitled"""
+        document = self.current_document
+        loader = document.loader
+        if loader is None:
+            return
+        document.loader = None
+        document.path = None
+        loader.cancel()
+        self.documentTabs.updateTitle(document)
+        self.statusBar.hideProgress()
+        self.statusBar.showMessage(f'Loading cancelled: {loader.path}')
+
+    def openLargeFile(self, fileName):
+        """Shows file read-only in a memory-mapped viewer that pages in visible lines only"""
+        document = Document(fileName)
+        document.viewer = self.createLargeFileViewer(document)
+        self.documentTabs.addDocument(document)
+
+    def createLargeFileViewer(self, document):
+        viewer = LargeFileViewer(document.path, self.theme, self.editor.font())
+        viewer.indexed.connect(lambda: self.current_document is document
+                               and self.statusBar.showMessage(viewer.statusText()))
+        return viewer
+
+    def rejectReadOnlyDocument(self):
+        """Tells user that the action needs a complete, editable document"""
+        if self.current_document.viewer is not None:
+            self.statusBar.showMessage("Not available in read-only large file mode")
+            return True
+        if self.current_document.loader is not None:
+            self.statusBar.showMessage("Not available while the file is loading")
+            return True
+        return False
+
+    def openFilesFromInstance(self, paths):
+        """Opens files handed over by another PyDDLE launch and brings window to front"""
+        for path in paths:
+            self.openFileByPath(path)
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
 
     def saveFile(self):
-        if self.current_file:
-            with open(self.current_file, 'w', encoding='utf-8') as file:
-                file.write(self.editor.toPlainText())
-            self.statusBar.showMessage(f'Saved: {self.current_file}')
+        if self.rejectReadOnlyDocument():
+            return
+        if self.current_document.path:
+            self.writeFile(self.current_document.path)
         else:
             self.saveAsFile()
 
     def saveAsFile(self):
+        if self.rejectReadOnlyDocument():
+            return
         fileName, _ = QFileDialog.getSaveFileName(self, "Save File", "", "Python Files (*.py);;All Files (*)")
         if fileName:
-            with open(fileName, 'w', encoding='utf-8') as file:
-                file.write(self.editor.toPlainText())
-            self.current_file = fileName
-            self.statusBar.showMessage(f'Saved as: {fileName}')
+            # The document takes the new path once the file was written
+            self.writeFile(fileName)
+
+    def writeFile(self, fileName):
+        """Saves a snapshot of the editor text in the background"""
+        document = self.current_document
+        snapshot = (fileName, self.editor.toPlainText(), document.encoding, document)
+        # Edits made after the snapshot mark the document modified again
+        self.editor.document().setModified(False)
+        if self.fileSaver is not None:
+            # Written once the save in progress is done, only the newest text of each file counts
+            path = os.path.abspath(fileName)
+            self.queued_saves.pop(path, None)
+            self.queued_saves[path] = snapshot
+            return
+        self.startSave(*snapshot)
+
+    def startSave(self, fileName, text, encoding, document):
+        saver = FileSaver(fileName, text, encoding)
+        saver.saved.connect(lambda path: self.onSaved(document, path))
+        saver.failed.connect(lambda path, message: self.onSaveFailed(document, path, message))
+        saver.finished.connect(lambda: self.onSaveFinished(saver))
+        self.fileSaver = saver
+        self.statusBar.showMessage(f'Saving: {fileName}...')
+        saver.start()
+
+    def onSaveFinished(self, saver):
+        if saver is not self.fileSaver:
+            return  # already finished by closeEvent
+        saver.wait()
+        self.fileSaver = None
+        if self.queued_saves:
+            _, snapshot = self.queued_saves.popitem(last=False)
+            self.startSave(*snapshot)
+
+    def onSaved(self, document, path):
+        # Saved As, from now on saving goes to the new file
+        if document.path is None or os.path.abspath(document.path) != path:
+            document.path = path
+            self.documentTabs.updateTitle(document)
+        self.statusBar.showMessage(f'Saved: {path}')
+
+    def onSaveFailed(self, document, path, message):
+        # Unless the tab was closed since the save started
+        if document in self.documentTabs.documents():
+            if document.editor is not None:
+                document.editor.undoHistory.setClean(False)
+                document.editor.document().setModified(True)
+            else:
+                # Hibernated while its save was queued, the compressed text is the only copy
+                document.modified = True
+                self.documentTabs.updateTitle(document)
+        self.statusBar.showMessage(f'Save failed: {path}')
+        QMessageBox.warning(self, "Error", f"Could not save file: {message}\n\n"
+                            "The file on disk was left unchanged.")
+
+    def closeEvent(self, event):
+        """Asks before discarding unsaved changes, then finishes saves in progress and
+        saves the session before the window closes"""
+        names = [document.name() for document in self.documentTabs.documents() if document.isModified()]
+        if names:
+            if len(names) > 10:
+                names[10:] = [f"{len(names) - 10} more"]
+            reply = QMessageBox.question(self, "Quit", "Discard unsaved changes to " + ", ".join(names) + "?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+        while self.fileSaver is not None:
+            self.onSaveFinished(self.fileSaver)
+        # No check may start after the window closed
+        self.syntaxTimer.stop()
+        if self.syntaxChecker is not None:
+            self.syntaxChecker.finished.disconnect(self.onSyntaxCheckerFinished)
+            self.stopSyntaxCheck()
+            self.syntaxChecker.wait()
+            self.syntaxChecker = None
+        if self.session is not None:
+            self.saveSession()
+        super().closeEvent(event)
+
+    def saveSession(self):
+        """Saves open files with their view state, the window layout and the analysis
+        results of unmodified documents"""
+        documents = []
+        current = None
+        for document in self.documentTabs.documents():
+            if document.path is None:
+                continue  # untitled text is not kept
+            if document is self.current_document:
+                current = len(documents)
+            documents.append({'path': os.path.abspath(document.path), 'view': document.viewState()})
+            editor = document.editor
+            if editor is not None and document.loader is None and not document.isModified():
+                results = {kind: result for kind, (revision, result) in editor.analysis_results.items()
+                           if revision == editor.text_revision}
+                if results:
+                    self.session.storeAnalysis(SessionStore.digest(editor.toPlainText()), results)
+        self.session.save({
+            'geometry': bytes(self.saveGeometry().toBase64()).decode('ascii'),
+            'state': bytes(self.saveState().toBase64()).decode('ascii'),
+            'documents': documents,
+            'current': current,
+        })
+
+    def restoreSession(self):
+        """Reopens the documents and window layout of the last session, only the
+        current document is read now and the others once their tab is shown"""
+        session = self.session.load()
+        if session is None:
+            return
+        self.restoreGeometry(QByteArray.fromBase64(session.get('geometry', '').encode('ascii')))
+        self.restoreState(QByteArray.fromBase64(session.get('state', '').encode('ascii')))
+        initial = self.reusableDocument()
+        current = None
+        for index, entry in enumerate(session.get('documents', ())):
+            path = entry.get('path')
+            if not path or not os.path.isfile(path) or self.documentTabs.findPath(path):
+                continue
+            document = Document(path)
+            document.unloaded = True
+            view = entry.get('view')
+            document.view_state = tuple(view) if view else None
+            self.documentTabs.addDocument(document, show=False)
+            if current is None or index == session.get('current'):
+                current = document
+        if current is None:
+            return
+        self.documentTabs.setCurrent(current)
+        if initial is not None:
+            self.documentTabs.removeDocument(initial)
 
     def findText(self):
         text, ok = QInputDialog.getText(self, 'Find', 'Enter text:')
@@ -2792,31 +7164,76 @@ class PythonEditor(QMainWindow):
         def replaceAll():
             text = self.editor.toPlainText()
             new_text = text.replace(self.findEdit.text(), self.replaceEdit.text())
-            self.editor.setPlainText(new_text)
+            self.editor.replaceAllText(new_text)
             
         btnFind.clicked.connect(findNext)
         btnReplace.clicked.connect(replace)
         btnReplaceAll.clicked.connect(replaceAll)
         dialog.exec_()
 
+    def toggleFold(self):
+        """Collapses or expands the region at the cursor"""
+        foldIndex = self.editor.foldIndex
+        line = foldIndex.enclosingFold(self.editor.textCursor().blockNumber())
+        if line is not None:
+            foldIndex.toggleFold(line)
+
+    def setEditorFont(self, font):
+        """Zooms every live editor, hibernated ones take the font when they wake up"""
+        for editor in self.documentTabs.liveEditors() + [self.placeholderEditor]:
+            if editor is not None:
+                editor.setFont(font)
+
     def zoomIn(self):
         font = self.editor.font()
         font.setPointSize(font.pointSize() + 1)
-        self.editor.setFont(font)
+        self.setEditorFont(font)
 
     def zoomOut(self):
         font = self.editor.font()
         if font.pointSize() > 6:
             font.setPointSize(font.pointSize() - 1)
-            self.editor.setFont(font)
+            self.setEditorFont(font)
 
     def resetZoom(self):
         font = self.editor.font()
         font.setPointSize(10)
-        self.editor.setFont(font)
+        self.setEditorFont(font)
+
+    def setMinimapVisible(self, visible):
+        self.minimap_visible = visible
+        for editor in self.documentTabs.liveEditors():
+            editor.setMinimapVisible(visible)
+
+    def setTheme(self, name):
+        """Switches the whole window to another color theme"""
+        theme = THEMES[name]
+        if theme is self.theme:
+            return
+        self.theme = theme
+        for action in self.themeActions.actions():
+            action.setChecked(action.text() == name)
+        # Children inherit the main window style sheet, so it is set only once
+        self.applyStyleSheet()
+        for document in self.documentTabs.documents():
+            if document.editor is not None:
+                document.editor.applyTheme(theme)
+            if document.viewer is not None:
+                document.viewer.theme = theme
+                document.viewer.viewport().update()
+        if self.placeholderEditor is not None:
+            self.placeholderEditor.applyTheme(theme)
+        self.statusBar.showMessage(f"Theme: {name}", 2000)
+
+    def showHighlighterStats(self):
+        """Shows token cache hit statistics of the syntax highlighter"""
+        stats = self.editor.highlighter.token_cache.formatStats()
+        QMessageBox.information(self, "Highlighter Cache Statistics", stats)
 
     def formatCode(self):
         """Formats entire code or selection"""
+        if self.rejectReadOnlyDocument():
+            return
         cursor = self.editor.textCursor()
         if cursor.hasSelection():
             # Format only selection
@@ -2827,10 +7244,9 @@ class PythonEditor(QMainWindow):
             # Format entire code
             code = self.editor.toPlainText()
             formatted_code = self.code_formatter.format_code(code)
-            self.editor.setPlainText(formatted_code)
+            self.editor.replaceAllText(formatted_code)
         
         self.statusBar.showMessage("Code formatted")
-        self.updateCodeStructure()
 
     def commentCode(self):
         """Comments selected lines"""
@@ -2904,9 +7320,9 @@ class PythonEditor(QMainWindow):
                 self.editor.setTextCursor(cursor)
 
     def updateCodeStructure(self):
-        """Updates code structure tree"""
+        """Schedules code structure tree update"""
         if hasattr(self, 'codeStructureTree'):
-            self.codeStructureTree.updateStructure(self.editor.toPlainText())
+            self.codeStructureTree.scheduleUpdate()
 
     def scheduleSyntaxCheck(self):
         """Schedules syntax check after short delay"""
@@ -2914,38 +7330,88 @@ class PythonEditor(QMainWindow):
         self.syntaxTimer.start(500)  # 500ms delay
 
     def delayedSyntaxCheck(self):
-        """Performs syntax check after delay"""
-        self.checkSyntax()
-        self.updateCodeStructure()
+        """Checks a snapshot of the text in the background once edits pause"""
+        editor = self.editor
+        if self.checked_revision == editor.text_revision or editor.loading:
+            return
+        if self.syntaxChecker is not None:
+            # At most one check at a time, the newest text is checked when it stops
+            self.syntaxChecker.cancelled = True
+            return
+        self.checked_revision = editor.text_revision
+        self.syntaxChecker = SyntaxChecker(editor.toPlainText(), editor.text_revision)
+        self.syntaxChecker.resultReady.connect(self.onSyntaxChecked)
+        self.syntaxChecker.finished.connect(self.onSyntaxCheckerFinished)
+        self.syntaxChecker.start(QThread.LowPriority)
+
+    def onSyntaxChecked(self, revision, result):
+        # Results for text edited since the snapshot are dropped
+        if self.syntaxChecker.cancelled or revision != self.editor.text_revision:
+            return
+        self.editor.analysis_results['lint'] = (revision, result)
+        self.applyLintResult(result)
+
+    def onSyntaxCheckerFinished(self):
+        self.syntaxChecker.wait()
+        self.syntaxChecker = None
+        if not self.syntaxTimer.isActive():
+            self.delayedSyntaxCheck()
+
+    def stopSyntaxCheck(self):
+        """Drops the result of the check in progress"""
+        if self.syntaxChecker is not None:
+            self.syntaxChecker.cancelled = True
 
     def checkSyntax(self):
-        """Checks code syntax and marks errors"""
-        code = self.editor.toPlainText()
+        """Checks code syntax and marks errors right away, for actions that need the result"""
+        editor = self.editor
+        lint = editor.analysis_results.get('lint')
+        if lint is None or lint[0] != editor.text_revision:
+            lint = (editor.text_revision, SyntaxChecker.lint(editor.toPlainText()))
+            editor.analysis_results['lint'] = lint
+        self.applyLintResult(lint[1])
+
+    def applyLintResult(self, result):
+        """Marks the syntax error or lists the code quality issues of a lint result"""
         self.syntax_errors.clear()
-        
-        try:
-            # Syntax checking using ast
-            ast.parse(code)
-            self.clearErrorMarks()
-            self.statusBar.showMessage("Syntax correct")
-            
-            # Check code quality if pyflakes is available
-            if PYFLAKES_AVAILABLE:
-                issues = self.enhanced_syntax_checker.check_code_quality(code)
-                if issues:
-                    self.outputConsole.setPlainText("Code quality issues:\n" + "\n".join(issues))
-                    self.statusBar.showMessage(f"Found {len(issues)} code quality issues")
-                else:
-                    self.outputConsole.setPlainText("Code correct - no quality issues")
-                    
-        except SyntaxError as e:
-            line = e.lineno
-            message = e.msg
-            suggestion = self.enhanced_syntax_checker.get_syntax_suggestions(e)
-            
+        if result['error'] is not None:
+            line, message, suggestion = result['error']
             self.syntax_errors[line] = f"{message} | Suggestion: {suggestion}"
             self.highlightErrorLine(line, f"{message}\nSuggestion: {suggestion}")
             self.statusBar.showMessage(f"Syntax error in line {line}: {message} | {suggestion}")
+            return
+        self.clearErrorMarks()
+        self.statusBar.showMessage("Syntax correct")
+        issues = result['issues']
+        if issues:
+            self.outputConsole.setPlainText("Code quality issues:\n" + "\n".join(issues))
+            self.statusBar.showMessage(f"Found {len(issues)} code quality issues")
+        elif issues is not None:
+            self.outputConsole.setPlainText("Code correct - no quality issues")
+
+    def showAnalysis(self, editor):
+        """Shows the outline and lint results already known for the text of editor"""
+        revision = editor.text_revision
+        outline = editor.analysis_results.get('outline')
+        if outline is not None and outline[0] == revision:
+            self.codeStructureTree.updateStructure(outline[1])
+        lint = editor.analysis_results.get('lint')
+        if lint is not None and lint[0] == revision:
+            self.applyLintResult(lint[1])
+
+    def restoreAnalysis(self, document):
+        """Shows the results saved for the text just loaded at once, they are
+        recomputed in the background as after any other load"""
+        if self.session is None:
+            return
+        editor = document.editor
+        results = self.session.analysis(SessionStore.digest(editor.toPlainText()))
+        if results is None:
+            return
+        revision = editor.text_revision
+        editor.analysis_results = {kind: (revision, result) for kind, result in results.items()}
+        if editor is self.editor:
+            self.showAnalysis(editor)
 
     def highlightErrorLine(self, line, message):
         """Highlights line with syntax error"""
@@ -2954,7 +7420,7 @@ class PythonEditor(QMainWindow):
         
         # Error line highlighting
         selection = QTextEdit.ExtraSelection()
-        line_color = QColor(255, 200, 200)  # Light red
+        line_color = self.theme.colors['error_line']
         selection.format.setBackground(line_color)
         selection.format.setProperty(QTextFormat.FullWidthSelection, True)
         
@@ -2965,6 +7431,8 @@ class PythonEditor(QMainWindow):
         
         extra_selections.append(selection)
         self.editor.setExtraSelections(extra_selections)
+        self.editor.clearLineMarkers(CodeEditor.MARKER_ERROR)
+        self.editor.setLineMarker(line - 1, CodeEditor.MARKER_ERROR)
         
         # Add message to output
         self.outputConsole.setPlainText(f"SYNTAX ERROR in line {line}:\n{message}")
@@ -2972,6 +7440,7 @@ class PythonEditor(QMainWindow):
     def clearErrorMarks(self):
         """Clears syntax error marks"""
         self.editor.setExtraSelections([])
+        self.editor.clearLineMarkers(CodeEditor.MARKER_ERROR)
 
     def check_missing_imports(self):
         """Checks for missing imports and offers installation"""
@@ -2986,6 +7455,8 @@ class PythonEditor(QMainWindow):
 
     def runCode(self):
         """Runs code without live preview"""
+        if self.rejectReadOnlyDocument():
+            return
         # First check syntax
         self.checkSyntax()
         if self.syntax_errors:
@@ -3044,6 +7515,8 @@ class PythonEditor(QMainWindow):
 
     def testApplication(self):
         """Runs code with execution preview"""
+        if self.rejectReadOnlyDocument():
+            return
         self.checkSyntax()
         if self.syntax_errors:
             reply = QMessageBox.question(self, "Syntax Errors", 
@@ -3086,38 +7559,42 @@ class PythonEditor(QMainWindow):
 
     def showAISuggestion(self):
         """Shows AI suggestions dialog"""
-        dialog = AISuggestionDialog(self)
-        dialog.exec_()
+        self.dialogs.exec_("ai_suggestion")
 
     def showAdvancedFindReplace(self):
         """Shows advanced find and replace dialog"""
-        dialog = AdvancedFindReplaceDialog(self)
-        dialog.exec_()
+        self.dialogs.exec_("advanced_find_replace")
 
     def showCompilerDialog(self):
         """Shows compiler selection dialog"""
-        dialog = CompilerDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            # Continue in appropriate compiler dialog
-            pass
+        # Compiler dialog continues in appropriate compiler dialog when accepted
+        self.dialogs.exec_("compiler")
 
     def showAboutDialog(self):
         """Shows about dialog"""
-        dialog = AboutDialog(self)
-        dialog.exec_()
+        self.dialogs.exec_("about")
+
+    def updateCursorPosition(self):
+        """Shows cursor position in status bar"""
+        cursor = self.editor.textCursor()
+        self.statusBar.setCursorPosition(cursor.blockNumber() + 1, cursor.columnNumber() + 1)
 
-    def updateUI(self):
-        """Updates user interface"""
-        # Update status bar
-        line = self.editor.textCursor().blockNumber() + 1
-        col = self.editor.textCursor().columnNumber() + 1
-        self.statusBar.showMessage(f'Line: {line}, Column: {col} | Ready')
+    def onMarkersChanged(self, kind):
+        """Follows breakpoints moved by edits above them"""
+        if kind == CodeEditor.MARKER_BREAKPOINT:
+            self.breakpoints = {line + 1 for line in self.editor.line_markers[kind]}
 
-        # Check if code changed and schedule syntax check
-        current_text = self.editor.toPlainText()
-        if hasattr(self, 'last_checked_text') and self.last_checked_text != current_text:
+    def onBreakpointToggled(self, line, enabled):
+        """Keeps breakpoint line numbers in sync with gutter markers"""
+        if enabled:
+            self.breakpoints.add(line + 1)
+        else:
+            self.breakpoints.discard(line + 1)
+
+    def onContentsChange(self, position, removed, added):
+        """Schedules syntax check when document text changes"""
+        if removed or added:
             self.scheduleSyntaxCheck()
-        self.last_checked_text = current_text
 
 class CodeExecutionManager:
     def __init__(self, parent):
@@ -3214,7 +7691,7 @@ class CodeExecutionManager:
             # Highlight line
             extra_selections = []
             selection = QTextEdit.ExtraSelection()
-            line_color = QColor(230, 243, 255)  # Light blue
+            line_color = self.parent.theme.colors['execution_line']
             selection.format.setBackground(line_color)
             selection.format.setProperty(QTextFormat.FullWidthSelection, True)
             
@@ -3248,8 +7725,174 @@ class CodeExecutionManager:
             
         self.is_testing = False
 
+class InstanceServer(QObject):
+    """Local socket server through which later launches hand files to this instance"""
+    filesRequested = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.acceptConnections)
+        self.buffers = {}
+
+    @staticmethod
+    def serverName():
+        """Returns per-user socket name"""
+        home_hash = hashlib.md5(os.path.expanduser("~").encode('utf-8')).hexdigest()[:12]
+        return f"PyDDLE-{home_hash}"
+
+    def listen(self):
+        """Starts listening, removing a socket left behind by a crashed instance"""
+        name = self.serverName()
+        # With socket options set, listen() replaces the socket file of a
+        # running instance instead of failing, so check for one first
+        if self.isServerRunning(name):
+            return False
+        if self.server.listen(name):
+            return True
+        if self.server.serverError() == QAbstractSocket.AddressInUseError:
+            QLocalServer.removeServer(name)
+            return self.server.listen(name)
+        return False
+
+    @staticmethod
+    def isServerRunning(name, timeout=500):
+        """Returns True if an instance accepts connections on the socket, even if it is busy"""
+        socket = QLocalSocket()
+        socket.connectToServer(name)
+        if not socket.waitForConnected(timeout):
+            return False
+        socket.abort()
+        return True
+
+    def acceptConnections(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self.readRequest(s))
+            socket.disconnected.connect(lambda s=socket: self.closeConnection(s))
+
+    def readRequest(self, socket):
+        """Collects request bytes and handles complete (newline terminated) requests"""
+        self.buffers[socket] = self.buffers.get(socket, b"") + bytes(socket.readAll())
+        if not self.buffers[socket].endswith(b"\n"):
+            return
+        data = self.buffers.pop(socket)
+        try:
+            request = json.loads(data.decode('utf-8'))
+            paths = [str(path) for path in request.get("open", [])]
+        except (ValueError, AttributeError):
+            paths = None
+        socket.write(b"ok\n" if paths is not None else b"error\n")
+        socket.flush()
+        if paths is not None:
+            self.filesRequested.emit(paths)
+
+    def closeConnection(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+def sendToRunningInstance(paths, timeout=500, reply_timeout=10000):
+    """Hands files to an already running instance, returns True if it accepted them.
+    Only a failed connection means no instance runs, a busy instance that does not
+    reply in time still reads the request once its event loop is free"""
+    socket = QLocalSocket()
+    socket.connectToServer(InstanceServer.serverName())
+    if not socket.waitForConnected(timeout):
+        return False
+    request = json.dumps({"open": [os.path.abspath(path) for path in paths]}) + "\n"
+    socket.write(request.encode('utf-8'))
+    if not socket.waitForBytesWritten(reply_timeout) or not socket.waitForReadyRead(reply_timeout):
+        return socket.state() == QLocalSocket.ConnectedState and not socket.bytesToWrite()
+    accepted = bytes(socket.readAll()).startswith(b"ok")
+    socket.disconnectFromServer()
+    return accepted
+
+def parseArguments(argv):
+    """Parses PyDDLE command line options, leaving the rest for Qt"""
+    parser = argparse.ArgumentParser(prog="PyDDLE", description="PyDDLE - Python Development IDE")
+    parser.add_argument('files', nargs='*', help="files to open")
+    parser.add_argument('--single-instance', action='store_true',
+                        help="open files in an already running PyDDLE instead of starting "
+                             "a new window, and accept files from later launches")
+    parser.add_argument('--large-file-size', type=float, metavar='MB',
+                        help="open files of at least MB megabytes read-only in the "
+                             f"memory-mapped large file viewer (default {PythonEditor.LARGE_FILE_SIZE // (1024 * 1024)})")
+    parser.add_argument('--undo-memory', type=float, metavar='MB',
+                        help="keep at most MB megabytes of undo history per document, "
+                             f"dropping the oldest changes first (default {UndoHistory.MEMORY_LIMIT // (1024 * 1024)})")
+    parser.add_argument('--no-session', action='store_true',
+                        help="start without reopening the files of the last session "
+                             "and do not save the session on exit")
+    parser.add_argument('--benchmark-scroll', metavar='FILE',
+                        help="scroll through FILE, print frames per second and exit")
+    parser.add_argument('--startup-budget', type=float, metavar='SECONDS',
+                        help="exit after startup with code 1 if the first event loop "
+                             "paint happens later than SECONDS after launch")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print a per-phase startup timing table after the first paint")
+    parser.add_argument('--startup-trace', metavar='FILE',
+                        help="also save startup phases as a Chrome trace JSON file "
+                             "(implies --profile-startup)")
+    return parser.parse_known_args(argv[1:])
+
+def checkStartupBudget(app, budget):
+    """Reports startup time and exits with an error if the budget was exceeded"""
+    elapsed = time.perf_counter() - STARTUP_TIME
+    within_budget = elapsed <= budget
+    verdict = "OK" if within_budget else "OVER BUDGET"
+    print(f"PyDDLE startup: {elapsed:.3f}s (budget {budget:.3f}s) - {verdict}", flush=True)
+    app.exit(0 if within_budget else 1)
+
+def reportStartupProfile(trace_path=None):
+    """Prints startup timing table and optionally saves Chrome trace"""
+    print(startup_profiler.formatReport())
+    if trace_path:
+        try:
+            startup_profiler.writeChromeTrace(trace_path)
+            print(f"Startup trace saved: {trace_path}")
+        except OSError as e:
+            print(f"Could not save startup trace: {e}")
+    sys.stdout.flush()
+
+def runScrollBenchmark(window, path, frames=600, lines_per_frame=3):
+    """Scrolls through a file like fast wheel scrolling and prints frame rate"""
+    app = QApplication.instance()
+    with open(path, encoding='utf-8', errors='replace') as file:
+        window.editor.setPlainText(file.read())
+    editor = window.editor
+    scrollbar = editor.verticalScrollBar()
+    app.processEvents()
+    frame_times = []
+    started = time.perf_counter()
+    for frame in range(frames):
+        frame_started = time.perf_counter()
+        scrollbar.setValue(frame * lines_per_frame % (scrollbar.maximum() + 1))
+        app.processEvents()
+        editor.viewport().repaint()
+        editor.lineNumberArea.repaint()
+        frame_times.append(time.perf_counter() - frame_started)
+    elapsed = time.perf_counter() - started
+    frame_times.sort()
+    print(f"Scroll benchmark: {frames} frames over {editor.blockCount()} lines, "
+          f"{frames / elapsed:.1f} FPS, 95th percentile frame {frame_times[int(frames * 0.95)] * 1000:.1f} ms, "
+          f"worst frame {frame_times[-1] * 1000:.1f} ms", flush=True)
+    app.exit(0)
+
 def main():
-    app = QApplication(sys.argv)
+    main_started = time.perf_counter()
+    args, qt_args = parseArguments(sys.argv)
+    startup_profiler.enabled = args.profile_startup or bool(args.startup_trace)
+    startup_profiler.addPhase("module import", STARTUP_TIME, main_started)
+
+    # Allows QtWebEngine to be imported lazily after QApplication exists
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    with startup_profiler.phase("QApplication"):
+        app = QApplication(sys.argv[:1] + qt_args)
+    
+    if args.single_instance and sendToRunningInstance(args.files):
+        sys.exit(0)
     
     # Set application style
     app.setStyle('Fusion')
@@ -3260,10 +7903,47 @@ def main():
     font.setPointSize(10)
     app.setFont(font)
     
-    editor = PythonEditor()
+    with startup_profiler.phase("PythonEditor"):
+        editor = PythonEditor()
+    
+    if args.large_file_size is not None:
+        editor.large_file_size = int(args.large_file_size * 1024 * 1024)
+    if args.undo_memory is not None:
+        editor.setUndoMemoryLimit(int(args.undo_memory * 1024 * 1024))
+    
+    if args.single_instance:
+        instance_server = InstanceServer(editor)
+        instance_server.filesRequested.connect(editor.openFilesFromInstance)
+        if not instance_server.listen():
+            print(f"Single instance server unavailable: {instance_server.server.errorString()}")
+    
+    # Benchmarks neither restore nor overwrite the user's session
+    if not args.no_session and not args.benchmark_scroll:
+        editor.session = SessionStore()
+        with startup_profiler.phase("restoreSession"):
+            editor.restoreSession()
+    
+    for path in args.files:
+        editor.openFileByPath(path)
+    
+    if startup_profiler.enabled or args.startup_budget is not None:
+        shown = time.perf_counter()
+
+        def onFirstPaint():
+            startup_profiler.addPhase("first paint", shown, time.perf_counter())
+            if startup_profiler.enabled:
+                reportStartupProfile(args.startup_trace)
+            if args.startup_budget is not None:
+                checkStartupBudget(app, args.startup_budget)
+
+        paint_watcher = FirstPaintWatcher(editor.editor.viewport())
+        paint_watcher.painted.connect(onFirstPaint)
     editor.show()
     
+    if args.benchmark_scroll:
+        QTimer.singleShot(0, lambda: runScrollBenchmark(editor, args.benchmark_scroll))
+    
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()